@@ -2,11 +2,57 @@
 class Config:
     # Modelos
     YOLO_MODEL_PATH = "models/yolo26n.pt"  # Atualizado caso esteja a usar v8
+
+    # Deteção partilhada (um único YOLO com batching dinâmico para todas as câmaras)
+    SHARED_DETECTOR = True
+    DETECTION_MAX_BATCH_SIZE = 8
+    DETECTION_MAX_WAIT_MS = 10           # Espera máxima para encher um batch
+    DETECTION_REQUEST_TIMEOUT = 5.0
+
+    # Backend de deteção em CPU: "ultralytics" (PyTorch), "onnx" (ONNX Runtime FP32),
+    # "onnx_int8" (ONNX Runtime quantizado) ou "opencv" (OpenCV DNN sobre o mesmo ONNX)
+    DETECTOR_BACKEND = "ultralytics"
+    DETECTOR_ONNX_PATH = None            # None = exportação ao lado de YOLO_MODEL_PATH (gerada se faltar)
+    DETECTOR_ONNX_INT8_PATH = None       # None = <modelo>_int8.onnx (quantizado a partir do FP32 se faltar)
+    DETECTOR_INPUT_SIZE = 640            # Lado da entrada dos modelos exportados
+    DETECTOR_THREADS = None              # Threads de inferência em CPU (None = padrão da biblioteca)
     
+    # Passo de deteção adaptativo (YOLO 1 em cada K frames; Kalman do Deep SORT prevê entre deteções)
+    ADAPTIVE_DETECTION = False
+    DETECTION_STRIDE_MIN = 1
+    DETECTION_STRIDE_MAX = 6
+    DETECTION_CROWD_TRACKS = 8           # Faixas a partir das quais K desce
+    DETECTION_FAST_SPEED = 12.0          # px/frame: movimento rápido faz K descer
+    DETECTION_STATIC_SPEED = 1.5         # px/frame: abaixo disto a cena é estática e K sobe
+    
+    # Filtro de movimento antes da deteção
+    MOTION_GATE = False
+    MOTION_GATE_WIDTH = 160              # Largura do frame reduzido usado na comparação
+    MOTION_GATE_PIXEL_THRESHOLD = 25     # Diferença de intensidade para um pixel contar como mudança
+    MOTION_GATE_MIN_CHANGED_FRACTION = 0.002  # Fração de pixels alterados para haver movimento (sensibilidade)
+    MOTION_GATE_FORCE_INTERVAL = 2.0     # Segundos máximos sem deteção (mantém pessoas paradas)
+
+    # Tracker por câmara: "deepsort" ou "bytetrack" (IoU + Kalman, embeddings só a pedido)
+    TRACKER_MODE = "deepsort"
+    TRACK_HIGH_THRESH = 0.5              # Confiança da 1.ª passagem de associação
+    TRACK_LOW_THRESH = 0.1               # Deteções entre LOW e HIGH só recuperam faixas existentes
+    TRACK_NEW_THRESH = 0.6               # Confiança mínima para abrir uma faixa nova
+    EMBEDDING_REFRESH_INTERVAL = 1.0     # Segundos entre embeddings da mesma faixa (refresca o EMA global)
+
+    # Embeddings de aparência partilhados (recortes de todas as câmaras no mesmo batch)
+    SHARED_EMBEDDER = True
+    EMBEDDER_BACKEND = "mobilenet"       # "mobilenet" (deep_sort_realtime, fp32 em CPU) ou "onnx"
+    EMBEDDER_ONNX_PATH = "models/mobilenetv2_reid.onnx"
+    EMBEDDER_THREADS = None              # Threads de inferência em CPU (None = padrão da biblioteca)
+    EMBEDDER_MAX_BATCH_SIZE = 32         # Recortes por batch
+    EMBEDDER_MAX_WAIT_MS = 5
+    EMBEDDING_REQUEST_TIMEOUT = 5.0      # Segundos máximos à espera dos embeddings de um frame
+
     # Limiares de Movimento / Paragem
     STOPPED_SECONDS_THRESHOLD = 3
     STOPPED_PIXEL_THRESHOLD = 15
     MOVEMENT_BREAKOUT_THRESHOLD = 30
+    STOPPED_STATE_EVICT_AFTER = 5.0      # Segundos sem ser visto até o estado parado de um id deixar de ser guardado
     
     # === LIMIARES DE IDENTIDADE BIFURCADOS ===
     SIMILARITY_THRESHOLD = 0.20           # Rigoroso: Para rastreio dentro da MESMA câmara
@@ -16,19 +62,83 @@ class Config:
     MAX_TIME_LOST = 10.0                 # Aumentado para 10s para permitir que a pessoa ande entre corredores sem câmara
     CAMERA_SWITCH_COOLDOWN = 2.0         # Evita ping-pong entre câmaras com sobreposição
     AUTO_CLUSTER_TIME_THRESHOLD = 3.0    # Tempo para considerar que duas câmaras filmam o mesmo ambiente
+
+    # Histórico de câmaras por identidade: no máximo N segmentos em memória, os restantes em disco
+    CAMERA_HISTORY_MEMORY_CAP = 64
+    # Ex.: "camera_history.bin" (cria também "camera_history.bin.cameras"); None = histórico só em memória
+    CAMERA_HISTORY_SPILL_PATH = None
+
+    # Exportação contínua das visitas a ambientes (escritor em segundo plano, ficheiros rotativos)
+    EXPORT_STREAMING = False             # Ligado = ficheiros rotativos em EXPORT_DIRECTORY durante a execução
+    EXPORT_DIRECTORY = "exports"
+    EXPORT_FORMAT = "csv"                # "csv" ou "parquet" (requer pyarrow)
+    EXPORT_BATCH_SIZE = 256              # Visitas por escrita
+    EXPORT_FLUSH_INTERVAL = 5.0          # Segundos máximos até um lote incompleto ser escrito
+    EXPORT_ROTATE_MAX_BYTES = 64 * 1024 * 1024
+    EXPORT_ROTATE_SECONDS = 3600         # Um ficheiro novo por hora
+    EXPORT_FSYNC = "batch"               # "none", "batch" (após cada lote) ou "rotate" (ao fechar o ficheiro)
+
+    # Checkpoint da galeria de identidades (ficheiro mapeável) e arranque a quente
+    # Ex.: "identity_checkpoint.bin". Se o ficheiro existir no arranque, as identidades ainda dentro de
+    # MAX_TIME_LOST são recuperadas antes de os workers arrancarem; apague-o para um arranque a frio.
+    # Com CAMERA_HISTORY_SPILL_PATH, use o mesmo despejo entre execuções para manter o histórico completo.
+    CHECKPOINT_PATH = None                        # None = sem checkpoints
+    CHECKPOINT_INTERVAL = 60.0                    # Segundos entre checkpoints
+
+    # Pré-filtro de cor no Re-ID (histograma matiz x saturação calculado em lote por frame)
+    COLOR_PREFILTER = False
+    COLOR_PREFILTER_THRESHOLD = 0.6      # Distância de Bhattacharyya máxima para comparar embeddings
+
+    # Índice aproximado (IVF) para galerias com milhares de identidades
+    REID_ANN_INDEX = False               # Desligado = pesquisa exata em toda a galeria
+    REID_ANN_N_LISTS = None              # None = sqrt(tamanho da galeria)
+    REID_ANN_N_PROBE = 4                 # Mais listas visitadas = mais recall, mais custo
+    REID_ANN_MIN_GALLERY_SIZE = 1000     # Abaixo disto a pesquisa exata é mais barata
+    REID_ANN_RECALL_SAMPLE_RATE = 0.02   # Fração de consultas repetidas em modo exato para medir recall
+    REID_ANN_REPORT_INTERVAL = 1000      # Amostras de recall entre cada relatório no log
+
+    # Partições do armazém de identidades (um lock por partição / ambiente)
+    IDENTITY_SHARDS = 8
+    SHARD_SNAPSHOT_MAX_AGE = 0.2         # Idade máxima (s) do snapshot lido pelas outras partições
+    IDENTITY_UPDATE_FLUSH_INTERVAL = 0.25  # Atualizações por frame coalescidas no worker (0 = escrita direta)
     
     # Interface
+    DISPLAY_MODE = "window"              # "window" (mosaico cv2.imshow) ou "headless" (sem anotação nem GUI)
+    DISPLAY_MAX_FPS = 15.0               # FPS máximo do mosaico
+    DISPLAY_TILE_WIDTH = 480             # Largura de cada câmara no mosaico
+    HTTP_STREAM = False                  # Streams MJPEG anotados em http://HOST:PORT/stream/<cam_id>
+    HTTP_STREAM_HOST = "127.0.0.1"
+    HTTP_STREAM_PORT = 8080              # Em modo processo, cada processo usa PORT + índice
+    HTTP_STREAM_QUALITY = 70             # Qualidade JPEG
+    HTTP_STREAM_MAX_FPS = 10.0
+    HTTP_STREAM_ENCODERS = 2             # Threads de codificação JPEG
     COLOR_STOPPED = (0, 0, 255)  
     COLOR_MOVING = (0, 255, 0)   
     FONT_SCALE = 0.5
 
+    # Origem dos frames: "kafka" ou "video" (RTSP/ficheiros locais)
+    FRAME_SOURCE = "kafka"
+    VIDEO_SOURCES = {"cam_rua": "examples/pessoas_rua_60fps.mp4"}   # {cam_id: url RTSP ou ficheiro}
+    VIDEO_TARGET_FPS = 10.0              # Taxa de processamento alvo (os restantes frames só levam grab())
+
     # Kafka
     KAFKA_BOOTSTRAP_SERVERS = "localhost:9092"
     KAFKA_TOPIC = "meu-topico-de-video"
     KAFKA_GROUP_ID = "smart-builds-consumer"
     KAFKA_TARGET_CAMERA = None  
     KAFKA_EXPECTED_CAMERAS = 4
+    KAFKA_DECODE_WORKERS = 4              # Threads de descodificação JPEG por consumidor (1 = em série)
+    KAFKA_CONSUMERS = 1                   # Consumidores no grupo (None = um por partição do tópico)
+    KAFKA_COMMIT_INTERVAL = 5.0           # Segundos entre confirmações de offsets
 
     # Capturas
     PROCESSING_WIDTH = 640
-    PROCESSING_HEIGHT = 480
\ No newline at end of file
+    PROCESSING_HEIGHT = 480
+    FRAME_RING_SLOTS = 3                 # Slots pré-alocados por câmara (o frame mais recente ganha)
+
+    # Execução dos workers
+    WORKER_MODE = "thread"               # "thread" (um processo) ou "process" (grupos de câmaras em processos)
+    CAMERAS_PER_PROCESS = 4              # Câmaras alojadas em cada processo no modo "process"
+
+    # Métricas
+    STATS_LOG_INTERVAL = 30.0            # Segundos entre relatórios de métricas no log
\ No newline at end of file
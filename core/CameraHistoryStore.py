@@ -0,0 +1,308 @@
+# core/CameraHistoryStore.py
+import os
+import time
+import logging
+import threading
+import numpy as np
+
+# Segmento de histórico em memória: índice da câmara, entrada e saída (NaN enquanto aberto)
+SEGMENT_DTYPE = np.dtype([("camera", "<i4"), ("t_in", "<f8"), ("t_out", "<f8")])
+# Registo de largura fixa no ficheiro de despejo
+SPILL_DTYPE = np.dtype([("global_id", "<i8"), ("camera", "<i4"), ("t_in", "<f8"), ("t_out", "<f8")])
+# Índice de blocos do ficheiro (intervalos de tempo e de ids de cada bloco, para podar leituras)
+_BLOCK_DTYPE = np.dtype([
+    ("offset", "<i8"), ("count", "<i8"),
+    ("t_min", "<f8"), ("t_max", "<f8"),
+    ("gid_min", "<i8"), ("gid_max", "<i8"),
+])
+
+
+class CameraHistoryStore:
+    """
+    Histórico de câmaras partilhado por todas as identidades.
+
+    Cada identidade guarda em memória no máximo `memory_cap` segmentos (CameraHistory); os mais
+    antigos são despejados para um ficheiro só de acrescento com registos de largura fixa
+    (global_id, câmara, t_in, t_out). Os registos são escritos em blocos de `block_rows` e um índice
+    pequeno em memória (intervalo de tempo e de ids por bloco) permite consultar por global_id
+    ou por intervalo de tempo lendo apenas os blocos candidatos.
+    Sem `path`, nada é despejado e o histórico cresce em memória (comportamento anterior).
+    """
+    def __init__(self, path: str = None, memory_cap: int = 64, block_rows: int = 4096):
+        self.path = path
+        self.memory_cap = max(2, memory_cap) if path else None
+        self.block_rows = block_rows
+
+        self._lock = threading.Lock()
+        self._cameras: list[str] = []
+        self._camera_index: dict[str, int] = {}
+        self._pending: list[np.ndarray] = []
+        self._pending_rows = 0
+        self._blocks = np.zeros(0, dtype=_BLOCK_DTYPE)
+        self._disk_rows = 0
+        self._file = None
+        self._cameras_file = None
+        self.spilled_rows = 0
+        self.total_rows = 0       # Registos do ficheiro, incluindo os ainda por escrever (posição do próximo)
+
+        if path:
+            self._open()
+
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        cameras_path = self.path + ".cameras"
+        if os.path.exists(cameras_path):
+            with open(cameras_path, "r", encoding="utf-8") as f:
+                for line in f.read().splitlines():
+                    self._camera_index[line] = len(self._cameras)
+                    self._cameras.append(line)
+        self._cameras_file = open(cameras_path, "a", encoding="utf-8")
+
+        # Ficheiro existente: descarta um registo incompleto no fim e reconstrói o índice de blocos
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if size % SPILL_DTYPE.itemsize:
+            with open(self.path, "r+b") as f:
+                f.truncate(size - size % SPILL_DTYPE.itemsize)
+        self._file = open(self.path, "ab")
+        total = size // SPILL_DTYPE.itemsize
+        self.total_rows = total
+        if total:
+            rows = np.memmap(self.path, dtype=SPILL_DTYPE, mode="r", shape=(total,))
+            for offset in range(0, total, self.block_rows):
+                self._index_block(rows[offset:offset + self.block_rows], offset)
+            del rows
+            logging.info(f"[CameraHistoryStore] {total} segmentos já despejados em {self.path}.")
+
+    def _index_block(self, rows: np.ndarray, offset: int):
+        t_out = np.where(np.isnan(rows["t_out"]), rows["t_in"], rows["t_out"])
+        block = np.array([(
+            offset, rows.shape[0],
+            rows["t_in"].min(), t_out.max(),
+            rows["global_id"].min(), rows["global_id"].max(),
+        )], dtype=_BLOCK_DTYPE)
+        self._blocks = np.concatenate([self._blocks, block])
+        self._disk_rows = offset + rows.shape[0]
+
+    # --- Câmaras ----------------------------------------------------------------------
+
+    def camera_index(self, cam_id: str) -> int:
+        index = self._camera_index.get(cam_id)
+        if index is not None:
+            return index
+        with self._lock:
+            index = self._camera_index.get(cam_id)
+            if index is None:
+                index = len(self._cameras)
+                self._cameras.append(cam_id)
+                self._camera_index[cam_id] = index
+                if self._cameras_file is not None:
+                    self._cameras_file.write(f"{cam_id}\n")
+                    self._cameras_file.flush()
+            return index
+
+    def raw_records(self, segments: np.ndarray, open_until: float = None) -> list[dict]:
+        """Converte segmentos (em memória ou despejados) no formato de get_raw_history."""
+        if open_until is None:
+            open_until = time.time()
+        t_out = np.where(np.isnan(segments["t_out"]), open_until, segments["t_out"])
+        return [
+            {"camera_id": self._cameras[camera], "timestamp_in": t_in, "timestamp_out": out}
+            for camera, t_in, out in zip(segments["camera"].tolist(), segments["t_in"].tolist(), t_out.tolist())
+        ]
+
+    # --- Despejo e consultas ----------------------------------------------------------
+
+    def spill(self, global_id: int, segments: np.ndarray):
+        """Acrescenta segmentos de uma identidade ao ficheiro (escritos em blocos de `block_rows`)."""
+        if self.path is None or segments.shape[0] == 0:
+            return
+        rows = np.empty(segments.shape[0], dtype=SPILL_DTYPE)
+        rows["global_id"] = global_id
+        rows["camera"] = segments["camera"]
+        rows["t_in"] = segments["t_in"]
+        rows["t_out"] = segments["t_out"]
+        with self._lock:
+            self._pending.append(rows)
+            self._pending_rows += rows.shape[0]
+            self.spilled_rows += rows.shape[0]
+            self.total_rows += rows.shape[0]
+            if self._pending_rows >= self.block_rows:
+                self._write_pending()
+
+    def _write_pending(self):
+        if not self._pending_rows or self._file is None:
+            return
+        rows = np.concatenate(self._pending)
+        self._pending, self._pending_rows = [], 0
+        rows.tofile(self._file)
+        self._file.flush()
+        self._index_block(rows, self._disk_rows)
+
+    def flush(self):
+        with self._lock:
+            self._write_pending()
+
+    def query(self, global_id: int = None, t_start: float = None, t_end: float = None) -> np.ndarray:
+        """
+        Segmentos despejados de `global_id` e/ou que se sobrepõem a [t_start, t_end],
+        ordenados por entrada. Só os blocos cujo intervalo de ids/tempo é compatível são lidos.
+        O lock só protege a cópia do índice e dos pendentes: os blocos escritos nunca mudam,
+        pelo que a leitura do disco não atrasa os despejos (feitos sob o lock das partições).
+        """
+        if self.path is None:
+            return np.zeros(0, dtype=SPILL_DTYPE)
+        with self._lock:
+            blocks = self._blocks
+            pending = list(self._pending)
+
+        candidate = np.ones(blocks.shape[0], dtype=bool)
+        if global_id is not None:
+            candidate &= (blocks["gid_min"] <= global_id) & (blocks["gid_max"] >= global_id)
+        if t_start is not None:
+            candidate &= blocks["t_max"] >= t_start
+        if t_end is not None:
+            candidate &= blocks["t_min"] <= t_end
+        parts = [
+            np.fromfile(self.path, dtype=SPILL_DTYPE, count=int(count), offset=int(offset) * SPILL_DTYPE.itemsize)
+            for offset, count in zip(blocks["offset"][candidate], blocks["count"][candidate])
+        ]
+        parts.extend(pending)
+
+        if not parts:
+            return np.zeros(0, dtype=SPILL_DTYPE)
+        rows = np.concatenate(parts)
+        keep = np.ones(rows.shape[0], dtype=bool)
+        if global_id is not None:
+            keep &= rows["global_id"] == global_id
+        if t_start is not None:
+            keep &= np.isnan(rows["t_out"]) | (rows["t_out"] >= t_start)
+        if t_end is not None:
+            keep &= rows["t_in"] <= t_end
+        rows = rows[keep]
+        return rows[np.argsort(rows["t_in"], kind="stable")]
+
+    def assemble(self, global_id: int, in_memory: np.ndarray, spilled: int = None) -> np.ndarray:
+        """
+        Histórico completo: os primeiros `spilled` segmentos despejados (todos, sem `spilled`)
+        seguidos de `in_memory`. Lê o disco; não deve ser chamado com o lock de uma partição.
+        """
+        if not spilled and spilled is not None:
+            return in_memory.copy()
+        rows = self.query(global_id=global_id)
+        if spilled is not None:
+            rows = rows[:spilled]
+        full = np.empty(rows.shape[0] + in_memory.shape[0], dtype=SEGMENT_DTYPE)
+        for field in SEGMENT_DTYPE.names:
+            full[field][:rows.shape[0]] = rows[field]
+        full[rows.shape[0]:] = in_memory
+        return full
+
+    @property
+    def cameras(self) -> list[str]:
+        return list(self._cameras)
+
+    def max_global_id(self) -> int:
+        """Maior global_id já despejado (0 se nenhum): evita reutilizar ids de execuções anteriores."""
+        with self._lock:
+            candidates = [int(self._blocks["gid_max"].max())] if self._blocks.shape[0] else []
+            candidates.extend(int(rows["global_id"].max()) for rows in self._pending)
+        return max(candidates, default=0)
+
+    def rows_since(self, offset: int) -> np.ndarray:
+        """Registos escritos a partir da posição `offset` do ficheiro."""
+        self.flush()
+        if self.path is None or offset >= self._disk_rows:
+            return np.zeros(0, dtype=SPILL_DTYPE)
+        return np.fromfile(self.path, dtype=SPILL_DTYPE, count=self._disk_rows - offset, offset=offset * SPILL_DTYPE.itemsize)
+
+    def get_stats(self) -> dict:
+        return {
+            "spilled_rows": self.spilled_rows,
+            "disk_rows": self._disk_rows,
+            "blocks": int(self._blocks.shape[0]),
+            "cameras": len(self._cameras),
+        }
+
+    def close(self):
+        with self._lock:
+            self._write_pending()
+            for f in (self._file, self._cameras_file):
+                if f is not None:
+                    f.close()
+            self._file = self._cameras_file = None
+
+
+class CameraHistory:
+    """
+    Histórico de câmaras de uma identidade em colunas de largura fixa (SEGMENT_DTYPE).
+    Ao atingir o limite do armazém, a metade mais antiga (já fechada) é despejada para o ficheiro.
+    """
+    __slots__ = ("global_id", "store", "segments", "size", "spilled")
+
+    def __init__(self, global_id: int, store: CameraHistoryStore, cam_id: str, t_in: float, initial_capacity: int = 4):
+        self.global_id = global_id
+        self.store = store
+        self.segments = np.empty(initial_capacity, dtype=SEGMENT_DTYPE)
+        self.size = 0
+        self.spilled = 0          # Segmentos desta identidade já enviados para o ficheiro
+        self.open(cam_id, t_in)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def open(self, cam_id: str, t_in: float):
+        if self.size == self.segments.shape[0]:
+            self._make_room()
+        self.segments[self.size] = (self.store.camera_index(cam_id), t_in, np.nan)
+        self.size += 1
+
+    def close_last(self, t_out: float):
+        if self.size:
+            self.segments["t_out"][self.size - 1] = t_out
+
+    def _make_room(self):
+        cap = self.store.memory_cap
+        capacity = self.segments.shape[0]
+        if cap is None or capacity < cap:
+            grown = np.empty(capacity * 2 if cap is None else min(capacity * 2, cap), dtype=SEGMENT_DTYPE)
+            grown[:self.size] = self.segments[:self.size]
+            self.segments = grown
+            return
+        # Todos exceto o último estão fechados: a metade mais antiga vai para disco
+        spilled = self.size // 2
+        self.store.spill(self.global_id, self.segments[:spilled])
+        self.segments[:self.size - spilled] = self.segments[spilled:self.size]
+        self.size -= spilled
+        self.spilled += spilled
+
+    def spill_all(self, t_close: float):
+        """Fecha o segmento aberto e despeja tudo (identidade expirada)."""
+        if self.store.path is None or not self.size:
+            return
+        if np.isnan(self.segments["t_out"][self.size - 1]):
+            self.close_last(t_close)
+        self.store.spill(self.global_id, self.segments[:self.size])
+        self.spilled += self.size
+        self.size = 0
+
+    @classmethod
+    def restore(cls, global_id: int, store: CameraHistoryStore, segments: np.ndarray, spilled: int) -> "CameraHistory":
+        """Histórico recuperado de um checkpoint (os índices de câmara já devem ser os de `store`)."""
+        history = cls.__new__(cls)
+        history.global_id = global_id
+        history.store = store
+        history.segments = np.empty(max(4, segments.shape[0]), dtype=SEGMENT_DTYPE)
+        history.segments[:segments.shape[0]] = segments
+        history.size = segments.shape[0]
+        history.spilled = spilled
+        return history
+
+    def in_memory(self) -> np.ndarray:
+        return self.segments[:self.size]
+
+    def to_array(self) -> np.ndarray:
+        """Histórico completo (segmentos despejados seguidos dos que estão em memória)."""
+        return self.store.assemble(self.global_id, self.in_memory(), self.spilled)
@@ -0,0 +1,70 @@
+# core/ExpiryIndex.py
+from collections import OrderedDict
+
+
+class ExpiryIndex:
+    """
+    Identidades ordenadas por last_seen, em duas fases:
+      * ativas: ainda na galeria de matching;
+      * dormentes: já fora da galeria (perdidas há mais de MAX_TIME_LOST), mas ainda retidas.
+
+    Cada atualização move a identidade para o fim do OrderedDict (O(1)), pelo que a frente
+    contém sempre as mais antigas e a expiração custa O(expiradas) amortizado. As atualizações
+    chegam quase por ordem temporal; um desvio (ex.: despejos coalescidos) apenas atrasa a
+    expiração de uma entrada até a frente expirar, e o matching mantém o seu próprio filtro de tempo.
+
+    As mutações exigem o lock da partição. O last_seen da frente de cada fase é mantido em floats
+    simples, para que next_deadline possa ser lido por outras threads sem lock (nunca percorre os dicts).
+    """
+    def __init__(self):
+        self._active: OrderedDict[int, float] = OrderedDict()
+        self._dormant: OrderedDict[int, float] = OrderedDict()
+        self._oldest_active = float('inf')
+        self._oldest_dormant = float('inf')
+
+    def _refresh_fronts(self):
+        self._oldest_active = next(iter(self._active.values())) if self._active else float('inf')
+        self._oldest_dormant = next(iter(self._dormant.values())) if self._dormant else float('inf')
+
+    def __len__(self) -> int:
+        return len(self._active) + len(self._dormant)
+
+    def touch(self, global_id: int, last_seen: float):
+        self._dormant.pop(global_id, None)
+        self._active[global_id] = last_seen
+        self._active.move_to_end(global_id)
+        self._refresh_fronts()
+
+    def discard(self, global_id: int):
+        self._active.pop(global_id, None)
+        self._dormant.pop(global_id, None)
+        self._refresh_fronts()
+
+    @staticmethod
+    def _pop_older_than(entries: OrderedDict, cutoff: float) -> list:
+        popped = []
+        while entries:
+            global_id, last_seen = next(iter(entries.items()))
+            if last_seen >= cutoff:
+                break
+            entries.popitem(last=False)
+            popped.append((global_id, last_seen))
+        return popped
+
+    def pop_stale(self, cutoff: float) -> list[int]:
+        """Passa a dormentes (e devolve) as identidades ativas com last_seen anterior a `cutoff`."""
+        stale = self._pop_older_than(self._active, cutoff)
+        for global_id, last_seen in stale:
+            self._dormant[global_id] = last_seen
+        self._refresh_fronts()
+        return [global_id for global_id, _ in stale]
+
+    def pop_expired(self, cutoff: float) -> list[int]:
+        """Retira (e devolve) as identidades dormentes com last_seen anterior a `cutoff`."""
+        expired = [global_id for global_id, _ in self._pop_older_than(self._dormant, cutoff)]
+        self._refresh_fronts()
+        return expired
+
+    def next_deadline(self, stale_after: float, expire_after: float) -> float:
+        """Instante a partir do qual há trabalho de expiração pendente. Pode ser lido sem o lock."""
+        return min(self._oldest_active + stale_after, self._oldest_dormant + expire_after)
@@ -0,0 +1,212 @@
+# core/GalleryIndex.py
+import logging
+import threading
+import numpy as np
+
+
+class IVFGalleryIndex:
+    """
+    Índice aproximado (IVF) sobre a IdentityGallery para podar candidatos no Re-ID.
+
+    A pesquisa é particionada em três níveis:
+      * Tempo: apenas slots vistos dentro de MAX_TIME_LOST;
+      * Ambiente: os slots do ambiente da câmara da consulta (CameraClusterManager) são
+        sempre avaliados de forma exata, pois é aí que atuam a recuperação fantasma e o limiar rigoroso;
+      * Aparência: nos restantes ambientes só são visitadas as `n_probe` listas invertidas
+        cujos centróides estão mais próximos da consulta.
+
+    Com `lock` (o lock da partição dona da galeria), o k-means corre numa thread própria sobre uma
+    cópia das features e só a troca dos centróides é feita sob o lock; sem ele, o treino é síncrono.
+    As estatísticas têm um lock próprio, porque as consultas a snapshots correm sem o lock da partição.
+    """
+    def __init__(self, gallery, n_lists: int = None, n_probe: int = 4, min_train_size: int = 1000,
+                 retrain_growth: float = 2.0, kmeans_iterations: int = 10,
+                 lock: threading.Lock = None):
+        self.gallery = gallery
+        self.lock = lock
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.min_train_size = min_train_size
+        self.retrain_growth = retrain_growth
+        self.kmeans_iterations = kmeans_iterations
+
+        self.centroids = None
+        self.slot_list = np.full(0, -1, dtype=np.int32)
+        self._trained_size = 0
+        self._training = None     # Thread de treino em curso (modo assíncrono)
+        self._rng = np.random.default_rng(0)
+
+        # Estatísticas para reportar custo e recall face à pesquisa exata
+        self._stats_lock = threading.Lock()
+        self.queries = 0
+        self.visited_fraction_sum = 0.0
+        self.recall_samples = 0
+        self.recall_hits = 0
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def _ensure_capacity(self):
+        if self.slot_list.shape[0] < self.gallery.capacity:
+            grown = np.full(self.gallery.capacity, -1, dtype=np.int32)
+            grown[:self.slot_list.shape[0]] = self.slot_list
+            self.slot_list = grown
+
+    @staticmethod
+    def _normalize(features: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(features, axis=-1, keepdims=True)
+        return features / np.maximum(norms, 1e-12)
+
+    def _kmeans(self, data: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+        """K-means esférico simples (produto interno sobre vetores normalizados)."""
+        centroids = data[rng.choice(data.shape[0], size=k, replace=False)].copy()
+        for _ in range(self.kmeans_iterations):
+            assign = np.argmax(data @ centroids.T, axis=1)
+            # Somas por lista numa só operação (sem ciclo Python sobre os centróides)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, data)
+            counts = np.bincount(assign, minlength=k)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+            centroids = self._normalize(centroids)
+        return centroids.astype(np.float32)
+
+    def _training_data(self) -> tuple[np.ndarray, int]:
+        """Cópia normalizada das features vivas e número de listas. Exige o lock."""
+        live = np.flatnonzero(self.gallery.live_mask())
+        data = self._normalize(self.gallery.features[live])
+        k = self.n_lists or max(1, int(np.sqrt(live.size)))
+        return data, min(k, live.size)
+
+    def _install(self, centroids: np.ndarray, trained_size: int):
+        """Troca os centróides e reatribui as listas dos slots vivos. Exige o lock."""
+        self.centroids = centroids
+        self._ensure_capacity()
+        live = np.flatnonzero(self.gallery.live_mask())
+        self.slot_list[:] = -1
+        if live.size:
+            self.slot_list[live] = np.argmax(self._normalize(self.gallery.features[live]) @ centroids.T, axis=1)
+        self._trained_size = trained_size
+        logging.info(f"Índice IVF treinado: {centroids.shape[0]} listas sobre {trained_size} identidades.")
+
+    def _train(self):
+        data, k = self._training_data()
+        self._install(self._kmeans(data, k, self._rng), data.shape[0])
+
+    def _train_in_background(self, data: np.ndarray, k: int, rng: np.random.Generator):
+        try:
+            centroids = self._kmeans(data, k, rng)
+        except Exception as e:
+            logging.error(f"Falha no treino do índice IVF: {e}")
+            centroids = None
+        # Instalação e fim do treino sob o mesmo lock: maybe_train nunca vê um treino já terminado como em curso
+        with self.lock:
+            try:
+                if centroids is not None:
+                    self._install(centroids, data.shape[0])
+            except Exception as e:
+                logging.error(f"Falha ao instalar o índice IVF: {e}")
+            finally:
+                self._training = None
+
+    def maybe_train(self):
+        """(Re)treina quando a galeria cresce o suficiente. Exige o lock; em modo assíncrono não bloqueia."""
+        size = len(self.gallery)
+        if size < self.min_train_size or self._training is not None:
+            return
+        if self.is_trained and size < self._trained_size * self.retrain_growth:
+            return
+        if self.lock is None:
+            self._train()
+            return
+        data, k = self._training_data()
+        self._training = threading.Thread(
+            target=self._train_in_background,
+            args=(data, k, np.random.default_rng(self._rng.integers(1 << 32))),
+            daemon=True,
+            name="IVFTrainer"
+        )
+        self._training.start()
+
+    def wait_for_training(self, timeout: float = None):
+        """Espera pelo treino em curso (se houver). Não pode ser chamado com o lock da partição."""
+        training = self._training
+        if training is not None:
+            training.join(timeout)
+
+    def on_upsert(self, slot: int):
+        self._ensure_capacity()
+        if self.is_trained:
+            feature = self._normalize(self.gallery.features[slot])
+            self.slot_list[slot] = int(np.argmax(self.centroids @ feature))
+
+    def on_remove(self, slot: int):
+        if slot < self.slot_list.shape[0]:
+            self.slot_list[slot] = -1
+
+    def snapshot_slots(self) -> np.ndarray:
+        """Cópia da atribuição slot -> lista, para acompanhar um snapshot da galeria."""
+        self._ensure_capacity()
+        return self.slot_list[:self.gallery._high_water].copy()
+
+    def candidates(self, query: np.ndarray, env_camera_mask: np.ndarray, current_time: float, max_time_lost: float,
+                   gallery=None, slot_list: np.ndarray = None, centroids: np.ndarray = None):
+        """
+        Devolve a máscara de slots plausíveis para a consulta,
+        ou None quando o índice ainda não está treinado (pesquisa exata).
+        `gallery`/`slot_list`/`centroids` permitem consultar um snapshot em vez da galeria viva.
+        """
+        if gallery is None:
+            if not self.is_trained:
+                return None
+            self._ensure_capacity()
+            gallery, slot_list, centroids = self.gallery, self.slot_list, self.centroids
+        elif centroids is None:
+            return None
+        n = gallery._high_water
+
+        # Partição temporal: slots vistos dentro da janela de MAX_TIME_LOST
+        mask = gallery.slot_gids[:n] >= 0
+        mask &= gallery.last_seen[:n] >= current_time - max_time_lost
+        live_in_window = int(mask.sum())
+
+        # Partição por ambiente: o ambiente da própria câmara é sempre pesquisado
+        cam_idx = gallery.camera_idx[:n]
+        same_env = np.zeros(n, dtype=bool)
+        if env_camera_mask.size:
+            known = (cam_idx >= 0) & (cam_idx < env_camera_mask.size)
+            same_env[known] = env_camera_mask[cam_idx[known]]
+
+        # Partição por aparência: listas invertidas mais próximas da consulta
+        query = self._normalize(np.asarray(query, dtype=np.float32))
+        n_probe = min(self.n_probe, centroids.shape[0])
+        probed = np.argpartition(-(centroids @ query), n_probe - 1)[:n_probe]
+        mask &= same_env | np.isin(slot_list[:n], probed)
+
+        visited_fraction = float(mask.sum()) / live_in_window if live_in_window else 0.0
+        with self._stats_lock:
+            self.queries += 1
+            self.visited_fraction_sum += visited_fraction
+        return mask
+
+    def record_recall(self, approx_gid, exact_gid) -> int:
+        """Regista uma amostra de recall e devolve o total de amostras (não exige o lock da partição)."""
+        with self._stats_lock:
+            self.recall_samples += 1
+            if approx_gid == exact_gid:
+                self.recall_hits += 1
+            return self.recall_samples
+
+    def get_stats(self) -> dict:
+        centroids = self.centroids
+        with self._stats_lock:
+            return {
+                "trained": centroids is not None,
+                "lists": 0 if centroids is None else int(centroids.shape[0]),
+                "n_probe": self.n_probe,
+                "queries": self.queries,
+                "avg_visited_fraction": self.visited_fraction_sum / self.queries if self.queries else 1.0,
+                "recall_samples": self.recall_samples,
+                "recall": self.recall_hits / self.recall_samples if self.recall_samples else None,
+            }
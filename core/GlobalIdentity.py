@@ -1,12 +1,23 @@
 # core/GlobalIdentity.py
 import numpy as np
-import time
 from datetime import datetime
 
+from core.CameraHistoryStore import CameraHistoryStore, CameraHistory
+
+# Pesos da média móvel exponencial da aparência (vetor antigo / observação nova)
+FEATURE_EMA_MOMENTUM = 0.9
+FEATURE_EMA_NEW_WEIGHT = 0.1
+
+# Armazém em memória (sem despejo) para identidades criadas sem armazém próprio
+_IN_MEMORY_HISTORY = CameraHistoryStore()
+
 class GlobalIdentity:
-    def __init__(self, global_id: int, initial_feature: np.ndarray, bbox: list, initial_cam_id: str, start_time: float):
+    def __init__(self, global_id: int, initial_feature: np.ndarray, bbox: list, initial_cam_id: str, start_time: float,
+                 color_signature: np.ndarray = None, history_store: CameraHistoryStore = None):
         self.global_id = global_id
         self.feature_vector = initial_feature
+        # Assinatura de cor (pré-filtro do Re-ID), também em média móvel
+        self.color_signature = color_signature
         self.last_bbox = bbox
         
         self.first_seen = start_time
@@ -16,12 +27,50 @@ class GlobalIdentity:
         # será calculada dinamicamente pelo Manager.
         self.current_camera = initial_cam_id
         self.last_seen_per_camera = {initial_cam_id: start_time}
-        self.camera_history = [[initial_cam_id, start_time, None]]
+        # Segmentos (câmara, entrada, saída) em colunas, limitados em memória e despejados para disco
+        self.history = CameraHistory(global_id, history_store or _IN_MEMORY_HISTORY, initial_cam_id, start_time)
+        # Fim da última visita a ambiente já entregue à exportação contínua
+        self.exported_until = float('-inf')
+
+    @classmethod
+    def restore(cls, global_id: int, feature_vector: np.ndarray, bbox: list, cam_id: str, first_seen: float, last_seen: float,
+                history: CameraHistory, color_signature: np.ndarray = None, exported_until: float = float('-inf')) -> "GlobalIdentity":
+        """Identidade recuperada de um checkpoint (arranque a quente)."""
+        identity = cls(global_id, feature_vector, bbox, cam_id, first_seen, color_signature, history.store)
+        identity.last_seen = last_seen
+        identity.last_seen_per_camera = {cam_id: last_seen}
+        identity.history = history
+        identity.exported_until = exported_until
+        return identity
 
-    def update(self, new_feature_vector: np.ndarray, bbox: list, cam_id: str, current_time: float, switch_cooldown: float = 2.0) -> bool:
+    def update(self, new_feature_vector: np.ndarray, bbox: list, cam_id: str, current_time: float, switch_cooldown: float = 2.0,
+               color_signature: np.ndarray = None) -> bool:
         if new_feature_vector is not None:
-            self.feature_vector = 0.9 * self.feature_vector + 0.1 * new_feature_vector
-            
+            self.feature_vector = FEATURE_EMA_MOMENTUM * self.feature_vector + FEATURE_EMA_NEW_WEIGHT * new_feature_vector
+        self._update_color(color_signature)
+        return self._register_sighting(bbox, cam_id, current_time, switch_cooldown)
+
+    def update_coalesced(self, feature_decay: float, feature_increment: np.ndarray, bbox: list, cam_id: str, current_time: float, switch_cooldown: float = 2.0,
+                         color_signature: np.ndarray = None) -> bool:
+        """
+        Aplica de uma só vez várias atualizações acumuladas num IdentityUpdateBuffer.
+        A EMA combinada (decay * f + incremento) é idêntica a aplicar as atualizações uma a uma.
+        A cor entra como uma única observação (a mais recente do buffer).
+        """
+        if feature_increment is not None:
+            self.feature_vector = feature_decay * self.feature_vector + feature_increment
+        self._update_color(color_signature)
+        return self._register_sighting(bbox, cam_id, current_time, switch_cooldown)
+
+    def _update_color(self, color_signature: np.ndarray):
+        if color_signature is None:
+            return
+        if self.color_signature is None:
+            self.color_signature = color_signature
+        else:
+            self.color_signature = FEATURE_EMA_MOMENTUM * self.color_signature + FEATURE_EMA_NEW_WEIGHT * color_signature
+
+    def _register_sighting(self, bbox: list, cam_id: str, current_time: float, switch_cooldown: float) -> bool:
         self.last_bbox = bbox
         self.last_seen = current_time
         self.last_seen_per_camera[cam_id] = current_time
@@ -32,25 +81,14 @@ class GlobalIdentity:
             if time_since_primary > switch_cooldown:
                 time_of_exit = self.last_seen_per_camera[self.current_camera]
                 
-                if self.camera_history:
-                    self.camera_history[-1][2] = time_of_exit
+                self.history.close_last(time_of_exit)
                 
                 self.current_camera = cam_id
-                self.camera_history.append([cam_id, time_of_exit, None])
+                self.history.open(cam_id, time_of_exit)
                 return True 
             return False 
         return False 
 
     def get_raw_history(self) -> list[dict]:
         """Retorna o histórico bruto. O Manager é quem o transformará em histórico de ambientes."""
-        raw_data = []
-        for record in self.camera_history:
-            cam_id, t_in, t_out = record
-            if t_out is None:
-                t_out = time.time()
-            raw_data.append({
-                "camera_id": cam_id,
-                "timestamp_in": t_in,
-                "timestamp_out": t_out
-            })
-        return raw_data
\ No newline at end of file
+        return self.history.store.raw_records(self.history.to_array())
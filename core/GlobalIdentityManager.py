@@ -3,15 +3,30 @@ import threading
 import csv
 import time
 import logging
+import random
 import numpy as np
+from collections import deque
+from contextlib import ExitStack
 from datetime import datetime
-from scipy.spatial.distance import cosine
+from scipy.optimize import linear_sum_assignment
 
 from core.GlobalIdentity import GlobalIdentity
+from core.CameraHistoryStore import CameraHistoryStore, CameraHistory, SEGMENT_DTYPE
+from core.IdentitySnapshot import IdentitySnapshot
+from core.IdentityCheckpoint import write_checkpoint, read_checkpoint, snapshot_to_arrays
 from core.CameraClusterManager import CameraClusterManager
+from core.IdentityShard import IdentityShard
+from core.GalleryIndex import IVFGalleryIndex
+
+# Custo usado no Húngaro para pares proibidos (nunca aceites como associação)
+_INVALID_COST = 1e6
+
+def _log_expired_identity(identity: GlobalIdentity):
+    logging.debug(f"Re-ID Evento: ID {identity.global_id} expirou (última vez visto na {identity.current_camera}).")
+
 
 class GlobalIdentityManager:
-    def __init__(self, config=None):
+    def __init__(self, config=None, expiry_sink=None):
         self.config = config
         
         # Limiares Separados
@@ -27,10 +42,56 @@ class GlobalIdentityManager:
         
         self.frame_w = getattr(config, 'PROCESSING_WIDTH', 640)
         self.frame_h = getattr(config, 'PROCESSING_HEIGHT', 480)
-        
-        self.identities: dict[int, GlobalIdentity] = {}  
-        self.next_global_id = 1
-        self._lock = threading.Lock() 
+
+        # Índice aproximado opcional (poda de candidatos em galerias grandes), um por partição
+        index_factory = None
+        if getattr(config, 'REID_ANN_INDEX', False):
+            # O k-means corre fora do lock da partição; só a troca dos centróides o adquire
+            index_factory = lambda gallery, lock: IVFGalleryIndex(
+                gallery,
+                n_lists=getattr(config, 'REID_ANN_N_LISTS', None),
+                n_probe=getattr(config, 'REID_ANN_N_PROBE', 4),
+                min_train_size=getattr(config, 'REID_ANN_MIN_GALLERY_SIZE', 1000),
+                lock=lock
+            )
+        self.recall_sample_rate = getattr(config, 'REID_ANN_RECALL_SAMPLE_RATE', 0.02)
+
+        # Pré-filtro de cor: só os candidatos com assinatura de cor próxima chegam aos embeddings
+        self.color_prefilter_threshold = None
+        if getattr(config, 'COLOR_PREFILTER', False):
+            self.color_prefilter_threshold = getattr(config, 'COLOR_PREFILTER_THRESHOLD', 0.6)
+        self.index_report_interval = getattr(config, 'REID_ANN_REPORT_INTERVAL', 1000)
+
+        # Armazém particionado: cada ambiente de câmaras vive numa partição com lock próprio,
+        # para que câmaras em zonas não relacionadas do edifício nunca disputem o mesmo lock.
+        self.shards = [
+            IdentityShard(i, index_factory, getattr(config, 'SHARD_SNAPSHOT_MAX_AGE', 0.2))
+            for i in range(max(1, getattr(config, 'IDENTITY_SHARDS', 8)))
+        ]
+        self._camera_shard: dict[str, IdentityShard] = {}
+        self._identity_shard: dict[int, IdentityShard] = {}
+        self._routing_lock = threading.Lock()
+        self._cluster_lock = threading.Lock()
+        self._pending_rebalance: set = set()
+
+        self._id_lock = threading.Lock()
+
+        # Histórico de câmaras limitado em memória; os segmentos antigos vão para um ficheiro só de acrescento
+        self.history_store = CameraHistoryStore(
+            path=getattr(config, 'CAMERA_HISTORY_SPILL_PATH', None),
+            memory_cap=getattr(config, 'CAMERA_HISTORY_MEMORY_CAP', 64)
+        )
+        # Nunca reutiliza ids que já têm histórico no ficheiro de despejo (execuções anteriores)
+        self.next_global_id = self.history_store.max_global_id() + 1
+
+        # Identidades expiradas são entregues a um destino configurável (fora dos locks)
+        self.expiry_sink = expiry_sink or _log_expired_identity
+        self._expired_outbox = deque()
+        self.export_writer = None
+
+        # Snapshot versionado do estado das identidades para leituras (relatórios, exportação, consultas)
+        self._state_snapshot: IdentitySnapshot = None
+        self._state_snapshot_lock = threading.Lock()
 
     def _get_center(self, bbox: list) -> np.ndarray:
         x1, y1, x2, y2 = bbox
@@ -42,117 +103,504 @@ class GlobalIdentityManager:
         margin_y = self.frame_h * 0.05 
         return (x1 < margin_x) or (y1 < margin_y) or (x2 > self.frame_w - margin_x) or (y2 > self.frame_h - margin_y)
 
-    def _cleanup_old_identities(self, current_time: float):
-        ids_to_remove = [
-            gid for gid, ident in self.identities.items() 
-            if (current_time - ident.last_seen) > self.max_time_lost * 2
-        ]
-        for gid in ids_to_remove:
-            del self.identities[gid]
+    # =========================================================
+    # ENCAMINHAMENTO ENTRE PARTIÇÕES
+    # =========================================================
+    def _shard_for_camera(self, cam_id: str) -> IdentityShard:
+        shard = self._camera_shard.get(cam_id)
+        if shard is not None:
+            return shard
+
+        with self._routing_lock:
+            shard = self._camera_shard.get(cam_id)
+            if shard is None:
+                # Câmaras do mesmo ambiente partilham partição; um ambiente novo vai para a menos ocupada
+                root = self.cluster_manager.find(cam_id)
+                for other_cam, other_shard in self._camera_shard.items():
+                    if self.cluster_manager.find(other_cam) == root:
+                        shard = other_shard
+                        break
+                if shard is None:
+                    load = {s.shard_id: 0 for s in self.shards}
+                    for other_shard in self._camera_shard.values():
+                        load[other_shard.shard_id] += 1
+                    shard = self.shards[min(load, key=load.get)]
+                self._camera_shard[cam_id] = shard
+            return shard
+
+    @staticmethod
+    def _locked(*shards) -> ExitStack:
+        """Adquire os locks das partições indicadas por ordem de shard_id (evita deadlocks)."""
+        stack = ExitStack()
+        for shard in sorted(set(shards), key=lambda s: s.shard_id):
+            stack.enter_context(shard.lock)
+        return stack
+
+    def _new_global_id(self) -> int:
+        with self._id_lock:
+            new_id = self.next_global_id
+            self.next_global_id += 1
+            return new_id
+
+    def set_expiry_sink(self, sink):
+        """Define quem recebe as identidades expiradas (ex.: exportação contínua)."""
+        self.expiry_sink = sink or _log_expired_identity
+
+    def attach_export_writer(self, writer):
+        """
+        Exportação contínua: as visitas fechadas seguem para `writer` a cada troca de câmara e,
+        na expiração, todas as que faltam. O caminho crítico só enfileira; as visitas são
+        agregadas na thread do escritor (collect_closed_visits).
+        """
+        writer.resolve = self.collect_closed_visits
+        self.export_writer = writer
+        self.set_expiry_sink(lambda identity: writer.submit((identity, True)))
+
+    def _notify_camera_switch(self, identity: GlobalIdentity):
+        if self.export_writer is not None:
+            self.export_writer.submit((identity, False))
+
+    def collect_closed_visits(self, identity: GlobalIdentity, final: bool) -> list[dict]:
+        """
+        Visitas a ambientes ainda não exportadas de uma identidade. Sem `final`, a última visita
+        continua aberta e fica para depois; com `final` (expiração/encerramento) sai tudo.
+        """
+        in_memory = None
+        while in_memory is None:
+            shard = self._identity_shard.get(identity.global_id)
+            if shard is None:
+                break
+            with shard.lock:
+                # A identidade pode ter mudado de partição entretanto.
+                # Sob o lock só se copia a parte em memória; o ficheiro de despejo é lido depois.
+                if shard.identities.get(identity.global_id) is identity:
+                    in_memory, spilled = identity.history.in_memory().copy(), identity.history.spilled
+        if in_memory is None:
+            if not final:
+                return []   # Já expirou: a expiração exporta o resto
+            segments = identity.history.to_array()
+        else:
+            segments = identity.history.store.assemble(identity.global_id, in_memory, spilled)
+
+        segments = segments[segments["t_in"] >= identity.exported_until]
+        raw = identity.history.store.raw_records(segments, open_until=identity.last_seen)
+        visits = self._aggregate_history_by_clusters(identity.global_id, raw)
+        if not final:
+            visits = visits[:-1]
+        if visits:
+            identity.exported_until = visits[-1]["timestamp_out"]
+        return visits
+
+    def export_open_visits(self):
+        """No encerramento: entrega ao escritor as visitas por exportar das identidades ainda vivas."""
+        if self.export_writer is None:
+            return
+        for shard in self.shards:
+            with shard.lock:
+                identities = list(shard.identities.values())
+            for identity in identities:
+                self.export_writer.submit((identity, True))
+
+    def _evict_locked(self, shard: IdentityShard, global_id: int):
+        identity = shard.remove(global_id)
+        if identity is None:
+            return
+        if self._identity_shard.get(global_id) is shard:
+            del self._identity_shard[global_id]
+        self._expired_outbox.append(identity)
+
+    def _expire_identities(self, shard: IdentityShard, current_time: float):
+        """
+        Expiração amortizada O(expiradas), guiada pelo ExpiryIndex da partição. Exige o lock.
+        Perdidas há mais de MAX_TIME_LOST saem da galeria; há mais do dobro, saem da partição.
+        """
+        for gid in shard.expiry.pop_stale(current_time - self.max_time_lost):
+            shard.retire_from_gallery(gid)
+        for gid in shard.expiry.pop_expired(current_time - self.max_time_lost * 2):
+            self._evict_locked(shard, gid)
+
+    def _expire_idle_shards(self, current_time: float, skip: IdentityShard = None):
+        """Partições sem atividade também expiram, sem nunca esperar por um lock ocupado."""
+        for shard in self.shards:
+            if shard is skip or shard.expiry.next_deadline(self.max_time_lost, self.max_time_lost * 2) > current_time:
+                continue
+            if shard.lock.acquire(blocking=False):
+                try:
+                    self._expire_identities(shard, current_time)
+                finally:
+                    shard.lock.release()
+
+    def _dispatch_expired(self):
+        while self._expired_outbox:
+            try:
+                identity = self._expired_outbox.popleft()
+            except IndexError:
+                break
+            # O histórico restante vai para disco: continua consultável depois da expiração
+            identity.history.spill_all(identity.last_seen)
+            try:
+                self.expiry_sink(identity)
+            except Exception as e:
+                logging.error(f"Falha no destino de identidades expiradas (ID {identity.global_id}): {e}")
+
+    def _finish_call(self, current_time: float, home: IdentityShard = None):
+        """Trabalho adiado para depois de libertados os locks da chamada pública."""
+        if self._pending_rebalance:
+            self._rebalance_clusters()
+        self._expire_idle_shards(current_time, skip=home)
+        if self._expired_outbox:
+            self._dispatch_expired()
+
+    def _sync_gallery(self, shard: IdentityShard, identity_obj: GlobalIdentity):
+        """Reflete na galeria vetorizada da partição o estado atual da identidade."""
+        shard.upsert(
+            identity_obj,
+            self._get_center(identity_obj.last_bbox),
+            self._is_near_edge(identity_obj.last_bbox)
+        )
+        self._identity_shard[identity_obj.global_id] = shard
+
+    def _relocate(self, identity_obj: GlobalIdentity, source: IdentityShard, target: IdentityShard):
+        """Move uma identidade entre partições. Exige os locks de ambas, o que torna a troca atómica."""
+        source.remove(identity_obj.global_id)
+        self._sync_gallery(target, identity_obj)
+
+    def _rebalance_clusters(self):
+        """Após a fusão de ambientes, junta na mesma partição as câmaras (e identidades) do ambiente fundido."""
+        with self._routing_lock:
+            pending, self._pending_rebalance = self._pending_rebalance, set()
+        for cam_id in pending:
+            root = self.cluster_manager.find(cam_id)
+            target = self._shard_for_camera(root)
+            members = [c for c in list(self._camera_shard) if self.cluster_manager.find(c) == root]
+            sources = {self._camera_shard[c] for c in members} - {target}
+            if not sources:
+                continue
+
+            with self._locked(target, *sources), self._routing_lock:
+                moved = {c for c in members if self._camera_shard.get(c) in sources}
+                for c in moved:
+                    self._camera_shard[c] = target
+                for source in sources:
+                    for identity in [i for i in source.identities.values() if i.current_camera in moved]:
+                        self._relocate(identity, source, target)
+            logging.info(f"Partições: câmaras {sorted(moved)} movidas para a partição {target.shard_id} (Ambiente_{root}).")
+
+    def _environment_camera_mask(self, gallery, cam_id: str) -> np.ndarray:
+        """Máscara (por índice de câmara da galeria) das câmaras no mesmo ambiente que `cam_id`."""
+        root = self.cluster_manager.find(cam_id)
+        return np.array([self.cluster_manager.find(c) == root for c in gallery.camera_ids], dtype=bool)
+
+    # =========================================================
+    # PONTUAÇÃO E ASSOCIAÇÃO
+    # =========================================================
+    def _score_view(self, view, features: np.ndarray, centers: np.ndarray, cam_id: str, current_time: float,
+                    active_global_ids: set, sample_exact: bool, colors: np.ndarray = None):
+        score_kwargs = dict(
+            queries=features,
+            centers=centers,
+            cam_id=cam_id,
+            current_time=current_time,
+            exclude_gids=active_global_ids,
+            intra_threshold=self.intra_camera_threshold,
+            inter_threshold=self.inter_camera_threshold,
+            max_time_lost=self.max_time_lost,
+            max_spatial_distance=self.max_spatial_distance,
+            query_colors=colors,
+            color_threshold=self.color_prefilter_threshold
+        )
+        exact = view.gallery.score(**score_kwargs)
+        if view.index is None:
+            return exact, exact
+
+        env_mask = self._environment_camera_mask(view.gallery, cam_id)
+        if view.is_snapshot:
+            masks = [view.index.candidates(f, env_mask, current_time, self.max_time_lost,
+                                           gallery=view.gallery, slot_list=view.slot_list, centroids=view.centroids)
+                     for f in features]
+        else:
+            view.index.maybe_train()
+            masks = [view.index.candidates(f, env_mask, current_time, self.max_time_lost) for f in features]
+        if masks[0] is None:
+            return exact, exact
+
+        approx = view.gallery.score(candidate_masks=np.stack(masks), **score_kwargs)
+        # A pesquisa exata só é mantida nas consultas amostradas para medir o recall do índice
+        return approx, (exact if sample_exact else None)
+
+    @staticmethod
+    def _drop_columns(scored: tuple, gids_to_drop: np.ndarray) -> tuple:
+        gids, cost = scored
+        keep = ~np.isin(gids, gids_to_drop)
+        return gids[keep], cost[:, keep]
+
+    @staticmethod
+    def _solve_assignment(gids: np.ndarray, cost: np.ndarray) -> list:
+        """Associação ótima (Húngaro) entre consultas e identidades; None onde não há par válido."""
+        matches = [None] * cost.shape[0]
+        if gids.size == 0:
+            return matches
+        finite = np.isfinite(cost)
+        if not finite.any():
+            return matches
+        rows, cols = linear_sum_assignment(np.where(finite, cost, _INVALID_COST))
+        for r, c in zip(rows, cols):
+            if finite[r, c]:
+                matches[r] = (int(gids[c]), float(cost[r, c]))
+        return matches
+
+    def get_index_stats(self) -> dict:
+        stats = {}
+        for shard in self.shards:
+            if shard.index is not None:
+                stats[shard.shard_id] = shard.index.get_stats()
+        return stats
+
+    def _record_recall(self, shard: IdentityShard, matches: list, exact_matches: list):
+        """Regista o recall no índice da partição da câmara (as estatísticas do índice têm lock próprio)."""
+        report = False
+        for approx_match, exact_match in zip(matches, exact_matches):
+            samples = shard.index.record_recall(approx_match and approx_match[0], exact_match and exact_match[0])
+            report |= samples % self.index_report_interval == 0
+        if report:
+            logging.info(f"Índice Re-ID: {self.get_index_stats()}")
 
     def _check_and_update_clusters(self, identity_obj: GlobalIdentity, cam_id: str, current_time: float):
         for old_cam, last_t in identity_obj.last_seen_per_camera.items():
             if old_cam != cam_id and (current_time - last_t) <= self.auto_cluster_threshold:
-                if self.cluster_manager.union(cam_id, old_cam):
+                # find() sem lock é seguro (só encurta caminhos); a união é serializada
+                if self.cluster_manager.find(cam_id) == self.cluster_manager.find(old_cam):
+                    continue
+                with self._cluster_lock:
+                    merged = self.cluster_manager.union(cam_id, old_cam)
+                if merged:
                     root_cluster = self.cluster_manager.find(cam_id)
                     logging.info(f" Mapeamento: Câmaras '{cam_id}' e '{old_cam}' fundidas no 'Ambiente_{root_cluster}'.")
+                    with self._routing_lock:
+                        self._pending_rebalance.add(cam_id)
+
+    def _update_locked(self, source: IdentityShard, target: IdentityShard, identity: GlobalIdentity, cam_id: str, current_time: float, mutate) -> bool:
+        """Corpo comum das atualizações. Exige os locks de `source` e `target`."""
+        self._check_and_update_clusters(identity, cam_id, current_time)
+        mudou_de_camera = mutate(identity)
+        if mudou_de_camera:
+            self._notify_camera_switch(identity)
+        if mudou_de_camera and source is not target:
+            self._relocate(identity, source, target)
+        else:
+            self._sync_gallery(source, identity)
+        return mudou_de_camera
+
+    def _is_expired_locked(self, source: IdentityShard, identity: GlobalIdentity, current_time: float) -> bool:
+        if (current_time - identity.last_seen) <= self.max_time_lost * 2:
+            return False
+        # A expiração da partição ainda não tinha passado por esta identidade
+        self._evict_locked(source, identity.global_id)
+        return True
+
+    def _apply_update(self, global_id: int, cam_id: str, current_time: float, mutate):
+        """
+        Atualiza uma identidade onde quer que esteja. Os locks da partição atual e da partição
+        da câmara são adquiridos juntos, para que uma troca de câmara mova a identidade de forma atómica.
+        Devolve (identidade, mudou_de_camera) ou (None, False) se a identidade já não existir.
+        """
+        while True:
+            source = self._identity_shard.get(global_id)
+            if source is None:
+                return None, False
+            target = self._shard_for_camera(cam_id)
+
+            with self._locked(source, target):
+                # O encaminhamento pode ter mudado enquanto esperávamos pelos locks
+                if self._identity_shard.get(global_id) is not source or self._camera_shard.get(cam_id) is not target:
+                    continue
+                identity = source.identities[global_id]
+                if self._is_expired_locked(source, identity, current_time):
+                    return None, False
+                return identity, self._update_locked(source, target, identity, cam_id, current_time, mutate)
+
+    def update_existing_identity(self, global_id: int, new_feature_vector, bbox: list, cam_id: str, current_time: float,
+                                 color_signature=None):
+        self._apply_update(
+            global_id, cam_id, current_time,
+            lambda identity: identity.update(new_feature_vector, bbox, cam_id, current_time, switch_cooldown=self.switch_cooldown,
+                                             color_signature=color_signature)
+        )
+        self._finish_call(current_time)
+
+    def apply_updates(self, cam_id: str, updates: list):
+        """
+        Aplica em bloco as atualizações coalescidas de um IdentityUpdateBuffer:
+        um único par de locks por partição envolvida, em vez de um lock por faixa e por frame.
+        """
+        target = self._shard_for_camera(cam_id)
+        by_source: dict[IdentityShard, list] = {}
+        for update in updates:
+            source = self._identity_shard.get(update.global_id)
+            if source is not None:
+                by_source.setdefault(source, []).append(update)
+
+        def mutate_for(update):
+            return lambda identity: identity.update_coalesced(
+                update.feature_decay, update.feature_increment, update.bbox, cam_id, update.last_time, self.switch_cooldown,
+                update.color_signature
+            )
+
+        leftovers = []
+        latest_time = max((update.last_time for update in updates), default=None)
+        for source, group in by_source.items():
+            with self._locked(source, target):
+                self._expire_identities(source, latest_time)
+                routing_ok = self._camera_shard.get(cam_id) is target
+                for update in group:
+                    if not routing_ok or self._identity_shard.get(update.global_id) is not source:
+                        leftovers.append(update)
+                        continue
+                    identity = source.identities[update.global_id]
+                    if self._is_expired_locked(source, identity, update.last_time):
+                        continue
+                    self._update_locked(source, target, identity, cam_id, update.last_time, mutate_for(update))
+
+        # Identidades que mudaram de partição entretanto seguem o caminho individual
+        for update in leftovers:
+            self._apply_update(update.global_id, cam_id, update.last_time, mutate_for(update))
 
-    def update_existing_identity(self, global_id: int, new_feature_vector, bbox: list, cam_id: str, current_time: float):
-        with self._lock:
-            if global_id in self.identities:
-                identity = self.identities[global_id]
-                self._check_and_update_clusters(identity, cam_id, current_time)
-                identity.update(new_feature_vector, bbox, cam_id, current_time, switch_cooldown=self.switch_cooldown)
+        if latest_time is not None:
+            self._finish_call(latest_time, home=target)
 
-    def get_or_create_global_id(self, new_feature_vector, bbox: list, cam_id: str, current_time: float, active_global_ids: set = None):
+    def get_or_create_global_id(self, new_feature_vector, bbox: list, cam_id: str, current_time: float, active_global_ids: set = None,
+                                color_signature=None):
+        colors = None if color_signature is None else [color_signature]
+        return self.assign_global_ids([new_feature_vector], [bbox], cam_id, current_time, active_global_ids, colors)[0]
+
+    def _create_identity(self, shard: IdentityShard, feature_vector, bbox: list, cam_id: str, current_time: float,
+                         color_signature=None) -> int:
+        new_id = self._new_global_id()
+        nova_identidade = GlobalIdentity(
+            global_id=new_id,
+            initial_feature=feature_vector,
+            bbox=bbox,
+            initial_cam_id=cam_id,
+            start_time=current_time,
+            color_signature=color_signature,
+            history_store=self.history_store
+        )
+        self._sync_gallery(shard, nova_identidade)
+        logging.info(f"Re-ID Evento: Nova pessoa -> ID {new_id} na {cam_id}")
+        return new_id
+
+    def assign_global_ids(self, feature_vectors: list, bboxes: list, cam_id: str, current_time: float, active_global_ids: set = None,
+                          color_signatures: list = None) -> list[int]:
+        """
+        Atribui IDs globais a todas as novas faixas locais de um frame de uma só vez.
+        A matriz de custos é calculada numa passagem vetorizada e resolvida em conjunto
+        (linear_sum_assignment), pelo que o resultado não depende da ordem das faixas.
+        Com `color_signatures` (e COLOR_PREFILTER ativo), a cor poda os candidatos antes dos embeddings.
+
+        A partição da câmara é pesquisada de forma exata sob o seu lock (adquirido uma vez por frame);
+        as restantes partições são lidas a partir dos seus snapshots, sem lock.
+        """
         if active_global_ids is None:
             active_global_ids = set()
-            
-        best_match_id = None
-        best_distance = float('inf')
-        new_center = self._get_center(bbox)
+        if not feature_vectors:
+            return []
 
-        with self._lock:
-            self._cleanup_old_identities(current_time)
+        features = np.asarray(feature_vectors, dtype=np.float32)
+        centers = np.array([self._get_center(bbox) for bbox in bboxes])
+        colors = None
+        if color_signatures is not None and self.color_prefilter_threshold is not None:
+            colors = np.asarray(color_signatures, dtype=np.float32)
+        color_at = (lambda i: None) if color_signatures is None else (lambda i: color_signatures[i])
+        sample_exact = random.random() < self.recall_sample_rate
 
-            for global_id, identity_obj in self.identities.items():
-                
-                # Regra de Exclusão Mútua (Impede que a mesma câmera crie clones)
-                if global_id in active_global_ids:
-                    continue
-                    
-                time_lost = current_time - identity_obj.last_seen
-                
-                # Se passou muito tempo, a pessoa já não está no prédio / zona rastreável
-                if time_lost > self.max_time_lost:
+        assigned = [None] * len(feature_vectors)
+        foreign_matches = []
+        recall_sample = None
+
+        while True:
+            home = self._shard_for_camera(cam_id)
+            # Snapshots obtidos antes do lock da partição local (nunca se espera por outra partição com ele na mão)
+            snapshots = [s.get_snapshot(current_time) for s in self.shards if s is not home and len(s)]
+
+            with home.lock:
+                if self._camera_shard.get(cam_id) is not home:
                     continue
+                self._expire_identities(home, current_time)
 
-                appearance_dist = cosine(new_feature_vector, identity_obj.feature_vector)
-                is_same_camera = (identity_obj.current_camera == cam_id)
-                
-                # =========================================================
-                # FLUXO A: PESSOA ESTÁ A SER RASTREADA NA MESMA CÂMARA
-                # =========================================================
-                if is_same_camera:
-                    old_center = self._get_center(identity_obj.last_bbox)
-                    spatial_dist = np.linalg.norm(new_center - old_center)
-                    
-                    # Prevenção de Teletransporte local
-                    if spatial_dist > self.max_spatial_distance and time_lost < 1.0:
+                # A galeria é avaliada numa única passagem vetorizada: exclusão mútua,
+                # tempo perdido, fluxo A (mesma câmara, com recuperação fantasma) e
+                # fluxo B (câmara diferente, limiar mais tolerante).
+                home_gids = np.fromiter(home.identities, dtype=np.int64, count=len(home.identities))
+                approx_parts, exact_parts = [], []
+                for view in [home.view()] + snapshots:
+                    approx, exact = self._score_view(view, features, centers, cam_id, current_time, active_global_ids, sample_exact, colors)
+                    if view.is_snapshot:
+                        # Identidades que entretanto migraram para a partição local já foram avaliadas ao vivo
+                        approx = self._drop_columns(approx, home_gids)
+                        exact = exact and self._drop_columns(exact, home_gids)
+                    approx_parts.append(approx)
+                    exact_parts.append(exact)
+
+                gids = np.concatenate([g for g, _ in approx_parts])
+                cost = np.hstack([c for _, c in approx_parts])
+                matches = self._solve_assignment(gids, cost)
+
+                if sample_exact and all(e is not None for e in exact_parts):
+                    exact_matches = self._solve_assignment(
+                        np.concatenate([g for g, _ in exact_parts]), np.hstack([c for _, c in exact_parts])
+                    )
+                    if home.index is not None:
+                        # Registado depois de libertado o lock (o relatório lê todas as partições)
+                        recall_sample = (home, matches, exact_matches)
+
+                for i, match in enumerate(matches):
+                    feature_vector, bbox = feature_vectors[i], bboxes[i]
+                    # Avalia se encontrou alguém
+                    if match is not None:
+                        best_match_id, best_distance = match
+                        identity = home.identities.get(best_match_id)
+                        if identity is None:
+                            # Encontrado no snapshot de outra partição: atualizado fora deste lock
+                            foreign_matches.append((i, best_match_id, best_distance))
+                            continue
+                        self._check_and_update_clusters(identity, cam_id, current_time)
+
+                        mudou_de_camera = identity.update(feature_vector, bbox, cam_id, current_time, self.switch_cooldown, color_at(i))
+                        self._sync_gallery(home, identity)
+                        if mudou_de_camera:
+                            self._notify_camera_switch(identity)
+                            logging.info(f"Re-ID Evento: ID {best_match_id} moveu-se permanentemente para a {cam_id} (Distância: {best_distance:.2f})")
+
+                        assigned[i] = best_match_id
                         continue
 
-                    exited_scene = self._is_near_edge(identity_obj.last_bbox)
-                    is_completely_different = appearance_dist > 0.50
-
-                    # Recuperação Fantasma (Oclusões Locais)
-                    if not exited_scene and not is_completely_different:
-                        if spatial_dist < 80 and time_lost < 2.0:
-                            appearance_dist *= 0.1  
-                        elif spatial_dist < 150 and time_lost < 4.0:
-                            appearance_dist *= 0.4  
-
-                    if appearance_dist < best_distance and appearance_dist < self.intra_camera_threshold:
-                        best_distance = appearance_dist
-                        best_match_id = global_id
-
-                # =========================================================
-                # FLUXO B: PESSOA APARECEU NUMA CÂMARA DIFERENTE
-                # =========================================================
-                else:
-                    # Numa transição de câmara, não podemos medir "spatial_dist" pois as coordenadas
-                    # de uma câmara não mapeiam para a outra. Confiamos 100% no visual + tempo.
-                    
-                    # Usamos um limiar muito mais tolerante devido à variação de iluminação e ângulos
-                    if appearance_dist < best_distance and appearance_dist < self.inter_camera_threshold:
-                        best_distance = appearance_dist
-                        best_match_id = global_id
-
-            # FIM DO LOOP: Avalia se encontrou alguém
-            if best_match_id is not None:
-                identity = self.identities[best_match_id]
-                self._check_and_update_clusters(identity, cam_id, current_time)
-                
-                mudou_de_camera = identity.update(new_feature_vector, bbox, cam_id, current_time, self.switch_cooldown)
-                if mudou_de_camera:
-                    logging.info(f"Re-ID Evento: ID {best_match_id} moveu-se permanentemente para a {cam_id} (Distância: {best_distance:.2f})")
-                
-                return best_match_id
+                    # Cria nova pessoa caso não encontre
+                    assigned[i] = self._create_identity(home, feature_vector, bbox, cam_id, current_time, color_at(i))
+            break
 
-            # Cria nova pessoa caso não encontre
-            new_id = self.next_global_id
-            nova_identidade = GlobalIdentity(
-                global_id=new_id, 
-                initial_feature=new_feature_vector, 
-                bbox=bbox,                  
-                initial_cam_id=cam_id,
-                start_time=current_time
+        if recall_sample is not None:
+            self._record_recall(*recall_sample)
+
+        # Correspondências entre partições: a identidade é atualizada (e migrada, se trocar de câmara)
+        # com os locks das duas partições; se entretanto expirou, cria-se uma pessoa nova.
+        for i, best_match_id, best_distance in foreign_matches:
+            feature_vector, bbox = feature_vectors[i], bboxes[i]
+            identity, mudou_de_camera = self._apply_update(
+                best_match_id, cam_id, current_time,
+                lambda identity: identity.update(feature_vector, bbox, cam_id, current_time, self.switch_cooldown, color_at(i))
             )
-            
-            self.identities[new_id] = nova_identidade
-            self.next_global_id += 1
-            logging.info(f"Re-ID Evento: Nova pessoa -> ID {new_id} na {cam_id}")
-            return new_id
-            
+            if identity is None:
+                home = self._shard_for_camera(cam_id)
+                with home.lock:
+                    assigned[i] = self._create_identity(home, feature_vectors[i], bboxes[i], cam_id, current_time, color_at(i))
+                continue
+            if mudou_de_camera:
+                logging.info(f"Re-ID Evento: ID {best_match_id} moveu-se permanentemente para a {cam_id} (Distância: {best_distance:.2f})")
+            assigned[i] = best_match_id
+
+        self._finish_call(current_time, home=self._camera_shard.get(cam_id))
+        return assigned
+
     def _aggregate_history_by_clusters(self, global_id: int, raw_history: list) -> list[dict]:
         if not raw_history:
             return []
@@ -194,40 +642,237 @@ class GlobalIdentityManager:
         dt_object = datetime.fromtimestamp(timestamp)
         return dt_object.strftime("%H:%M:%S:%d/%m/%Y")
 
+    def get_snapshot(self) -> IdentitySnapshot:
+        """
+        Vista imutável e consistente de todas as identidades vivas.
+        Os locks de todas as partições são mantidos só para recolher as identidades alteradas desde
+        o snapshot anterior (custo proporcional às alterações); a nova vista é montada fora dos locks,
+        partilhando os registos que não mudaram. Sem escritas entretanto, devolve o snapshot anterior.
+        """
+        with self._state_snapshot_lock:
+            previous = self._state_snapshot
+            versions = tuple(shard.version for shard in self.shards)
+            if previous is not None and previous.versions == versions:
+                return previous
+
+            started = time.perf_counter()
+            with self._locked(*self.shards):
+                versions = tuple(shard.version for shard in self.shards)
+                taken_at = time.time()
+                changes = [shard.take_changes() for shard in self.shards]
+                spill_rows = self.history_store.total_rows
+            locked = time.perf_counter()
+
+            records = dict(previous.records) if previous is not None else {}
+            # Primeiro as saídas, depois as entradas: uma identidade que mudou de partição fica presente
+            for shard_changes in changes:
+                for gid, record in shard_changes.items():
+                    if record is None:
+                        records.pop(gid, None)
+            copied = 0
+            for shard_changes in changes:
+                for gid, record in shard_changes.items():
+                    if record is not None:
+                        records[gid] = record
+                        copied += 1
+
+            finished = time.perf_counter()
+            self._state_snapshot = IdentitySnapshot(
+                records, versions, taken_at,
+                lock_seconds=locked - started,
+                build_seconds=finished - started,
+                copied=copied,
+                store=self.history_store,
+                spill_rows=spill_rows
+            )
+            return self._state_snapshot
+
+    def get_snapshot_stats(self) -> dict:
+        snapshot = self._state_snapshot
+        return snapshot.get_stats() if snapshot is not None else {}
+
     def get_identity_history(self, global_id: int) -> list[dict]:
-        with self._lock:
-            identity = self.identities.get(global_id)
-            if not identity:
-                return []
-                
-            raw = identity.get_raw_history()
-            clustered = self._aggregate_history_by_clusters(global_id, raw)
-            
-            formatted = []
-            for record in clustered:
-                formatted.append({
-                    "Ambiente": record["ambiente_id"],
-                    "Entrada": self._format_timestamp(record["timestamp_in"]),
-                    "Saida": self._format_timestamp(record["timestamp_out"])
-                })
-            return formatted
+        snapshot = self.get_snapshot()
+        if global_id in snapshot:
+            raw = snapshot.raw_history(global_id)
+        else:
+            # Identidade já expirada: o histórico está no ficheiro de despejo
+            raw = self.history_store.raw_records(self.history_store.query(global_id=global_id))
+        if not raw:
+            return []
+
+        clustered = self._aggregate_history_by_clusters(global_id, raw)
+        formatted = []
+        for record in clustered:
+            formatted.append({
+                "Ambiente": record["ambiente_id"],
+                "Entrada": self._format_timestamp(record["timestamp_in"]),
+                "Saida": self._format_timestamp(record["timestamp_out"])
+            })
+        return formatted
+
+    def get_history_between(self, t_start: float, t_end: float) -> list[dict]:
+        """Segmentos brutos (com global_id) que se sobrepõem a [t_start, t_end], em memória e em disco."""
+        snapshot = self.get_snapshot()
+        records, seen = [], set()
+        for gid, identity in snapshot.records.items():
+            segments = identity.segments
+            overlaps = (segments["t_in"] <= t_end) & (np.isnan(segments["t_out"]) | (segments["t_out"] >= t_start))
+            if not overlaps.any():
+                continue
+            segments = segments[overlaps]
+            seen.update((gid, camera, t_in) for camera, t_in in zip(segments["camera"].tolist(), segments["t_in"].tolist()))
+            records.extend(
+                dict(record, global_id=gid)
+                for record in self.history_store.raw_records(segments, open_until=snapshot.taken_at)
+            )
+
+        # Os segmentos despejados depois do snapshot já estão nas cópias em memória
+        spilled = self.history_store.query(t_start=t_start, t_end=t_end)
+        keys = zip(spilled["global_id"].tolist(), spilled["camera"].tolist(), spilled["t_in"].tolist())
+        fresh = np.array([key not in seen for key in keys], dtype=bool)
+        spilled = spilled[fresh] if spilled.shape[0] else spilled
+        records.extend(
+            dict(record, global_id=gid)
+            for gid, record in zip(spilled["global_id"].tolist(), self.history_store.raw_records(spilled))
+        )
+        return records
+
+    # =========================================================
+    # CHECKPOINT E ARRANQUE A QUENTE
+    # =========================================================
+    def checkpoint(self, path: str) -> dict:
+        """
+        Grava a galeria num ficheiro binário mapeável (IdentityCheckpoint).
+        Parte do snapshot versionado: os workers só esperam pela cópia das identidades alteradas;
+        a conversão em arrays e a escrita decorrem na thread que chama.
+        """
+        started = time.perf_counter()
+        snapshot = self.get_snapshot()
+        with self._cluster_lock:
+            cluster_parent = dict(self.cluster_manager.parent)
+        with self._id_lock:
+            next_global_id = self.next_global_id
+
+        arrays = snapshot_to_arrays(snapshot)
+        # exported_until avança na thread do escritor sem mudar a versão das partições: vale o valor atual
+        for i, gid in enumerate(arrays["global_id"].tolist()):
+            shard = self._identity_shard.get(gid)
+            identity = shard.identities.get(gid) if shard is not None else None
+            if identity is not None and identity.exported_until > arrays["exported_until"][i]:
+                arrays["exported_until"][i] = identity.exported_until
+        # Os registos despejados até ao snapshot têm de estar no ficheiro antes do checkpoint
+        self.history_store.flush()
+        size = write_checkpoint(path, arrays, {
+            "created_at": snapshot.taken_at,
+            "next_global_id": next_global_id,
+            "cameras": self.history_store.cameras,
+            "cluster_parent": cluster_parent,
+            "spill_rows": snapshot.spill_rows,
+        })
+        elapsed = time.perf_counter() - started
+        logging.debug(f"Checkpoint: {len(snapshot)} identidades, {size / 1024:.1f} KiB em {elapsed * 1000:.1f} ms.")
+        return {"identities": len(snapshot), "bytes": size, "ms": elapsed * 1000.0, "lock_ms": snapshot.lock_seconds * 1000.0}
+
+    def restore_checkpoint(self, path: str, current_time: float = None) -> int:
+        """
+        Arranque a quente: recarrega a galeria de um checkpoint (antes de os workers arrancarem).
+        Só voltam à galeria as identidades vistas há menos de MAX_TIME_LOST; o histórico das
+        restantes é despejado para disco. Devolve o número de identidades recuperadas.
+        """
+        started = time.perf_counter()
+        meta, arrays = read_checkpoint(path)
+        now = time.time() if current_time is None else current_time
+        store = self.history_store
+
+        with self._cluster_lock:
+            self.cluster_manager.parent.update(meta["cluster_parent"])
+        with self._id_lock:
+            self.next_global_id = max(self.next_global_id, int(meta["next_global_id"]))
+
+        # Índices de câmara do checkpoint -> índices do armazém atual
+        cameras = meta["cameras"]
+        camera_map = np.array([store.camera_index(cam) for cam in cameras], dtype=np.int32)
+
+        # Segmentos despejados depois do checkpoint já estão em disco: saem da cópia em memória
+        tail = store.rows_since(int(meta["spill_rows"]))
+        tail = tail[np.argsort(tail["global_id"], kind="stable")]
+        tail_gids, tail_starts, tail_counts = np.unique(tail["global_id"], return_index=True, return_counts=True)
+        tail_index = dict(zip(tail_gids.tolist(), zip(tail_starts.tolist(), tail_counts.tolist())))
+
+        offsets = arrays["segment_offsets"]
+        restored = stale = 0
+        for i, gid in enumerate(arrays["global_id"].tolist()):
+            segments = np.array(arrays["segments"][offsets[i]:offsets[i + 1]])
+            segments["camera"] = camera_map[segments["camera"]]
+            last_seen = float(arrays["last_seen"][i])
+            cam_id = cameras[arrays["camera"][i]]
+
+            start, count = tail_index.get(gid, (0, 0))
+            resumed = False
+            if count:
+                rows = tail[start:start + count]
+                on_disk = set(zip(rows["camera"].tolist(), rows["t_in"].tolist()))
+                keep = [(camera, t_in) not in on_disk for camera, t_in in zip(segments["camera"].tolist(), segments["t_in"].tolist())]
+                segments = segments[np.array(keep, dtype=bool)]
+                if segments.shape[0] == 0:
+                    # Todo o histórico do checkpoint já foi despejado (a identidade continuou depois dele):
+                    # a visita atual recomeça a seguir ao último segmento em disco
+                    last_seen = max(last_seen, float(np.nanmax(rows["t_out"])))
+                    segments = np.array([(store.camera_index(cam_id), last_seen, np.nan)], dtype=SEGMENT_DTYPE)
+                    resumed = True
+            if resumed and last_seen < now - self.max_time_lost:
+                continue   # Já expirou e está completa em disco
+
+            identity = GlobalIdentity.restore(
+                global_id=gid,
+                feature_vector=arrays["features"][i].copy(),
+                bbox=arrays["bbox"][i].tolist(),
+                cam_id=cam_id,
+                first_seen=float(arrays["first_seen"][i]),
+                last_seen=last_seen,
+                history=CameraHistory.restore(gid, store, segments, int(arrays["spilled"][i]) + count),
+                color_signature=arrays["colors"][i].copy() if arrays["has_color"][i] else None,
+                exported_until=float(arrays["exported_until"][i])
+            )
+            if last_seen < now - self.max_time_lost:
+                identity.history.spill_all(last_seen)
+                stale += 1
+                continue
+
+            shard = self._shard_for_camera(identity.current_camera)
+            with shard.lock:
+                self._sync_gallery(shard, identity)
+            restored += 1
+        del arrays
+
+        logging.info(
+            f"Checkpoint {path}: {restored} identidades recuperadas, {stale} antigas despejadas para disco "
+            f"em {(time.perf_counter() - started) * 1000:.1f} ms."
+        )
+        return restored
+
+    def close(self):
+        """Escreve os segmentos pendentes do histórico e fecha o ficheiro de despejo."""
+        self.history_store.close()
 
     def export_data_to_csv(self, filename="tracking_data.csv"):
-        with self._lock:
-            if not self.identities:
-                return
-
-            all_records = []
-            for gid, identity in self.identities.items():
-                raw = identity.get_raw_history()
-                clustered = self._aggregate_history_by_clusters(gid, raw)
-                all_records.extend(clustered)
-
-            if not all_records:
-                return
-            keys = all_records[0].keys()
+        # Agregação, formatação e escrita trabalham sobre o snapshot, sem nenhum lock
+        snapshot = self.get_snapshot()
+        started = time.perf_counter()
+        all_records = []
+        for gid in snapshot.records:
+            clustered = self._aggregate_history_by_clusters(gid, snapshot.raw_history(gid))
+            all_records.extend(clustered)
 
+        if all_records:
+            keys = all_records[0].keys()
             with open(filename, 'w', newline='') as output_file:
                 dict_writer = csv.DictWriter(output_file, fieldnames=keys)
                 dict_writer.writeheader()
-                dict_writer.writerows(all_records)
\ No newline at end of file
+                dict_writer.writerows(all_records)
+
+        logging.info(
+            f"Exportação para {filename}: {len(all_records)} visitas de {len(snapshot)} identidades "
+            f"(snapshot {snapshot.get_stats()}, agregação e escrita {(time.perf_counter() - started) * 1000:.1f} ms)."
+        )
@@ -0,0 +1,144 @@
+# core/IdentityCheckpoint.py
+import os
+import json
+import mmap
+import struct
+import logging
+import threading
+import numpy as np
+
+from core.CameraHistoryStore import SEGMENT_DTYPE
+
+_MAGIC = b"SBIDCKP1"
+_ALIGN = 64
+CHECKPOINT_VERSION = 1
+
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def write_checkpoint(path: str, arrays: dict, meta: dict) -> int:
+    """
+    Escreve um checkpoint binário: assinatura, cabeçalho JSON (metadados e disposição dos arrays)
+    e os arrays NumPy em bruto, alinhados a 64 bytes para poderem ser lidos por mmap sem cópia.
+    A escrita vai para um ficheiro temporário que substitui o anterior de forma atómica.
+    Devolve o tamanho do ficheiro em bytes.
+    """
+    # O cabeçalho inclui os offsets, que dependem do seu próprio tamanho: repete até estabilizar
+    layout = {}
+    while True:
+        header_bytes = json.dumps(dict(meta, version=CHECKPOINT_VERSION, arrays=layout)).encode("utf-8")
+        offset = _aligned(len(_MAGIC) + 8 + len(header_bytes))
+        new_layout = {}
+        for name, array in arrays.items():
+            new_layout[name] = {
+                "offset": offset,
+                "dtype": np.lib.format.dtype_to_descr(array.dtype),
+                "shape": list(array.shape),
+            }
+            offset = _aligned(offset + array.nbytes)
+        if new_layout == layout:
+            break
+        layout = new_layout
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(layout[name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        size = f.tell()
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return size
+
+
+def read_checkpoint(path: str) -> tuple[dict, dict]:
+    """Abre um checkpoint por mmap. Devolve (metadados, arrays), com os arrays a apontar para o ficheiro."""
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapped[:len(_MAGIC)] != _MAGIC:
+        raise ValueError(f"{path} não é um checkpoint de identidades.")
+    (header_len,) = struct.unpack_from("<Q", mapped, len(_MAGIC))
+    start = len(_MAGIC) + 8
+    header = json.loads(bytes(mapped[start:start + header_len]).decode("utf-8"))
+    if header.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Versão de checkpoint não suportada: {header.get('version')}.")
+
+    arrays = {}
+    for name, entry in header.pop("arrays").items():
+        dtype = np.lib.format.descr_to_dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"])) if entry["shape"] else 1
+        if count == 0:
+            arrays[name] = np.zeros(entry["shape"], dtype=dtype)   # Arrays vazios não ocupam espaço no ficheiro
+            continue
+        arrays[name] = np.frombuffer(mapped, dtype=dtype, count=count, offset=entry["offset"]).reshape(entry["shape"])
+    return header, arrays
+
+
+def snapshot_to_arrays(snapshot) -> dict:
+    """Converte um IdentitySnapshot em arrays colunares (uma linha por identidade)."""
+    records = list(snapshot.records.values())
+    n = len(records)
+    feature_dim = next((r.feature_vector.shape[0] for r in records if r.feature_vector is not None), 0)
+    color_dim = next((r.color_signature.shape[0] for r in records if r.color_signature is not None), 0)
+
+    arrays = {
+        "global_id": np.fromiter((r.global_id for r in records), dtype=np.int64, count=n),
+        "first_seen": np.fromiter((r.first_seen for r in records), dtype=np.float64, count=n),
+        "last_seen": np.fromiter((r.last_seen for r in records), dtype=np.float64, count=n),
+        "exported_until": np.fromiter((r.exported_until for r in records), dtype=np.float64, count=n),
+        "spilled": np.fromiter((r.spilled for r in records), dtype=np.int64, count=n),
+        "camera": np.fromiter((snapshot.store.camera_index(r.current_camera) for r in records), dtype=np.int32, count=n),
+        "bbox": np.array([r.last_bbox for r in records], dtype=np.float32).reshape(n, 4),
+        "features": np.zeros((n, feature_dim), dtype=np.float32),
+        "colors": np.zeros((n, color_dim), dtype=np.float32),
+        "has_color": np.zeros(n, dtype=bool),
+        "segment_offsets": np.zeros(n + 1, dtype=np.int64),
+    }
+    for i, record in enumerate(records):
+        if record.feature_vector is not None:
+            arrays["features"][i] = record.feature_vector
+        if record.color_signature is not None and color_dim:
+            arrays["colors"][i] = record.color_signature
+            arrays["has_color"][i] = True
+        arrays["segment_offsets"][i + 1] = arrays["segment_offsets"][i] + record.segments.shape[0]
+    arrays["segments"] = (
+        np.concatenate([r.segments for r in records]) if n else np.zeros(0, dtype=SEGMENT_DTYPE)
+    )
+    return arrays
+
+
+class IdentityCheckpointer(threading.Thread):
+    """
+    Checkpoints periódicos do GlobalIdentityManager em segundo plano.
+    Cada checkpoint parte do snapshot versionado do manager (os locks das partições só são
+    mantidos para copiar as identidades alteradas); a serialização e a escrita correm nesta thread.
+    """
+    def __init__(self, global_manager, path: str, interval: float, stop_event: threading.Event):
+        super().__init__(daemon=True, name="IdentityCheckpointer")
+        self.global_manager = global_manager
+        self.path = path
+        self.interval = interval
+        self.stop_event = stop_event
+        self.checkpoints = 0
+        self.last_stats = {}
+
+    def run(self):
+        logging.info(f"[{self.name}] Checkpoints em {self.path} a cada {self.interval:.0f} s.")
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.last_stats = self.global_manager.checkpoint(self.path)
+                self.checkpoints += 1
+            except Exception as e:
+                logging.error(f"[{self.name}] Falha no checkpoint: {e}")
+
+    def get_stats(self) -> dict:
+        return dict(self.last_stats, checkpoints=self.checkpoints)
@@ -0,0 +1,224 @@
+# core/IdentityGallery.py
+import numpy as np
+
+
+class IdentityGallery:
+    """
+    Galeria contígua de assinaturas usada no Re-ID.
+    Guarda os vetores de características numa matriz float32 e, em arrays paralelos,
+    o last_seen, a câmara atual e o centro/borda da última bbox de cada identidade.
+    Opcionalmente guarda também a assinatura de cor (raiz quadrada do histograma) para o pré-filtro.
+    Os slots libertados na limpeza são reutilizados por novas identidades.
+    """
+    def __init__(self, feature_dim: int = None, initial_capacity: int = 256):
+        self.feature_dim = feature_dim
+        self.capacity = 0
+        self.size = 0
+
+        self.features = None
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.last_seen = np.zeros(0, dtype=np.float64)
+        self.camera_idx = np.zeros(0, dtype=np.int32)
+        self.centers = np.zeros((0, 2), dtype=np.float64)
+        self.near_edge = np.zeros(0, dtype=bool)
+        self.slot_gids = np.zeros(0, dtype=np.int64)
+        self.color_dim = None
+        self.colors_sqrt = None
+        self.has_color = np.zeros(0, dtype=bool)
+
+        self.gid_to_slot: dict[int, int] = {}
+        self._free_slots: list[int] = []
+        self._high_water = 0
+
+        # Câmaras mapeadas para inteiros para permitir comparações vetorizadas
+        self.camera_ids: list[str] = []
+        self._camera_index: dict[str, int] = {}
+
+        self._initial_capacity = initial_capacity
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, global_id: int) -> bool:
+        return global_id in self.gid_to_slot
+
+    def camera_index(self, cam_id: str) -> int:
+        idx = self._camera_index.get(cam_id)
+        if idx is None:
+            idx = len(self.camera_ids)
+            self._camera_index[cam_id] = idx
+            self.camera_ids.append(cam_id)
+        return idx
+
+    def _grow(self, min_capacity: int):
+        new_capacity = max(self._initial_capacity, self.capacity * 2, min_capacity)
+
+        def grow(arr, fill):
+            new_arr = np.full((new_capacity,) + arr.shape[1:], fill, dtype=arr.dtype)
+            new_arr[:self.capacity] = arr[:self.capacity]
+            return new_arr
+
+        if self.features is None:
+            self.features = np.zeros((0, self.feature_dim), dtype=np.float32)
+        self.features = grow(self.features, 0)
+        self.norms = grow(self.norms, 0)
+        self.last_seen = grow(self.last_seen, -np.inf)
+        self.camera_idx = grow(self.camera_idx, -1)
+        self.centers = grow(self.centers, 0)
+        self.near_edge = grow(self.near_edge, False)
+        self.slot_gids = grow(self.slot_gids, -1)
+        self.has_color = grow(self.has_color, False)
+        if self.colors_sqrt is not None:
+            self.colors_sqrt = grow(self.colors_sqrt, 0)
+        self.capacity = new_capacity
+
+    def _allocate_slot(self) -> int:
+        if self._free_slots:
+            return self._free_slots.pop()
+        if self._high_water >= self.capacity:
+            self._grow(self._high_water + 1)
+        slot = self._high_water
+        self._high_water += 1
+        return slot
+
+    def upsert(self, global_id: int, feature_vector: np.ndarray, center, near_edge: bool, cam_id: str, last_seen: float,
+               color_signature: np.ndarray = None) -> int:
+        """Escreve (ou reescreve) a linha da identidade na galeria e devolve o slot."""
+        if self.feature_dim is None:
+            self.feature_dim = int(np.asarray(feature_vector).shape[-1])
+
+        slot = self.gid_to_slot.get(global_id)
+        if slot is None:
+            slot = self._allocate_slot()
+            self.gid_to_slot[global_id] = slot
+            self.slot_gids[slot] = global_id
+            self.size += 1
+
+        self.features[slot] = feature_vector
+        self.norms[slot] = np.linalg.norm(self.features[slot])
+        self.last_seen[slot] = last_seen
+        self.camera_idx[slot] = self.camera_index(cam_id)
+        self.centers[slot] = center
+        self.near_edge[slot] = near_edge
+
+        self.has_color[slot] = color_signature is not None
+        if color_signature is not None:
+            if self.colors_sqrt is None:
+                self.color_dim = int(np.asarray(color_signature).shape[-1])
+                self.colors_sqrt = np.zeros((self.capacity, self.color_dim), dtype=np.float32)
+            self.colors_sqrt[slot] = np.sqrt(np.maximum(color_signature, 0))
+        return slot
+
+    def remove(self, global_id: int):
+        """Liberta o slot da identidade para reutilização e devolve-o (ou None)."""
+        slot = self.gid_to_slot.pop(global_id, None)
+        if slot is None:
+            return None
+        self.slot_gids[slot] = -1
+        self.last_seen[slot] = -np.inf
+        self.camera_idx[slot] = -1
+        self.has_color[slot] = False
+        self._free_slots.append(slot)
+        self.size -= 1
+        return slot
+
+    def snapshot(self) -> "IdentityGallery":
+        """Cópia independente (só de leitura) das linhas ocupadas, preservando os números de slot."""
+        n = self._high_water
+        snap = IdentityGallery(self.feature_dim, self._initial_capacity)
+        snap.capacity = n
+        snap.size = self.size
+        snap._high_water = n
+        if self.features is not None:
+            snap.features = self.features[:n].copy()
+        snap.norms = self.norms[:n].copy()
+        snap.last_seen = self.last_seen[:n].copy()
+        snap.camera_idx = self.camera_idx[:n].copy()
+        snap.centers = self.centers[:n].copy()
+        snap.near_edge = self.near_edge[:n].copy()
+        snap.slot_gids = self.slot_gids[:n].copy()
+        snap.has_color = self.has_color[:n].copy()
+        snap.color_dim = self.color_dim
+        if self.colors_sqrt is not None:
+            snap.colors_sqrt = self.colors_sqrt[:n].copy()
+        snap.gid_to_slot = dict(self.gid_to_slot)
+        snap.camera_ids = list(self.camera_ids)
+        snap._camera_index = dict(self._camera_index)
+        return snap
+
+    def live_mask(self) -> np.ndarray:
+        return self.slot_gids[:self._high_water] >= 0
+
+    def score(self, queries: np.ndarray, centers: np.ndarray, cam_id: str, current_time: float, exclude_gids: set,
+              intra_threshold: float, inter_threshold: float, max_time_lost: float, max_spatial_distance: float,
+              candidate_masks: np.ndarray = None, query_colors: np.ndarray = None, color_threshold: float = None):
+        """
+        Calcula, numa única passagem matricial, o custo de associar cada consulta (Q linhas)
+        a cada identidade da galeria, aplicando as regras do ciclo original: exclusão mútua,
+        tempo perdido, teletransporte local, recuperação fantasma e limiares.
+        `candidate_masks` (opcional, Q x slots) restringe cada consulta aos slots pré-selecionados por um índice.
+        `query_colors` + `color_threshold` (opcionais) ativam o pré-filtro de cor: os pares cuja distância de
+        Bhattacharyya entre assinaturas passa o limiar são descartados antes da comparação de embeddings.
+        Devolve (global_ids, custos Q x R), com inf nos pares inválidos.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        queries = queries.reshape(queries.shape[0], -1)
+        n_queries = queries.shape[0]
+        n = self._high_water
+        empty = (np.zeros(0, dtype=np.int64), np.full((n_queries, 0), np.inf))
+        if self.size == 0 or n == 0:
+            return empty
+
+        # Filtros baratos primeiro: o produto com a matriz só é feito nas linhas que sobrevivem
+        valid = (self.slot_gids[:n] >= 0) & ((current_time - self.last_seen[:n]) <= max_time_lost)
+        if candidate_masks is not None:
+            candidate_masks = np.asarray(candidate_masks)[:, :n]
+            valid &= candidate_masks.any(axis=0)
+        if exclude_gids:
+            valid &= ~np.isin(self.slot_gids[:n], np.fromiter(exclude_gids, dtype=np.int64, count=len(exclude_gids)))
+        rows = np.flatnonzero(valid)
+        if rows.size == 0:
+            return empty
+
+        # Pré-filtro de cor: só as linhas próximas em cor de alguma consulta chegam ao produto de embeddings
+        color_ok = None
+        if query_colors is not None and color_threshold is not None and self.colors_sqrt is not None:
+            query_colors = np.asarray(query_colors, dtype=np.float32).reshape(n_queries, -1)
+            query_has_color = query_colors.sum(axis=1) > 0
+            coefficient = np.sqrt(np.maximum(query_colors, 0)) @ self.colors_sqrt[rows].T
+            color_dist = np.sqrt(np.clip(1.0 - coefficient, 0.0, 1.0))
+            color_ok = (color_dist <= color_threshold) | ~self.has_color[rows][None, :] | ~query_has_color[:, None]
+            survivors = color_ok.any(axis=0)
+            rows, color_ok = rows[survivors], color_ok[:, survivors]
+            if rows.size == 0:
+                return empty
+
+        time_lost = current_time - self.last_seen[rows]
+
+        query_norms = np.linalg.norm(queries, axis=1).astype(np.float64)
+        dots = queries @ self.features[rows].T
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dist = 1.0 - dots.astype(np.float64) / (query_norms[:, None] * self.norms[rows].astype(np.float64)[None, :])
+
+        cam_idx = self._camera_index.get(cam_id, -2)
+        same_camera = self.camera_idx[rows] == cam_idx
+        centers = np.asarray(centers, dtype=np.float64).reshape(n_queries, 2)
+        spatial_dist = np.linalg.norm(self.centers[rows][None, :, :] - centers[:, None, :], axis=2)
+
+        # Prevenção de Teletransporte local
+        keep = ~(same_camera & (spatial_dist > max_spatial_distance) & (time_lost < 1.0))
+
+        # Recuperação Fantasma (Oclusões Locais)
+        ghost = same_camera & ~self.near_edge[rows] & ~(dist > 0.50)
+        strong = ghost & (spatial_dist < 80) & (time_lost < 2.0)
+        weak = ghost & ~strong & (spatial_dist < 150) & (time_lost < 4.0)
+        dist = np.where(strong, dist * 0.1, np.where(weak, dist * 0.4, dist))
+
+        threshold = np.where(same_camera, intra_threshold, inter_threshold)
+        keep &= dist < threshold
+        if candidate_masks is not None:
+            keep &= candidate_masks[:, rows]
+        if color_ok is not None:
+            keep &= color_ok
+
+        return self.slot_gids[rows], np.where(keep, dist, np.inf)
@@ -0,0 +1,54 @@
+# core/IdentityManagerServer.py
+import threading
+import logging
+from multiprocessing.managers import BaseManager
+
+# Métodos do GlobalIdentityManager acessíveis aos processos de câmaras
+_EXPOSED = (
+    "assign_global_ids",
+    "get_or_create_global_id",
+    "update_existing_identity",
+    "apply_updates",
+    "get_identity_history",
+)
+
+
+class _IdentityManagerServer(BaseManager):
+    pass
+
+
+class _IdentityManagerClient(BaseManager):
+    pass
+
+
+_IdentityManagerClient.register("GlobalIdentityManager", exposed=_EXPOSED)
+
+
+class IdentityManagerServer:
+    """
+    Publica o GlobalIdentityManager do processo principal (o único dono das identidades)
+    para os processos de câmaras, através de um servidor multiprocessing.managers numa thread.
+    """
+    def __init__(self, global_manager, authkey: bytes, address=("127.0.0.1", 0)):
+        _IdentityManagerServer.register("GlobalIdentityManager", callable=lambda: global_manager, exposed=_EXPOSED)
+        self._manager = _IdentityManagerServer(address=address, authkey=authkey)
+        self._server = self._manager.get_server()
+        self.address = self._server.address
+        self.authkey = authkey
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True, name="IdentityManagerServer")
+
+    def start(self):
+        self._thread.start()
+        logging.info(f"Servidor de identidades ativo em {self.address}.")
+
+    def stop(self):
+        stop_event = getattr(self._server, "stop_event", None)
+        if stop_event is not None:
+            stop_event.set()
+
+
+def connect_identity_manager(address, authkey: bytes):
+    """Lado do processo de câmaras: devolve um proxy para o GlobalIdentityManager remoto."""
+    client = _IdentityManagerClient(address=address, authkey=authkey)
+    client.connect()
+    return client.GlobalIdentityManager()
@@ -0,0 +1,132 @@
+# core/IdentityShard.py
+import threading
+
+from core.GlobalIdentity import GlobalIdentity
+from core.IdentityGallery import IdentityGallery
+from core.ExpiryIndex import ExpiryIndex
+from core.IdentitySnapshot import IdentityRecord
+
+
+class ShardView:
+    """Vista (viva ou snapshot) da galeria de uma partição, pronta para ser pontuada."""
+    __slots__ = ("shard_id", "gallery", "index", "slot_list", "centroids", "is_snapshot")
+
+    def __init__(self, shard_id: int, gallery: IdentityGallery, index=None, slot_list=None, centroids=None, is_snapshot: bool = False):
+        self.shard_id = shard_id
+        self.gallery = gallery
+        self.index = index
+        self.slot_list = slot_list
+        self.centroids = centroids
+        self.is_snapshot = is_snapshot
+
+
+class IdentityShard:
+    """
+    Partição do armazém de identidades (tipicamente um ambiente de câmaras).
+    Cada partição tem o seu próprio lock, galeria e índice. As outras partições
+    consultam-na através de um snapshot só de leitura, republicado no máximo a cada `snapshot_max_age` segundos.
+    """
+    def __init__(self, shard_id: int, index_factory=None, snapshot_max_age: float = 0.2):
+        self.shard_id = shard_id
+        self.lock = threading.Lock()
+
+        self.identities: dict[int, GlobalIdentity] = {}
+        self.gallery = IdentityGallery()
+        self.index = index_factory(self.gallery, self.lock) if index_factory else None
+        self.expiry = ExpiryIndex()
+
+        self.version = 0
+        self.snapshot_max_age = snapshot_max_age
+        self._snapshot: ShardView = None
+        self._snapshot_version = -1
+        self._snapshot_time = float('-inf')
+
+        # Identidades alteradas desde o último snapshot de estado (cópia só do que mudou)
+        self._dirty: set = set()
+
+    def __len__(self) -> int:
+        return len(self.identities)
+
+    def upsert(self, identity: GlobalIdentity, center, near_edge: bool):
+        """Regista/atualiza a identidade nesta partição. Exige o lock."""
+        self.identities[identity.global_id] = identity
+        slot = self.gallery.upsert(
+            identity.global_id,
+            identity.feature_vector,
+            center,
+            near_edge,
+            identity.current_camera,
+            identity.last_seen,
+            identity.color_signature
+        )
+        if self.index is not None:
+            self.index.on_upsert(slot)
+        self.expiry.touch(identity.global_id, identity.last_seen)
+        self._dirty.add(identity.global_id)
+        self.version += 1
+
+    def remove(self, global_id: int) -> GlobalIdentity:
+        """Retira a identidade desta partição e devolve-a (ou None). Exige o lock."""
+        identity = self.identities.pop(global_id, None)
+        if identity is None:
+            return None
+        self.retire_from_gallery(global_id)
+        self.expiry.discard(global_id)
+        self._dirty.add(global_id)
+        self.version += 1
+        return identity
+
+    def retire_from_gallery(self, global_id: int):
+        """Tira a identidade do matching (liberta o slot) sem a esquecer. Exige o lock."""
+        slot = self.gallery.remove(global_id)
+        if slot is None:
+            return
+        if self.index is not None:
+            self.index.on_remove(slot)
+        self.version += 1
+
+    def view(self) -> ShardView:
+        """Vista viva da galeria. Exige o lock enquanto for usada."""
+        return ShardView(self.shard_id, self.gallery, self.index)
+
+    def _build_snapshot(self) -> ShardView:
+        slot_list = centroids = None
+        if self.index is not None and self.index.is_trained:
+            slot_list = self.index.snapshot_slots()
+            centroids = self.index.centroids
+        return ShardView(self.shard_id, self.gallery.snapshot(), self.index, slot_list, centroids, is_snapshot=True)
+
+    def get_snapshot(self, current_time: float) -> ShardView:
+        """
+        Snapshot só de leitura para consultas vindas de outras partições.
+        Só é reconstruído quando houve escritas e o atual é mais velho que `snapshot_max_age`;
+        se a partição estiver ocupada, devolve-se o snapshot anterior em vez de esperar.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None:
+            if self._snapshot_version == self.version or (current_time - self._snapshot_time) < self.snapshot_max_age:
+                return snapshot
+            if not self.lock.acquire(blocking=False):
+                return snapshot
+        else:
+            self.lock.acquire()
+
+        try:
+            self._snapshot = self._build_snapshot()
+            self._snapshot_version = self.version
+            self._snapshot_time = current_time
+            return self._snapshot
+        finally:
+            self.lock.release()
+
+    def take_changes(self) -> dict:
+        """
+        Cópias das identidades alteradas desde a última chamada (None = saiu da partição).
+        Exige o lock; o custo é proporcional ao número de alterações, não ao tamanho da partição.
+        """
+        dirty, self._dirty = self._dirty, set()
+        changes = {}
+        for global_id in dirty:
+            identity = self.identities.get(global_id)
+            changes[global_id] = IdentityRecord(identity) if identity is not None else None
+        return changes
@@ -0,0 +1,77 @@
+# core/IdentitySnapshot.py
+import numpy as np
+
+from core.CameraHistoryStore import CameraHistoryStore
+
+
+class IdentityRecord:
+    """Cópia imutável do estado de uma identidade, tirada sob o lock da sua partição."""
+    __slots__ = ("global_id", "current_camera", "first_seen", "last_seen", "last_bbox", "feature_vector",
+                 "color_signature", "exported_until", "segments", "spilled")
+
+    def __init__(self, identity):
+        self.global_id = identity.global_id
+        self.current_camera = identity.current_camera
+        self.first_seen = identity.first_seen
+        self.last_seen = identity.last_seen
+        self.last_bbox = [float(v) for v in identity.last_bbox]
+        # A EMA substitui os vetores em vez de os alterar, mas copiar garante a imutabilidade
+        self.feature_vector = None if identity.feature_vector is None else np.array(identity.feature_vector, dtype=np.float32)
+        self.color_signature = None if identity.color_signature is None else np.array(identity.color_signature, dtype=np.float32)
+        self.exported_until = identity.exported_until
+        self.segments = identity.history.in_memory().copy()
+        self.segments.flags.writeable = False
+        # Segmentos já despejados naquele instante (os que forem despejados depois estão em `segments`)
+        self.spilled = identity.history.spilled
+
+
+class IdentitySnapshot:
+    """
+    Vista consistente e só de leitura de todas as identidades vivas num instante.
+    Relatórios, exportação e consultas trabalham sobre ela sem tocar nos locks das partições.
+    """
+    def __init__(self, records: dict, versions: tuple, taken_at: float, lock_seconds: float, build_seconds: float,
+                 copied: int, store: CameraHistoryStore, spill_rows: int = 0):
+        self.records = records
+        # Registos no ficheiro de despejo no instante do snapshot (reconciliação no arranque a quente)
+        self.spill_rows = spill_rows
+        self.versions = versions
+        self.taken_at = taken_at
+        self.lock_seconds = lock_seconds
+        self.build_seconds = build_seconds
+        self.copied = copied
+        self.store = store
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, global_id: int) -> bool:
+        return global_id in self.records
+
+    def get(self, global_id: int) -> IdentityRecord:
+        return self.records.get(global_id)
+
+    def segments(self, global_id: int) -> np.ndarray:
+        """Histórico completo da identidade tal como estava no instante do snapshot."""
+        record = self.records.get(global_id)
+        if record is None:
+            return None
+        if not record.spilled:
+            return record.segments
+        # O ficheiro só cresce: os primeiros `spilled` registos da identidade são os do snapshot
+        return self.store.assemble(global_id, record.segments, record.spilled)
+
+    def raw_history(self, global_id: int) -> list[dict]:
+        """Mesmo formato de GlobalIdentity.get_raw_history; o segmento aberto termina no instante do snapshot."""
+        segments = self.segments(global_id)
+        if segments is None:
+            return []
+        return self.store.raw_records(segments, open_until=self.taken_at)
+
+    def get_stats(self) -> dict:
+        return {
+            "identities": len(self.records),
+            "copied": self.copied,
+            "lock_ms": self.lock_seconds * 1000.0,
+            "build_ms": self.build_seconds * 1000.0,
+        }
@@ -0,0 +1,83 @@
+# core/IdentityUpdateBuffer.py
+import numpy as np
+
+from core.GlobalIdentity import FEATURE_EMA_MOMENTUM, FEATURE_EMA_NEW_WEIGHT
+
+
+class CoalescedUpdate:
+    """Atualizações acumuladas de uma identidade desde o último despejo."""
+    __slots__ = ("global_id", "cam_id", "feature_decay", "feature_increment", "bbox", "last_time", "count", "color_signature")
+
+    def __init__(self, global_id: int, cam_id: str):
+        self.global_id = global_id
+        self.cam_id = cam_id
+        self.feature_decay = 1.0
+        self.feature_increment = None
+        self.bbox = None
+        self.last_time = None
+        self.count = 0
+        self.color_signature = None
+
+
+class IdentityUpdateBuffer:
+    """
+    Buffer de atualizações de um único CameraWorker. Não usa lock: só a thread dona escreve
+    nele, e o GlobalIdentityManager recebe o conteúdo já drenado (apply_updates).
+
+    As observações de cada global_id são fundidas à medida que chegam: a EMA é acumulada como
+    (decay, incremento), de forma que f' = decay * f + incremento equivale às N atualizações sequenciais.
+    A última bbox, a última assinatura de cor e o último instante prevalecem. O estado global fica, no máximo,
+    `flush_interval` segundos atrasado em relação ao worker.
+    """
+    def __init__(self, cam_id: str, flush_interval: float = 0.25):
+        self.cam_id = cam_id
+        self.flush_interval = flush_interval
+        self._pending: dict[int, CoalescedUpdate] = {}
+        self._last_flush = None
+
+        self.updates_received = 0
+        self.updates_flushed = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, global_id: int, new_feature_vector, bbox: list, current_time: float, color_signature=None):
+        pending = self._pending.get(global_id)
+        if pending is None:
+            pending = self._pending[global_id] = CoalescedUpdate(global_id, self.cam_id)
+
+        if new_feature_vector is not None:
+            contribution = FEATURE_EMA_NEW_WEIGHT * np.asarray(new_feature_vector, dtype=np.float32)
+            if pending.feature_increment is None:
+                pending.feature_increment = contribution
+            else:
+                pending.feature_increment = FEATURE_EMA_MOMENTUM * pending.feature_increment + contribution
+            pending.feature_decay *= FEATURE_EMA_MOMENTUM
+
+        if color_signature is not None:
+            pending.color_signature = color_signature
+        pending.bbox = bbox
+        pending.last_time = current_time
+        pending.count += 1
+        self.updates_received += 1
+
+    def is_due(self, current_time: float) -> bool:
+        if self._last_flush is None:
+            self._last_flush = current_time
+        return bool(self._pending) and (current_time - self._last_flush) >= self.flush_interval
+
+    def drain(self, current_time: float = None) -> list[CoalescedUpdate]:
+        updates = list(self._pending.values())
+        self._pending = {}
+        if current_time is not None:
+            self._last_flush = current_time
+        self.updates_flushed += len(updates)
+        return updates
+
+    def get_stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "received": self.updates_received,
+            "flushed": self.updates_flushed,
+            "coalescing_ratio": self.updates_received / self.updates_flushed if self.updates_flushed else None,
+        }
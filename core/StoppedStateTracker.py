@@ -1,48 +1,148 @@
-# core/state_tracker.py
-from collections import deque
+# core/StoppedStateTracker.py
 import numpy as np
 
+
 class StoppedStateTracker:
-    def __init__(self, config):
+    """
+    Estado parado/em movimento das pessoas de uma câmara.
+
+    O histórico de posições vive em buffers circulares NumPy pré-alocados (um slot por global_id)
+    e o início da janela de STOPPED_SECONDS_THRESHOLD avança incrementalmente a cada amostra,
+    em vez de se percorrer o histórico inteiro. update_and_evaluate_batch avalia todas as faixas
+    de um frame de uma vez e evict() liberta os slots dos ids que o worker já não segue.
+    """
+    def __init__(self, config, history_length: int = 90, initial_capacity: int = 32):
         self.config = config
-        self.position_history = {}
-        self.stopped_state = {}
-        self.stopped_since = {}
+        self.history_length = history_length
+        self.window = config.STOPPED_SECONDS_THRESHOLD
+
+        self._slots = {}          # global_id -> slot
+        self._free = []
+        self._times = np.zeros((0, history_length), dtype=np.float64)
+        self._centers = np.zeros((0, history_length, 2), dtype=np.float32)
+        self._written = np.zeros(0, dtype=np.int64)        # Amostras escritas desde a criação do slot
+        self._window_start = np.zeros(0, dtype=np.int64)   # Índice absoluto da 1.ª amostra dentro da janela
+        self._stopped = np.zeros(0, dtype=bool)
+        self._stopped_since = np.zeros(0, dtype=np.float64)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._grow(initial_capacity)
+
+    def _grow(self, capacity: int):
+        old = self._ids.shape[0]
+
+        def grown(array: np.ndarray) -> np.ndarray:
+            new = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            new[:old] = array
+            return new
+
+        self._times = grown(self._times)
+        self._centers = grown(self._centers)
+        self._written = grown(self._written)
+        self._window_start = grown(self._window_start)
+        self._stopped = grown(self._stopped)
+        self._stopped_since = grown(self._stopped_since)
+        self._ids = grown(self._ids)
+        self._free.extend(range(capacity - 1, old - 1, -1))
+
+    def _slot(self, global_id: int, current_time: float) -> int:
+        slot = self._slots.get(global_id)
+        if slot is None:
+            if not self._free:
+                self._grow(self._ids.shape[0] * 2)
+            slot = self._free.pop()
+            self._slots[global_id] = slot
+            self._ids[slot] = global_id
+            self._written[slot] = 0
+            self._window_start[slot] = 0
+            self._stopped[slot] = False
+            self._stopped_since[slot] = current_time
+        return slot
+
+    def is_stopped(self, global_id: int) -> bool:
+        slot = self._slots.get(global_id)
+        return bool(self._stopped[slot]) if slot is not None else False
+
+    def __len__(self) -> int:
+        return len(self._slots)
 
     def update_and_evaluate(self, global_id: int, box: list, current_time: float) -> tuple[bool, float]:
-        x1, y1, x2, y2 = box
-        center = ((x1 + x2) / 2, (y1 + y2) / 2)
-
-        if global_id not in self.position_history:
-            self.position_history[global_id] = deque(maxlen=90)
-            self.stopped_state[global_id] = False
-            self.stopped_since[global_id] = current_time
-
-        self.position_history[global_id].append((current_time, center))
-        history = self.position_history[global_id]
-
-        if len(history) < 2:
-            return False, 0.0
-
-        recent = [pt for pt in history if current_time - pt[0] <= self.config.STOPPED_SECONDS_THRESHOLD]
-        if len(recent) < 2:
-            return self.stopped_state[global_id], 0.0
-
-        start_pos, end_pos = recent[0][1], recent[-1][1]
-        displacement = np.sqrt((end_pos[0] - start_pos[0])**2 + (end_pos[1] - start_pos[1])**2)
-
-        currently_stopped = self.stopped_state[global_id]
-
-        if currently_stopped:
-            if displacement > self.config.MOVEMENT_BREAKOUT_THRESHOLD:
-                self.stopped_state[global_id] = False
-                self.stopped_since[global_id] = current_time
-        else:
-            if displacement < self.config.STOPPED_PIXEL_THRESHOLD:
-                if (current_time - self.stopped_since[global_id]) >= self.config.STOPPED_SECONDS_THRESHOLD:
-                    self.stopped_state[global_id] = True
-            else:
-                self.stopped_since[global_id] = current_time
-
-        elapsed = current_time - self.stopped_since[global_id] if self.stopped_state[global_id] else 0.0
-        return self.stopped_state[global_id], elapsed
\ No newline at end of file
+        stopped, elapsed = self.update_and_evaluate_batch([global_id], [box], current_time)
+        return bool(stopped[0]), float(elapsed[0])
+
+    def update_and_evaluate_batch(self, global_ids: list, boxes: list, current_time: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Regista a posição de todas as faixas do frame e devolve (parado, tempo parado) por faixa.
+        """
+        if not global_ids:
+            return np.zeros(0, dtype=bool), np.zeros(0, dtype=np.float64)
+        if len(set(global_ids)) != len(global_ids):
+            # O mesmo id duas vezes no frame: avaliação sequencial, como amostras sucessivas
+            results = [self.update_and_evaluate(gid, box, current_time) for gid, box in zip(global_ids, boxes)]
+            return np.array([r[0] for r in results], dtype=bool), np.array([r[1] for r in results])
+
+        slots = np.array([self._slot(gid, current_time) for gid in global_ids], dtype=np.int64)
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+
+        # Escrita da nova amostra no buffer circular de cada slot
+        written = self._written[slots]
+        positions = written % self.history_length
+        self._times[slots, positions] = current_time
+        self._centers[slots, positions] = centers
+        written += 1
+        self._written[slots] = written
+
+        # Início da janela: nunca antes da amostra mais antiga ainda no buffer e avança
+        # enquanto a amostra do início estiver fora da janela temporal (amortizado O(1))
+        start = np.maximum(self._window_start[slots], written - self.history_length)
+        stale = current_time - self._times[slots, start % self.history_length] > self.window
+        while stale.any():
+            start[stale] += 1
+            stale &= start < written
+            stale[stale] = current_time - self._times[slots[stale], start[stale] % self.history_length] > self.window
+        self._window_start[slots] = start
+
+        stopped = self._stopped[slots].copy()
+        stopped_since = self._stopped_since[slots].copy()
+
+        in_window = written - start
+        evaluate = (written >= 2) & (in_window >= 2)
+        first = self._centers[slots, start % self.history_length]
+        displacement = np.linalg.norm(centers - first, axis=1)
+
+        breakout = evaluate & stopped & (displacement > self.config.MOVEMENT_BREAKOUT_THRESHOLD)
+        still = evaluate & ~stopped & (displacement < self.config.STOPPED_PIXEL_THRESHOLD)
+        moving = evaluate & ~stopped & ~still
+        became_stopped = still & (current_time - stopped_since >= self.window)
+
+        stopped[breakout] = False
+        stopped[became_stopped] = True
+        stopped_since[breakout | moving] = current_time
+        self._stopped[slots] = stopped
+        self._stopped_since[slots] = stopped_since
+
+        # Com menos de duas amostras no histórico a pessoa ainda não pode estar parada
+        stopped_out = stopped & (written >= 2)
+        elapsed = np.where(stopped_out & evaluate, current_time - stopped_since, 0.0)
+        return stopped_out, elapsed
+
+    def evict(self, tracked_ids, current_time: float, grace: float = 0.0) -> int:
+        """
+        Liberta os slots dos ids fora de `tracked_ids` sem amostras há mais de `grace` segundos
+        (uma oclusão curta não apaga o estado). Devolve o número de ids removidos.
+        """
+        if not self._slots:
+            return 0
+        used = np.fromiter(self._slots.values(), dtype=np.int64, count=len(self._slots))
+        last = self._times[used, (self._written[used] - 1) % self.history_length]
+        idle = used[current_time - last > grace]
+        removed = 0
+        for slot in idle.tolist():
+            global_id = int(self._ids[slot])
+            if global_id in tracked_ids:
+                continue
+            del self._slots[global_id]
+            self._ids[slot] = -1
+            self._free.append(slot)
+            removed += 1
+        return removed
@@ -0,0 +1,197 @@
+# core/TrackingExportWriter.py
+import os
+import csv
+import time
+import queue
+import logging
+import threading
+
+# Colunas das visitas a ambientes (mesmo formato do export_data_to_csv)
+VISIT_FIELDS = ("global_id", "ambiente_id", "timestamp_in", "timestamp_out", "duration_seconds")
+FSYNC_POLICIES = ("none", "batch", "rotate")
+
+
+class TrackingExportWriter(threading.Thread):
+    """
+    Escritor em segundo plano das visitas a ambientes já fechadas.
+
+    O caminho crítico só faz submit() (uma inserção numa fila que nunca bloqueia). Cada item é uma
+    lista de visitas ou um pedido (identidade, final) que a thread converte em visitas com `resolve`,
+    fora dos locks do manager. As visitas são agrupadas em lotes (`batch_size` ou `flush_interval`)
+    e acrescentadas a ficheiros CSV ou Parquet que rodam por tamanho e por tempo.
+
+    Política de fsync: "none" (só o buffer do SO), "batch" (após cada lote) ou "rotate" (ao fechar
+    cada ficheiro). Um ficheiro Parquet só fica legível depois de fechado; o CSV fica válido a cada lote.
+    """
+    def __init__(self, directory: str = "exports", prefix: str = "tracking_visits", file_format: str = "csv",
+                 batch_size: int = 256, flush_interval: float = 5.0, rotate_max_bytes: int = 64 * 1024 * 1024,
+                 rotate_seconds: float = 3600.0, fsync: str = "batch", resolve=None):
+        super().__init__(daemon=True, name="TrackingExportWriter")
+        if file_format not in ("csv", "parquet"):
+            raise ValueError(f"Formato de exportação desconhecido: '{file_format}' (opções: csv, parquet).")
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Política de fsync desconhecida: '{fsync}' (opções: {', '.join(FSYNC_POLICIES)}).")
+        if file_format == "parquet":
+            import pyarrow
+            import pyarrow.parquet
+
+        self.directory = directory
+        self.prefix = prefix
+        self.file_format = file_format
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.rotate_max_bytes = rotate_max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.fsync = fsync
+        self.resolve = resolve
+
+        self._queue = queue.SimpleQueue()
+        self._closing = threading.Event()
+        self._file = None
+        self._csv_writer = None
+        self._parquet_writer = None
+        self._file_opened_at = 0.0
+        self._file_seq = 0
+        self.current_path = None
+
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.files = 0
+        self.errors = 0
+
+    # --- Caminho crítico --------------------------------------------------------------
+
+    def submit(self, item):
+        """Inserção não bloqueante: lista de visitas ou tupla de argumentos para `resolve`."""
+        self.submitted += 1
+        self._queue.put(item)
+
+    # --- Thread de escrita ------------------------------------------------------------
+
+    def _resolve(self, item) -> list:
+        if isinstance(item, list):
+            return item
+        try:
+            return self.resolve(*item) if self.resolve else []
+        except Exception as e:
+            self.errors += 1
+            logging.error(f"[{self.name}] Falha ao obter visitas para exportar: {e}")
+            return []
+
+    def run(self):
+        logging.info(f"[{self.name}] A exportar visitas para {self.directory}/ ({self.file_format}, fsync={self.fsync}).")
+        pending = []
+        last_flush = time.monotonic()
+        while not (self._closing.is_set() and self._queue.empty()):
+            try:
+                pending.extend(self._resolve(self._queue.get(timeout=0.5)))
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            if not pending:
+                last_flush = now
+            elif len(pending) >= self.batch_size or now - last_flush >= self.flush_interval:
+                self._write_batch(pending)
+                pending = []
+                last_flush = now
+        if pending:
+            self._write_batch(pending)
+        self._close_file()
+        logging.info(f"[{self.name}] Encerrado ({self.written} visitas em {self.files} ficheiro(s)).")
+
+    def _write_batch(self, visits: list):
+        try:
+            if self._file is None or self._should_rotate():
+                self._rotate()
+            rows = [{field: visit.get(field) for field in VISIT_FIELDS} for visit in visits]
+            if self.file_format == "csv":
+                self._csv_writer.writerows(rows)
+            else:
+                import pyarrow as pa
+                self._parquet_writer.write_table(pa.Table.from_pylist(rows, schema=self._parquet_writer.schema))
+            self._file.flush()
+            if self.fsync == "batch":
+                os.fsync(self._file.fileno())
+            self.written += len(rows)
+            self.batches += 1
+        except Exception as e:
+            self.errors += 1
+            logging.error(f"[{self.name}] Falha ao escrever {len(visits)} visitas em {self.current_path}: {e}")
+
+    def _should_rotate(self) -> bool:
+        if self.rotate_max_bytes and self._file.tell() >= self.rotate_max_bytes:
+            return True
+        return bool(self.rotate_seconds) and time.monotonic() - self._file_opened_at >= self.rotate_seconds
+
+    def _rotate(self):
+        self._close_file()
+        os.makedirs(self.directory, exist_ok=True)
+        self._file_seq += 1
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        self.current_path = os.path.join(self.directory, f"{self.prefix}_{stamp}_{self._file_seq:04d}.{self.file_format}")
+
+        if self.file_format == "csv":
+            self._file = open(self.current_path, "w", newline="", encoding="utf-8")
+            self._csv_writer = csv.DictWriter(self._file, fieldnames=VISIT_FIELDS)
+            self._csv_writer.writeheader()
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            schema = pa.schema([
+                ("global_id", pa.int64()),
+                ("ambiente_id", pa.string()),
+                ("timestamp_in", pa.float64()),
+                ("timestamp_out", pa.float64()),
+                ("duration_seconds", pa.float64()),
+            ])
+            self._file = open(self.current_path, "wb")
+            self._parquet_writer = pq.ParquetWriter(self._file, schema)
+        self._file_opened_at = time.monotonic()
+        self.files += 1
+
+    def _close_file(self):
+        if self._file is None:
+            return
+        try:
+            if self._parquet_writer is not None:
+                self._parquet_writer.close()
+            self._file.flush()
+            if self.fsync != "none":
+                os.fsync(self._file.fileno())
+            self._file.close()
+        except Exception as e:
+            self.errors += 1
+            logging.error(f"[{self.name}] Falha ao fechar {self.current_path}: {e}")
+        self._file = self._csv_writer = self._parquet_writer = None
+
+    def close(self, timeout: float = None):
+        """Escreve tudo o que ainda está na fila, fecha o ficheiro atual e termina a thread."""
+        self._closing.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def get_stats(self) -> dict:
+        return {
+            "submitted": self.submitted,
+            "written": self.written,
+            "batches": self.batches,
+            "files": self.files,
+            "errors": self.errors,
+            "current_file": self.current_path,
+        }
+
+
+def create_export_writer(config, resolve=None) -> TrackingExportWriter:
+    """Cria o escritor a partir da configuração."""
+    return TrackingExportWriter(
+        directory=getattr(config, 'EXPORT_DIRECTORY', "exports"),
+        prefix=getattr(config, 'EXPORT_PREFIX', "tracking_visits"),
+        file_format=getattr(config, 'EXPORT_FORMAT', "csv"),
+        batch_size=getattr(config, 'EXPORT_BATCH_SIZE', 256),
+        flush_interval=getattr(config, 'EXPORT_FLUSH_INTERVAL', 5.0),
+        rotate_max_bytes=getattr(config, 'EXPORT_ROTATE_MAX_BYTES', 64 * 1024 * 1024),
+        rotate_seconds=getattr(config, 'EXPORT_ROTATE_SECONDS', 3600.0),
+        fsync=getattr(config, 'EXPORT_FSYNC', "batch"),
+        resolve=resolve
+    )
@@ -0,0 +1,54 @@
+# extraction/CameraFrameHub.py
+import threading
+import logging
+from typing import Callable
+
+from extraction.FrameRing import FrameRing
+
+
+class CameraFrameHub:
+    """
+    Ponto de encontro entre os leitores de vídeo e os workers: um ring de frames por câmara.
+    A descoberta de câmaras acontece aqui, no leitor: o primeiro frame de uma câmara desconhecida
+    cria o seu ring e dispara `on_new_camera(cam_id, ring)` (que arranca o worker correspondente).
+    """
+    def __init__(self, width: int, height: int, slots: int = 3,
+                 ring_factory: Callable = None, on_new_camera: Callable = None):
+        self.width = width
+        self.height = height
+        self.slots = slots
+        self._ring_factory = ring_factory or FrameRing
+        self._on_new_camera = on_new_camera
+
+        self._rings = {}
+        self._lock = threading.Lock()
+
+    def ring_for(self, cam_id: str):
+        """Devolve o ring da câmara, criando-o (e anunciando a câmara) na primeira vez."""
+        ring = self._rings.get(cam_id)
+        if ring is not None:
+            return ring
+
+        with self._lock:
+            ring = self._rings.get(cam_id)
+            if ring is None:
+                logging.info(f"Nova câmara detetada: '{cam_id}'. A iniciar Worker...")
+                ring = self._ring_factory(cam_id, self.width, self.height, self.slots)
+                if self._on_new_camera:
+                    self._on_new_camera(cam_id, ring)
+                self._rings[cam_id] = ring
+        return ring
+
+    def publish(self, cam_id: str, frame):
+        """Copia um frame já pronto para o ring da câmara."""
+        self.ring_for(cam_id).put(frame)
+
+    def rings(self) -> dict:
+        return dict(self._rings)
+
+    def get_stats(self) -> dict:
+        return {cam_id: ring.get_stats() for cam_id, ring in self.rings().items()}
+
+    def close(self):
+        for ring in self.rings().values():
+            ring.close()
@@ -0,0 +1,112 @@
+# extraction/FrameDecoder.py
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import numpy as np
+
+from extraction.CameraFrameHub import CameraFrameHub
+
+# Fatores de descodificação reduzida do libjpeg (escala aplicada durante a IDCT)
+_REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# Marcadores SOF (Start Of Frame) que trazem as dimensões da imagem
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_size(data: bytes):
+    """Lê (largura, altura) do cabeçalho JPEG sem descodificar a imagem; None se não for JPEG."""
+    if len(data) < 4 or data[0] != 0xFF or data[1] != 0xD8:
+        return None
+    pos, end = 2, len(data)
+    while pos + 4 <= end:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker in (0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7):
+            pos += 2
+            continue
+        length = (data[pos + 2] << 8) | data[pos + 3]
+        if marker in _SOF_MARKERS:
+            if pos + 9 > end:
+                return None
+            height = (data[pos + 5] << 8) | data[pos + 6]
+            width = (data[pos + 7] << 8) | data[pos + 8]
+            return width, height
+        pos += 2 + length
+    return None
+
+
+class FrameDecoder:
+    """
+    Descodifica JPEGs diretamente para os rings das câmaras, em paralelo num pool de threads
+    (o cv2.imdecode e o cv2.resize libertam o GIL).
+
+    Quando a fonte é maior que a resolução de processamento, usa a descodificação reduzida
+    (IMREAD_REDUCED_COLOR_2/4/8) com o maior fator que não fica abaixo do alvo: numa fonte que seja
+    múltiplo inteiro do alvo nunca se materializa o frame em resolução total. O eventual resize
+    restante é escrito diretamente no slot pré-alocado do ring.
+    """
+    def __init__(self, frame_hub: CameraFrameHub, width: int, height: int, workers: int = 4):
+        self.frame_hub = frame_hub
+        self.width = width
+        self.height = height
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="FrameDecoder") if workers > 1 else None
+
+    def _decode_flag(self, img_bytes: bytes) -> int:
+        size = jpeg_size(img_bytes)
+        if size is None:
+            return cv2.IMREAD_COLOR
+        src_w, src_h = size
+        for factor, flag in _REDUCED_FLAGS:
+            if src_w // factor >= self.width and src_h // factor >= self.height:
+                return flag
+        return cv2.IMREAD_COLOR
+
+    def decode_into(self, cam_id: str, img_bytes: bytes) -> bool:
+        """Descodifica um frame para o ring da câmara. Devolve False se o frame for descartado."""
+        ring = self.frame_hub.ring_for(cam_id)
+        try:
+            nparr = np.frombuffer(img_bytes, np.uint8)
+            frame = cv2.imdecode(nparr, self._decode_flag(img_bytes))
+        except Exception as e:
+            logging.debug(f"Falha ao decodificar frame: {e}")
+            frame = None
+        if frame is None:
+            # Nenhum slot foi reservado: só conta como descartado
+            ring.drop()
+            return False
+
+        if frame.shape[1] != self.width or frame.shape[0] != self.height:
+            # O pool pode usar outra thread no próximo frame: a reserva nunca fica presa após uma falha
+            try:
+                cv2.resize(frame, (self.width, self.height), dst=ring.begin_write())
+            except Exception as e:
+                logging.debug(f"Falha ao redimensionar frame: {e}")
+                ring.abort_write()
+                return False
+            ring.commit_write()
+        else:
+            ring.put(frame)
+        return True
+
+    def decode_batch(self, latest: dict):
+        """Descodifica {cam_id: bytes} (no máximo um frame por câmara) e espera que todos terminem."""
+        if self._pool is None or len(latest) < 2:
+            for cam_id, img_bytes in latest.items():
+                self.decode_into(cam_id, img_bytes)
+            return
+        # Uma tarefa por câmara: cada ring tem um único escritor de cada vez
+        futures = [self._pool.submit(self.decode_into, cam_id, img_bytes) for cam_id, img_bytes in latest.items()]
+        for future in futures:
+            future.result()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
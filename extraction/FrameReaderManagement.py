@@ -3,15 +3,28 @@ import threading
 import queue
 import time
 import logging
+import os
+import multiprocessing
 import cv2
 
 # Importação dos seus comandos (Ajuste os imports conforme a sua estrutura)
-from extraction.frameReaderCommand.ReadRTSPCommand import ReadRTSPCommand
 from extraction.frameReaderCommand.ReadKafkaCommand import ReadKafkaCommand
+from extraction.frameReaderCommand.ReadMultiSourceCommand import ReadMultiSourceCommand
 from extraction.frameReaderCommand.FrameReaderInvoker import FrameReaderInvoker
 
+from extraction.CameraFrameHub import CameraFrameHub
+from extraction.FrameRing import FrameRing
+from extraction.SharedFrameRing import SharedFrameRing
 from core.GlobalIdentityManager import GlobalIdentityManager
+from core.IdentityManagerServer import IdentityManagerServer
+from core.TrackingExportWriter import create_export_writer
+from core.IdentityCheckpoint import IdentityCheckpointer
 from vision.cameraWorker import CameraWorker
+from vision.cameraProcess import CameraProcessHost
+from vision.detectionService import DetectionService
+from vision.embeddingService import EmbeddingService
+from ui.compositor import DisplayCompositor
+from ui.mjpegServer import create_mjpeg_server
 
 class FrameReaderManagement:
     """
@@ -21,118 +34,312 @@ class FrameReaderManagement:
         self.config = config
         self.stop_event = threading.Event()
         
-        # Fila onde os Comandos colocam as imagens brutas
-        self.raw_frames_queue = queue.Queue(maxsize=100)
-        
-        # Dicionário de filas e workers por câmara
-        self.camera_queues = {}
+        # Workers por câmara (os frames chegam-lhes pelos rings do frame_hub)
         self.camera_workers = {}
         
         # Manager de Identidades Único
         self.global_id_manager = GlobalIdentityManager(config)
-        self._reader_invoker = None
+        self._reader_invokers = []
+
+        # Exportação contínua das visitas fechadas (o CSV final do encerramento continua a ser gerado)
+        self.export_writer = None
+        if getattr(config, 'EXPORT_STREAMING', False):
+            self.export_writer = create_export_writer(config)
+            self.global_id_manager.attach_export_writer(self.export_writer)
+
+        # Arranque a quente: a galeria do último checkpoint é recuperada antes de os workers arrancarem
+        self.checkpoint_path = getattr(config, 'CHECKPOINT_PATH', None)
+        self.checkpointer = None
+        if self.checkpoint_path:
+            if os.path.exists(self.checkpoint_path):
+                try:
+                    self.global_id_manager.restore_checkpoint(self.checkpoint_path)
+                except Exception as e:
+                    logging.error(f"Falha ao recuperar o checkpoint {self.checkpoint_path}: {e}")
+            self.checkpointer = IdentityCheckpointer(
+                self.global_id_manager,
+                self.checkpoint_path,
+                getattr(config, 'CHECKPOINT_INTERVAL', 60.0),
+                self.stop_event
+            )
+
+        # Modo de execução dos workers: threads neste processo ou grupos de câmaras em processos
+        self.process_mode = getattr(config, 'WORKER_MODE', 'thread') == 'process'
+        self._process_hosts = []
+        self._process_stats = {}     # Último relatório de métricas de cada processo de câmaras
+        self._identity_server = None
+        if self.process_mode:
+            self._mp_context = multiprocessing.get_context('spawn')
+            self._process_stop_event = self._mp_context.Event()
+            self._identity_server = IdentityManagerServer(self.global_id_manager, authkey=os.urandom(16))
+
+        # Um ring pré-alocado por câmara, onde os Comandos escrevem os frames descodificados.
+        # A câmara é descoberta pelo próprio leitor, que arranca o worker no primeiro frame.
+        self.frame_hub = CameraFrameHub(
+            width=config.PROCESSING_WIDTH,
+            height=config.PROCESSING_HEIGHT,
+            slots=getattr(config, 'FRAME_RING_SLOTS', 3),
+            ring_factory=SharedFrameRing.create if self.process_mode else FrameRing,
+            on_new_camera=self._start_camera_worker
+        )
+
+        # Detetor único com batching dinâmico partilhado por todas as câmaras
+        # (em modo processo, cada processo tem o seu)
+        self.detection_service = None
+        if getattr(config, 'SHARED_DETECTOR', True) and not self.process_mode:
+            self.detection_service = DetectionService(config, self.stop_event)
+
+        # Embedder de aparência partilhado, com batches de recortes de todas as câmaras
+        self.embedding_service = None
+        if getattr(config, 'SHARED_EMBEDDER', True) and not self.process_mode:
+            self.embedding_service = EmbeddingService(config, self.stop_event)
+
+        # Saídas visuais: em modo headless não há anotação nem GUI nenhuma
+        # (em modo processo, cada processo tem o seu compositor)
+        self.sinks = []
+        self.compositor = None
+        if getattr(config, 'DISPLAY_MODE', 'window') == 'window' and not self.process_mode:
+            self.compositor = DisplayCompositor(
+                config,
+                self.stop_event,
+                max_fps=getattr(config, 'DISPLAY_MAX_FPS', 15.0),
+                tile_width=getattr(config, 'DISPLAY_TILE_WIDTH', 480)
+            )
+            self.sinks.append(self.compositor)
+        if getattr(config, 'HTTP_STREAM', False) and not self.process_mode:
+            self.sinks.append(create_mjpeg_server(config, self.stop_event))
+
+        self.stats_interval = getattr(config, 'STATS_LOG_INTERVAL', 30.0)
+        self._last_stats_log = time.time()
 
     def run(self):
         logging.info("A iniciar o sistema...")
+        if self.detection_service:
+            self.detection_service.start()
+        if self.embedding_service:
+            self.embedding_service.start()
+        if self._identity_server:
+            self._identity_server.start()
+        if self.export_writer:
+            self.export_writer.start()
+        if self.checkpointer:
+            self.checkpointer.start()
+        for sink in self.sinks:
+            sink.start()
         self._start_frame_reader()
-        self._main_routing_loop()
+        self._supervision_loop()
         self._shutdown()
 
     def _start_frame_reader(self):
         """Inicializa a abstração de extração de frames (Command Pattern)."""
         
-        # Exemplo com RTSP (Poderia ser o ReadKafkaCommand)
-        """video_command = ReadRTSPCommand(
-            source="examples/pessoas_rua_60fps.mp4", 
-            output_queue=self.raw_frames_queue,
-            width=640,
-            height=480
-        )
-        
-        self._reader_invoker = FrameReaderInvoker(
-            command=video_command,
-            stop_event=self.stop_event,
-            name="VideoReaderInvoker"
-        )"""
-
-        kafka_command = ReadKafkaCommand(
-            output_queue=self.raw_frames_queue,
+        # Fontes RTSP/ficheiro locais: uma thread de captura por fonte, com decimação para a taxa alvo
+        if getattr(self.config, "FRAME_SOURCE", "kafka") == "video":
+            video_command = ReadMultiSourceCommand(
+                sources=self.config.VIDEO_SOURCES,
+                frame_hub=self.frame_hub,
+                width=self.config.PROCESSING_WIDTH,
+                height=self.config.PROCESSING_HEIGHT,
+                target_fps=getattr(self.config, "VIDEO_TARGET_FPS", 10.0)
+            )
+            invoker = FrameReaderInvoker(
+                command=video_command,
+                stop_event=self.stop_event,
+                name="VideoReaderInvoker"
+            )
+            invoker.start()
+            self._reader_invokers.append(invoker)
+            return
+
+        # Pool de consumidores no mesmo grupo: o broker reparte as partições entre eles.
+        # KAFKA_CONSUMERS = None usa um consumidor por partição do tópico.
+        first_command = self._create_kafka_command(0)
+        pool_size = getattr(self.config, "KAFKA_CONSUMERS", 1)
+        if pool_size is None:
+            pool_size = first_command.partition_count()
+        commands = [first_command] + [self._create_kafka_command(i) for i in range(1, max(1, pool_size))]
+        logging.info(f"Ingestão Kafka com {len(commands)} consumidor(es) no grupo '{self.config.KAFKA_GROUP_ID}'.")
+
+        for i, command in enumerate(commands):
+            invoker = FrameReaderInvoker(
+                command=command,
+                stop_event=self.stop_event,
+                name=f"VideoReaderInvoker-{i}"
+            )
+            invoker.start()
+            self._reader_invokers.append(invoker)
+
+    def _create_kafka_command(self, index: int) -> ReadKafkaCommand:
+        return ReadKafkaCommand(
+            frame_hub=self.frame_hub,
             bootstrap_servers=self.config.KAFKA_BOOTSTRAP_SERVERS,
             topic=self.config.KAFKA_TOPIC,
             group_id=self.config.KAFKA_GROUP_ID,
             width=self.config.PROCESSING_WIDTH,
             height=self.config.PROCESSING_HEIGHT,
-            target_camera_id=getattr(self.config, "KAFKA_TARGET_CAMERA", None)
+            target_camera_id=getattr(self.config, "KAFKA_TARGET_CAMERA", None),
+            decode_workers=getattr(self.config, "KAFKA_DECODE_WORKERS", 4),
+            commit_interval=getattr(self.config, "KAFKA_COMMIT_INTERVAL", 5.0),
+            name=f"KafkaConsumer-{index}"
         )
 
-        self._reader_invoker = FrameReaderInvoker(
-            command=kafka_command,
-            stop_event=self.stop_event,
-            name="VideoReaderInvoker"
-        )
-
-        self._reader_invoker.start()
-
-    def _main_routing_loop(self):
+    def _supervision_loop(self):
         """
-        Lê a fila partilhada e distribui os frames para as threads 
-        de processamento corretas de forma dinâmica.
+        Mantém a thread principal viva enquanto os leitores entregam os frames
+        diretamente aos rings das câmaras (sem router intermédio).
         """
-        logging.info("Router principal ativo. A aguardar frames...")
+        logging.info("Sistema ativo. A aguardar frames...")
         
         while not self.stop_event.is_set():
+            if self.process_mode and self._process_stop_event.is_set():
+                # Um processo de câmaras pediu o encerramento (tecla 'q')
+                self.stop_event.set()
+                break
+            self._log_stats()
             try:
-                # Tenta pegar um frame gerado pelos Comandos
-                cam_id, frame = self.raw_frames_queue.get(timeout=0.5)
-
-                # Descoberta Dinâmica de Câmaras (Dynamic Provisioning)
-                if cam_id not in self.camera_workers:
-                    logging.info(f"Nova câmara detetada: '{cam_id}'. A iniciar Worker...")
-                    
-                    cam_queue = queue.Queue(maxsize=30)
-                    self.camera_queues[cam_id] = cam_queue
-                    
-                    worker = CameraWorker(
-                        cam_id=cam_id,
-                        input_queue=cam_queue,
-                        config=self.config,
-                        global_manager=self.global_id_manager,
-                        stop_event=self.stop_event
-                    )
-                    worker.start()
-                    self.camera_workers[cam_id] = worker
-
-                # Envia o frame para a fila do Worker correspondente
-                try:
-                    self.camera_queues[cam_id].put_nowait(frame)
-                except queue.Full:
-                    pass
-
-            except queue.Empty:
-                pass
+                self.stop_event.wait(timeout=0.5)
             except KeyboardInterrupt:
                 logging.info("Interrupção manual detetada (Ctrl+C). Iniciando encerramento...")
                 self.stop_event.set()
                 break # CORREÇÃO: Sai do loop imediatamente para ir para o _shutdown
 
+    def _start_camera_worker(self, cam_id: str, ring):
+        if not self.process_mode:
+            worker = CameraWorker(
+                cam_id=cam_id,
+                input_queue=ring,
+                config=self.config,
+                global_manager=self.global_id_manager,
+                stop_event=self.stop_event,
+                detector=self.detection_service,
+                sinks=self.sinks,
+                embedder=self.embedding_service
+            )
+            worker.start()
+            self.camera_workers[cam_id] = worker
+            return
+
+        # Modo processo: o ring vive em memória partilhada e é anexado pelo processo que aloja a câmara
+        host = self._host_with_capacity()
+        host.control_queue.put(("add", cam_id, ring.name))
+        self.camera_workers[cam_id] = host
+
+    def _host_with_capacity(self) -> CameraProcessHost:
+        per_process = max(1, getattr(self.config, 'CAMERAS_PER_PROCESS', 4))
+        for host in self._process_hosts:
+            if host.is_alive() and sum(1 for h in self.camera_workers.values() if h is host) < per_process:
+                return host
+
+        host = CameraProcessHost(
+            host_id=len(self._process_hosts),
+            config=self.config,
+            manager_address=self._identity_server.address,
+            manager_authkey=self._identity_server.authkey,
+            stop_event=self._process_stop_event,
+            control_queue=self._mp_context.Queue(),
+            stats_queue=self._mp_context.Queue()
+        )
+        host.start()
+        self._process_hosts.append(host)
+        logging.info(f"Processo de câmaras '{host.name}' iniciado (até {per_process} câmaras).")
+        return host
+
+    def _log_stats(self):
+        """Publica periodicamente no log as métricas dos serviços partilhados."""
+        now = time.time()
+        if now - self._last_stats_log < self.stats_interval:
+            return
+        self._last_stats_log = now
+        if self.detection_service:
+            logging.info(f"Métricas de deteção: {self.detection_service.get_stats()}")
+        if self.embedding_service:
+            logging.info(f"Métricas de embeddings: {self.embedding_service.get_stats()}")
+        if self.export_writer:
+            logging.info(f"Métricas de exportação: {self.export_writer.get_stats()}")
+        if self.global_id_manager.get_snapshot_stats():
+            logging.info(f"Último snapshot de identidades: {self.global_id_manager.get_snapshot_stats()}")
+        if self.checkpointer:
+            logging.info(f"Métricas de checkpoint: {self.checkpointer.get_stats()}")
+        for sink in self.sinks:
+            if hasattr(sink, "get_stats"):
+                logging.info(f"Métricas de '{sink.name}': {sink.get_stats()}")
+        for invoker in self._reader_invokers:
+            if hasattr(invoker.command, "get_stats"):
+                logging.info(f"Métricas de ingestão '{invoker.command.name}': {invoker.command.get_stats()}")
+
+        # Métricas dos workers: lidas diretamente em modo thread, recebidas dos processos em modo processo
+        worker_stats = {
+            cam_id: worker.get_stats() for cam_id, worker in self.camera_workers.items() if isinstance(worker, CameraWorker)
+        }
+        for host in self._process_hosts:
+            report = self._latest_process_stats(host)
+            if report is None:
+                continue
+            worker_stats.update(report["workers"])
+            if "detection" in report:
+                logging.info(f"Métricas de deteção ({host.name}): {report['detection']}")
+            if "embedding" in report:
+                logging.info(f"Métricas de embeddings ({host.name}): {report['embedding']}")
+        for cam_id, stats in worker_stats.items():
+            if stats:
+                logging.info(f"Métricas do worker '{cam_id}': {stats}")
+        for cam_id, stats in self.frame_hub.get_stats().items():
+            logging.info(f"Frames da câmara '{cam_id}': {stats}")
+
+    def _latest_process_stats(self, host: CameraProcessHost):
+        """Esvazia a fila de métricas do processo e guarda o relatório mais recente."""
+        while True:
+            try:
+                self._process_stats[host.name] = host.stats_queue.get_nowait()
+            except (queue.Empty, EOFError, OSError):
+                return self._process_stats.get(host.name)
+
     def _shutdown(self):
         logging.info("A iniciar rotina de encerramento seguro...")
         self.stop_event.set()
 
         # 1. Aguarda que a extração de frames pare
-        if self._reader_invoker:
+        if self._reader_invokers:
             logging.info("A parar captura de vídeo...")
-            self._reader_invoker.join(timeout=3)
+            for invoker in self._reader_invokers:
+                invoker.join(timeout=3)
+
+        if self.detection_service:
+            self.detection_service.join(timeout=2)
+        if self.embedding_service:
+            self.embedding_service.join(timeout=2)
 
         # 2. CORREÇÃO: Aguarda que TODOS os workers das câmaras terminem
         # Isso impede que o OpenCV bloqueie ou "morra" de repente, deixando janelas presas.
-        for cam_id, worker in self.camera_workers.items():
-            logging.info(f"A aguardar encerramento seguro da câmara '{cam_id}'...")
-            worker.join(timeout=2)
+        if self.process_mode:
+            self._process_stop_event.set()
+            for host in self._process_hosts:
+                logging.info(f"A aguardar encerramento seguro do processo '{host.name}'...")
+                host.join(timeout=5)
+        else:
+            for cam_id, worker in self.camera_workers.items():
+                logging.info(f"A aguardar encerramento seguro da câmara '{cam_id}'...")
+                worker.join(timeout=2)
+        self.frame_hub.close()
+        for sink in self.sinks:
+            sink.join(timeout=2)
 
         # 3. Exporta as estatísticas agora que tudo parou
         logging.info("A exportar dados para CSV...")
         self.global_id_manager.export_data_to_csv("tracking_data_final.csv")
+        if self.export_writer:
+            self.global_id_manager.export_open_visits()
+            self.export_writer.close(timeout=10)
+        # Checkpoint final (depois da exportação, para guardar o que já foi exportado)
+        if self.checkpointer:
+            self.checkpointer.join(timeout=10)
+            try:
+                self.global_id_manager.checkpoint(self.checkpoint_path)
+            except Exception as e:
+                logging.error(f"Falha no checkpoint final: {e}")
+        self.global_id_manager.close()
+        if self._identity_server:
+            self._identity_server.stop()
         
         # 4. Destrói as janelas com segurança
         cv2.destroyAllWindows()
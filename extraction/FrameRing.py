@@ -0,0 +1,123 @@
+# extraction/FrameRing.py
+import queue
+import threading
+import numpy as np
+
+
+class FrameRing:
+    """
+    Ring de frames pré-alocado por câmara, com política "o frame mais recente ganha".
+
+    O leitor de vídeo escreve o frame descodificado diretamente num slot livre
+    (begin_write / commit_write) e o CameraWorker recebe sempre o último frame publicado,
+    sem cópias: o slot entregue fica emprestado ao worker até ao get() seguinte e
+    o escritor nunca o reutiliza entretanto. Com 3 slots há sempre um livre para escrita.
+    Há um único escritor por ring: enquanto uma thread detém a reserva, begin_write de
+    outra thread levanta RuntimeError.
+
+    Métricas por câmara:
+      * overwritten: frames publicados que foram substituídos antes de serem lidos;
+      * dropped: frames abandonados pelo escritor (abort_write, drop ou formato inválido).
+    """
+    def __init__(self, cam_id: str, width: int, height: int, slots: int = 3):
+        self.cam_id = cam_id
+        self.width = width
+        self.height = height
+        self.slots = max(3, slots)
+        self.frame_shape = (height, width, 3)
+        self._frames = np.zeros((self.slots,) + self.frame_shape, dtype=np.uint8)
+
+        self._cond = threading.Condition()
+        self._latest = -1        # Slot publicado ainda não lido (-1 = nenhum)
+        self._leased = -1        # Slot em uso pelo worker
+        self._writing = -1       # Slot reservado pelo escritor
+        self._writer = None      # Thread que detém a reserva
+
+        self.written = 0
+        self.read = 0
+        self.overwritten = 0
+        self.dropped = 0
+
+    def needs_frame(self) -> bool:
+        """True quando o worker já levou o último frame publicado (um novo frame seria aproveitado)."""
+        return self._latest < 0
+
+    def begin_write(self) -> np.ndarray:
+        """
+        Reserva um slot livre e devolve a vista onde o frame deve ser escrito em sítio.
+        Se a mesma thread ainda tinha uma reserva por publicar, essa conta como descartada.
+        """
+        with self._cond:
+            if self._writing >= 0:
+                if self._writer != threading.get_ident():
+                    raise RuntimeError(f"[FrameRing] '{self.cam_id}' já tem um escritor ativo noutra thread.")
+                self.dropped += 1
+            busy = (self._latest, self._leased)
+            self._writing = next(s for s in range(self.slots) if s not in busy)
+            self._writer = threading.get_ident()
+            return self._frames[self._writing]
+
+    def commit_write(self):
+        """Publica o slot reservado como o frame mais recente (só pela thread que o reservou)."""
+        with self._cond:
+            if self._writing < 0 or self._writer != threading.get_ident():
+                return
+            if self._latest >= 0:
+                self.overwritten += 1
+            self._latest = self._writing
+            self._writing = -1
+            self.written += 1
+            self._cond.notify()
+
+    def abort_write(self):
+        """
+        Desiste do slot reservado (o frame conta como descartado).
+        Só tem efeito para a thread que fez o begin_write: nunca liberta a reserva de outro escritor.
+        """
+        with self._cond:
+            if self._writing < 0 or self._writer != threading.get_ident():
+                return
+            self._writing = -1
+            self.dropped += 1
+
+    def drop(self):
+        """Conta um frame abandonado antes de reservar slot (ex.: falha de descodificação)."""
+        with self._cond:
+            self.dropped += 1
+
+    def put(self, frame: np.ndarray):
+        """Copia um frame já pronto para o ring (para fontes que não escrevem em sítio)."""
+        if frame.shape != self.frame_shape:
+            with self._cond:
+                self.dropped += 1
+            return
+        np.copyto(self.begin_write(), frame)
+        self.commit_write()
+
+    def put_nowait(self, frame: np.ndarray):
+        self.put(frame)
+
+    def get(self, timeout: float = None) -> np.ndarray:
+        """
+        Devolve o frame mais recente (vista do slot, válida até ao próximo get())
+        ou levanta queue.Empty se nada for publicado dentro do timeout.
+        """
+        with self._cond:
+            self._leased = -1
+            if self._latest < 0 and not self._cond.wait_for(lambda: self._latest >= 0, timeout):
+                raise queue.Empty
+            self._leased = self._latest
+            self._latest = -1
+            self.read += 1
+            return self._frames[self._leased]
+
+    def get_stats(self) -> dict:
+        return {
+            "written": self.written,
+            "read": self.read,
+            "overwritten": self.overwritten,
+            "dropped": self.dropped,
+        }
+
+    def close(self):
+        pass
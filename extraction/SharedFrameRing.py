@@ -0,0 +1,163 @@
+# extraction/SharedFrameRing.py
+import time
+import queue
+import uuid
+import numpy as np
+from multiprocessing import shared_memory
+
+# Cabeçalho (int64): [escritos, lidos, substituídos sem leitura, abandonados pelo escritor,
+#                    último frame entregue ao leitor, seq do slot 0..N-1]
+_HEADER_WRITTEN = 0
+_HEADER_READ = 1
+_HEADER_OVERWRITTEN = 2
+_HEADER_DROPPED = 3
+_HEADER_LAST_READ = 4
+_HEADER_FIELDS = 5
+
+
+class SharedFrameRing:
+    """
+    Ring buffer de frames em multiprocessing.shared_memory, dimensionado para
+    PROCESSING_WIDTH x PROCESSING_HEIGHT x 3, para passar frames entre processos sem pickling.
+
+    Um único escritor (o leitor de vídeo no processo principal) e um único leitor (o CameraWorker).
+    Cada slot tem um número de sequência no estilo seqlock (ímpar durante a escrita): o leitor
+    copia sempre o frame mais recente e repete a cópia se o escritor a tiver sobreposto entretanto.
+    Expõe a mesma interface do FrameRing (begin_write/commit_write, put, get, get_stats),
+    para que os leitores de vídeo e o CameraWorker não precisem de saber a origem.
+    """
+    def __init__(self, name: str, width: int, height: int, slots: int = 3, create: bool = False):
+        self.width = width
+        self.height = height
+        self.slots = slots
+        self.frame_shape = (height, width, 3)
+        frame_bytes = int(np.prod(self.frame_shape))
+        header_bytes = 8 * (_HEADER_FIELDS + slots)
+
+        if create:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=header_bytes + frame_bytes * slots)
+        else:
+            self._shm = self._attach_untracked(name)
+        self.name = self._shm.name
+        self._owner = create
+
+        self._header = np.ndarray((_HEADER_FIELDS + slots,), dtype=np.int64, buffer=self._shm.buf)
+        self._frames = np.ndarray((slots,) + self.frame_shape, dtype=np.uint8, buffer=self._shm.buf, offset=header_bytes)
+        if create:
+            self._header[:] = 0
+
+        # Estado do lado do leitor
+        self._last_read = 0
+        # Estado do lado do escritor (há uma reserva por fazer commit/abort)
+        self._writing = False
+
+    @staticmethod
+    def _attach_untracked(name: str) -> shared_memory.SharedMemory:
+        """
+        Anexa sem tornar o leitor dono do segmento: só o processo que o criou o remove.
+        Antes do Python 3.13 o attach regista sempre o nome, mas os processos 'spawn' partilham
+        o resource_tracker do processo principal, onde o nome já está registado pelo criador.
+        """
+        try:
+            return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+        except TypeError:
+            return shared_memory.SharedMemory(name=name)
+
+    @classmethod
+    def create(cls, cam_id: str, width: int, height: int, slots: int = 3) -> "SharedFrameRing":
+        safe_cam = "".join(ch if ch.isalnum() else "_" for ch in str(cam_id))[:16]
+        return cls(f"sb_{safe_cam}_{uuid.uuid4().hex[:8]}", width, height, slots, create=True)
+
+    @classmethod
+    def attach(cls, name: str, width: int, height: int, slots: int = 3) -> "SharedFrameRing":
+        return cls(name, width, height, slots, create=False)
+
+    def needs_frame(self) -> bool:
+        """True quando o leitor já levou o último frame publicado."""
+        return int(self._header[_HEADER_LAST_READ]) >= int(self._header[_HEADER_WRITTEN])
+
+    def begin_write(self) -> np.ndarray:
+        """Marca o próximo slot como em escrita e devolve a vista onde o frame deve ser escrito em sítio."""
+        written = int(self._header[_HEADER_WRITTEN])
+        slot = written % self.slots
+        self._header[_HEADER_FIELDS + slot] = 2 * written + 1    # ímpar: escrita em curso
+        self._writing = True
+        return self._frames[slot]
+
+    def commit_write(self):
+        written = int(self._header[_HEADER_WRITTEN])
+        self._header[_HEADER_FIELDS + written % self.slots] = 2 * written + 2    # par: slot estável
+        self._header[_HEADER_WRITTEN] = written + 1
+        self._writing = False
+
+    def abort_write(self):
+        # O slot fica ímpar (inválido) até à próxima escrita; o leitor nunca o entrega
+        if not self._writing:
+            return
+        self._writing = False
+        self._header[_HEADER_DROPPED] += 1
+
+    def drop(self):
+        """Conta um frame abandonado antes de reservar slot."""
+        self._header[_HEADER_DROPPED] += 1
+
+    def put(self, frame: np.ndarray):
+        """Escreve o frame no próximo slot (nunca bloqueia; o frame mais antigo é sobreposto)."""
+        if frame.shape != self.frame_shape:
+            self._header[_HEADER_DROPPED] += 1
+            return
+        np.copyto(self.begin_write(), frame)
+        self.commit_write()
+
+    def put_nowait(self, frame: np.ndarray):
+        self.put(frame)
+
+    def get(self, timeout: float = None) -> np.ndarray:
+        """Devolve uma cópia do frame mais recente ainda não lido; levanta queue.Empty no timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            written = int(self._header[_HEADER_WRITTEN])
+            if written > self._last_read:
+                frame = self._copy_slot(written)
+                if frame is not None:
+                    overwritten = written - self._last_read - 1
+                    if overwritten > 0:
+                        self._header[_HEADER_OVERWRITTEN] += overwritten
+                    self._header[_HEADER_READ] += 1
+                    self._header[_HEADER_LAST_READ] = written
+                    self._last_read = written
+                    return frame
+                continue
+            if deadline is not None and time.monotonic() >= deadline:
+                raise queue.Empty
+            time.sleep(0.002)
+
+    def _copy_slot(self, written: int):
+        slot = (written - 1) % self.slots
+        seq_index = _HEADER_FIELDS + slot
+        expected = 2 * (written - 1) + 2
+        if int(self._header[seq_index]) != expected:
+            return None
+        out = np.empty(self.frame_shape, dtype=np.uint8)
+        np.copyto(out, self._frames[slot])
+        if int(self._header[seq_index]) != expected:
+            return None
+        return out
+
+    def get_stats(self) -> dict:
+        return {
+            "written": int(self._header[_HEADER_WRITTEN]),
+            "read": int(self._header[_HEADER_READ]),
+            "overwritten": int(self._header[_HEADER_OVERWRITTEN]),
+            "dropped": int(self._header[_HEADER_DROPPED]),
+        }
+
+    def close(self):
+        self._header = None
+        self._frames = None
+        self._shm.close()
+        if self._owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
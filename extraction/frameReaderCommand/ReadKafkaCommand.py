@@ -1,20 +1,26 @@
 # model/commands/ReadKafkaCommand.py
-import cv2
-import numpy as np
+import time
 import logging
-from multiprocessing import Queue as MPQueue
-from confluent_kafka import Consumer
+from confluent_kafka import Consumer, KafkaException
+from extraction.CameraFrameHub import CameraFrameHub
+from extraction.FrameDecoder import FrameDecoder
 from extraction.frameReaderCommand.IFrameCommand import IFrameCommand
 
 class ReadKafkaCommand(IFrameCommand):
     """
     Comando responsável por drenar um tópico Kafka e extrair os frames mais recentes.
+    Vários comandos com o mesmo group_id formam um pool: o broker reparte as partições entre eles.
+    Os offsets são confirmados periodicamente e o atraso (lag) por partição é medido no mesmo ciclo.
     """
-    def __init__(self, output_queue: MPQueue, bootstrap_servers: str, topic: str, group_id: str, width: int, height: int, target_camera_id: str = None):
-        self.output_queue = output_queue
+    def __init__(self, frame_hub: CameraFrameHub, bootstrap_servers: str, topic: str, group_id: str, width: int, height: int, target_camera_id: str = None, decode_workers: int = 4,
+                 commit_interval: float = 5.0, name: str = "KafkaConsumer"):
+        self.frame_hub = frame_hub
+        self.topic = topic
+        self.name = name
         self.width = width
         self.height = height
         self.target_camera_id = target_camera_id
+        self.decoder = FrameDecoder(frame_hub, width, height, workers=decode_workers)
         
         conf = {
             "bootstrap.servers": bootstrap_servers,
@@ -27,14 +33,31 @@ class ReadKafkaCommand(IFrameCommand):
         }
         
         self._consumer = Consumer(conf)
-        self._consumer.subscribe([topic])
+        self._consumer.subscribe([topic], on_revoke=self._on_revoke)
+
+        # Confirmação de offsets e métricas de atraso/débito
+        self.commit_interval = commit_interval
+        self._last_commit = time.time()
+        self.partition_lag = {}
+        self.camera_messages = {}
+        self._rate_window_start = time.time()
+        self._rate_window_counts = {}
+
+    def partition_count(self, timeout: float = 5.0) -> int:
+        """Número de partições do tópico (para dimensionar o pool de consumidores)."""
+        metadata = self._consumer.list_topics(self.topic, timeout=timeout)
+        topic = metadata.topics.get(self.topic)
+        return len(topic.partitions) if topic is not None and topic.partitions else 1
 
     def execute(self) -> None:
         # Etapa 1: Drenagem em batch
         msgs = self._consumer.consume(num_messages=50, timeout=0.01)
-        if not msgs:
-            return
+        if msgs:
+            self._process(msgs)
+        # Só depois de o lote chegar aos rings: o commit confirma as posições já avançadas pelo consume()
+        self._maybe_commit()
 
+    def _process(self, msgs: list):
         batch_latest = {}
         for msg in msgs:
             if msg.error() or not msg.key():
@@ -42,30 +65,66 @@ class ReadKafkaCommand(IFrameCommand):
             cam_id = msg.key().decode("utf-8")
             if self.target_camera_id and cam_id != self.target_camera_id:
                 continue
+            self.camera_messages[cam_id] = self.camera_messages.get(cam_id, 0) + 1
             batch_latest[cam_id] = msg.value()
 
-        # Etapa 2: Decodificação
-        for cam_id, img_bytes in batch_latest.items():
-            frame = self._decode_frame(img_bytes)
-            if frame is None:
-                continue
+        # Etapa 2: Decodificação em paralelo, diretamente para os rings das câmaras
+        self.decoder.decode_batch(batch_latest)
 
-            if frame.shape[1] != self.width or frame.shape[0] != self.height:
-                frame = cv2.resize(frame, (self.width, self.height))
+    def _maybe_commit(self):
+        now = time.time()
+        if now - self._last_commit < self.commit_interval:
+            return
+        self._last_commit = now
+        self._update_lag()
+        try:
+            self._consumer.commit(asynchronous=True)
+        except KafkaException as e:
+            # Sem offsets novos para confirmar (ex.: nenhuma mensagem desde o último commit)
+            logging.debug(f"[{self.name}] Commit ignorado: {e}")
 
-            try:
-                self.output_queue.put_nowait((cam_id, frame))
-            except Exception:
-                pass # Fila cheia, descarta frame antigo
+    def _update_lag(self):
+        """Lag = high watermark - posição atual, por partição atribuída a este consumidor."""
+        try:
+            positions = self._consumer.position(self._consumer.assignment())
+        except KafkaException as e:
+            logging.debug(f"[{self.name}] Falha ao obter posições: {e}")
+            return
+        lag = {}
+        for tp in positions:
+            low, high = self._consumer.get_watermark_offsets(tp, cached=True)
+            if high < 0:
+                continue
+            offset = tp.offset if tp.offset >= 0 else low
+            lag[tp.partition] = max(0, high - offset)
+        self.partition_lag = lag
 
-    def _decode_frame(self, img_bytes: bytes):
+    def _on_revoke(self, consumer, partitions):
+        # Confirma o que já foi lido antes de as partições passarem para outro consumidor do pool
         try:
-            nparr = np.frombuffer(img_bytes, np.uint8)
-            return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        except Exception as e:
-            logging.debug(f"Falha ao decodificar frame: {e}")
-            return None
+            consumer.commit(asynchronous=False)
+        except KafkaException:
+            pass
+        for tp in partitions:
+            self.partition_lag.pop(tp.partition, None)
+
+    def get_stats(self) -> dict:
+        now = time.time()
+        elapsed = max(now - self._rate_window_start, 1e-6)
+        counts = dict(self.camera_messages)
+        rates = {cam_id: (count - self._rate_window_counts.get(cam_id, 0)) / elapsed for cam_id, count in counts.items()}
+        self._rate_window_start = now
+        self._rate_window_counts = counts
+        return {
+            "partition_lag": dict(self.partition_lag),
+            "camera_msgs_per_sec": {cam_id: round(rate, 2) for cam_id, rate in rates.items()},
+        }
 
     def cleanup(self) -> None:
+        self.decoder.close()
         if self._consumer:
+            try:
+                self._consumer.commit(asynchronous=False)
+            except KafkaException:
+                pass
             self._consumer.close()
\ No newline at end of file
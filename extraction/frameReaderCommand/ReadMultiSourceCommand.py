@@ -0,0 +1,149 @@
+# model/commands/ReadMultiSourceCommand.py
+import os
+import cv2
+import time
+import logging
+import threading
+from extraction.CameraFrameHub import CameraFrameHub
+from extraction.frameReaderCommand.IFrameCommand import IFrameCommand
+
+
+class _SourceCapture(threading.Thread):
+    """
+    Thread de captura de uma fonte RTSP/ficheiro.
+    Faz grab() de todos os frames (barato, sem descodificar) e só faz retrieve() + resize
+    quando o frame calha na decimação para a taxa alvo E o worker já consumiu o anterior.
+    """
+    def __init__(self, cam_id: str, source, frame_hub: CameraFrameHub, width: int, height: int, target_fps: float,
+                 stop_event: threading.Event, reconnect_delay: float = 1.0, max_reconnect_delay: float = 30.0):
+        super().__init__(daemon=True, name=f"Capture-{cam_id}")
+        self.cam_id = cam_id
+        self.source = source
+        self.frame_hub = frame_hub
+        self.width = width
+        self.height = height
+        self.target_fps = target_fps
+        self.stop_event = stop_event
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        # Ficheiros são lidos ao ritmo do FPS de origem (senão o grab() corria à velocidade do disco)
+        self.is_file = isinstance(source, str) and os.path.isfile(source)
+        self.cap = None
+
+        self.grabbed = 0
+        self.retrieved = 0
+        self.reconnects = 0
+
+    def _connect(self) -> bool:
+        logging.info(f"Tentando conectar a {self.source}...")
+        self.cap = cv2.VideoCapture(self.source)
+        if not self.cap.isOpened():
+            logging.error(f"Erro ao abrir fonte de vídeo: {self.source}")
+            self.cap.release()
+            self.cap = None
+            return False
+        return True
+
+    def _release(self):
+        if self.cap:
+            self.cap.release()
+            self.cap = None
+
+    def _stride(self) -> tuple[float, int]:
+        """FPS da fonte e decimação (1 em cada N frames) para chegar à taxa alvo."""
+        source_fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+        if source_fps <= 0 or source_fps > 240:
+            return 0.0, 1
+        if not self.target_fps or self.target_fps <= 0:
+            return source_fps, 1
+        return source_fps, max(1, round(source_fps / self.target_fps))
+
+    def run(self):
+        ring = self.frame_hub.ring_for(self.cam_id)
+        backoff = self.reconnect_delay
+
+        while not self.stop_event.is_set():
+            if self.cap is None:
+                if not self._connect():
+                    self.stop_event.wait(backoff)
+                    backoff = min(backoff * 2, self.max_reconnect_delay)
+                    continue
+                backoff = self.reconnect_delay
+                source_fps, stride = self._stride()
+                frame_period = 1.0 / source_fps if (self.is_file and source_fps) else 0.0
+                # Sem FPS conhecido, a decimação passa a ser por tempo
+                min_interval = 1.0 / self.target_fps if (not source_fps and self.target_fps) else 0.0
+                logging.info(f"[{self.name}] Fonte a {source_fps:.1f} FPS; processa 1 em cada {stride} frames.")
+                index, due, last_retrieve = 0, True, 0.0
+                next_frame_time = time.monotonic()
+
+            if not self.cap.grab():
+                logging.warning(f"Falha na leitura de frame em {self.source}. Tentando reconectar...")
+                self._release()
+                self.reconnects += 1
+                continue
+            self.grabbed += 1
+            index += 1
+            if index % stride == 0:
+                due = True
+
+            now = time.monotonic()
+            if due and ring.needs_frame() and now - last_retrieve >= min_interval:
+                success, frame = self.cap.retrieve()
+                if success:
+                    cv2.resize(frame, (self.width, self.height), dst=ring.begin_write())
+                    ring.commit_write()
+                    self.retrieved += 1
+                    due, last_retrieve = False, now
+                else:
+                    ring.drop()
+
+            if frame_period:
+                next_frame_time += frame_period
+                delay = next_frame_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_frame_time = time.monotonic()
+
+        self._release()
+
+
+class ReadMultiSourceCommand(IFrameCommand):
+    """
+    Comando que gere várias fontes RTSP/ficheiro, cada uma na sua thread de captura com
+    reconexão em backoff exponencial. `sources` é um dicionário {cam_id: url/ficheiro}
+    (ou uma lista, usando a própria fonte como cam_id).
+    """
+    def __init__(self, sources, frame_hub: CameraFrameHub, width: int, height: int, target_fps: float = 10.0,
+                 reconnect_delay: float = 1.0, max_reconnect_delay: float = 30.0):
+        if not isinstance(sources, dict):
+            sources = {str(source): source for source in sources}
+        self.name = "MultiSourceReader"
+        self._stop_event = threading.Event()
+        self._captures = [
+            _SourceCapture(cam_id, source, frame_hub, width, height, target_fps,
+                           self._stop_event, reconnect_delay, max_reconnect_delay)
+            for cam_id, source in sources.items()
+        ]
+        self._started = False
+
+    def execute(self) -> None:
+        # As capturas correm nas suas próprias threads; o invoker apenas as supervisiona
+        if not self._started:
+            for capture in self._captures:
+                capture.start()
+            self._started = True
+        time.sleep(0.5)
+
+    def get_stats(self) -> dict:
+        return {
+            capture.cam_id: {"grabbed": capture.grabbed, "retrieved": capture.retrieved, "reconnects": capture.reconnects}
+            for capture in self._captures
+        }
+
+    def cleanup(self) -> None:
+        self._stop_event.set()
+        for capture in self._captures:
+            capture.join(timeout=2)
@@ -2,16 +2,16 @@
 import cv2
 import logging
 import time
-from queue import Queue, Full
+from extraction.CameraFrameHub import CameraFrameHub
 from extraction.frameReaderCommand.IFrameCommand import IFrameCommand
 
 class ReadRTSPCommand(IFrameCommand):
     """
     Comando responsável por ler frames de uma stream RTSP ou arquivo de vídeo.
     """
-    def __init__(self, source: str, output_queue: Queue, width: int, height: int, reconnect_delay: int = 5):
+    def __init__(self, source: str, frame_hub: CameraFrameHub, width: int, height: int, reconnect_delay: int = 5):
         self.source = source
-        self.output_queue = output_queue
+        self.frame_hub = frame_hub
         self.width = width
         self.height = height
         self.reconnect_delay = reconnect_delay
@@ -37,11 +37,10 @@ class ReadRTSPCommand(IFrameCommand):
             self.cleanup()
             return
 
-        resized_frame = cv2.resize(frame, (self.width, self.height))
-        try:
-            self.output_queue.put((self.source, resized_frame), timeout=1)
-        except Full:
-            logging.debug(f"Fila cheia para {self.source}. Frame descartado.")
+        # Redimensiona diretamente para o slot do ring da câmara (o frame mais recente ganha)
+        ring = self.frame_hub.ring_for(self.source)
+        cv2.resize(frame, (self.width, self.height), dst=ring.begin_write())
+        ring.commit_write()
 
     def cleanup(self) -> None:
         if self.cap:
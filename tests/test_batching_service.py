@@ -0,0 +1,70 @@
+# tests/test_batching_service.py
+import threading
+
+import pytest
+
+from vision.batchingService import DynamicBatchingService
+
+
+class RecordingService(DynamicBatchingService):
+    def __init__(self, stop_event, fail=False, **kwargs):
+        super().__init__(stop_event, **kwargs)
+        self.seen = []
+        self.fail = fail
+
+    def _process_batch(self, payloads: list) -> list:
+        self.seen.append(list(payloads))
+        if self.fail:
+            raise ValueError("modelo indisponível")
+        return [payload * 10 for payload in payloads]
+
+
+@pytest.fixture
+def stop_event():
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def test_waiting_requests_are_grouped_up_to_the_batch_size(stop_event):
+    service = RecordingService(stop_event, max_batch_size=4, max_wait_ms=50)
+    requests = [service.submit(i) for i in range(5)]
+    service.start()
+
+    assert [request.wait(2.0) for request in requests] == [0, 10, 20, 30, 40]
+    assert service.seen == [[0, 1, 2, 3], [4]]
+    stats = service.get_stats()
+    assert stats["batches"] == 2 and stats["items"] == 5
+
+
+def test_request_that_does_not_fit_opens_the_next_batch(stop_event):
+    service = RecordingService(stop_event, max_batch_size=4, max_wait_ms=50)
+    first, second = service.submit(1, size=3), service.submit(2, size=3)
+    service.start()
+
+    assert (first.wait(2.0), second.wait(2.0)) == (10, 20)
+    assert service.seen == [[1], [2]]
+
+
+def test_batch_failure_reaches_every_waiter_and_the_service_keeps_running(stop_event):
+    service = RecordingService(stop_event, fail=True, max_batch_size=2, max_wait_ms=50)
+    requests = [service.submit(i) for i in range(2)]
+    service.start()
+
+    for request in requests:
+        with pytest.raises(ValueError):
+            request.wait(2.0)
+    service.fail = False
+    assert service.submit(7).wait(2.0) == 70
+
+
+def test_pending_requests_are_released_on_shutdown(stop_event):
+    service = RecordingService(stop_event)
+    request = service.submit(1)
+    stop_event.set()
+    service.start()
+    service.join(timeout=2.0)
+
+    with pytest.raises(RuntimeError):
+        request.wait(1.0)
+    assert service.seen == []
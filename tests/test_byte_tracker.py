@@ -0,0 +1,59 @@
+# tests/test_byte_tracker.py
+import pytest
+
+pytest.importorskip("deep_sort_realtime")
+
+from vision.byteTracker import ByteTracker
+
+
+def det(left, top, conf, w=40, h=100):
+    return ([left, top, w, h], conf, 0)
+
+
+def confirmed_ids(tracks):
+    return [t.track_id for t in tracks if t.is_confirmed()]
+
+
+def test_track_is_confirmed_after_n_init_and_keeps_its_id():
+    tracker = ByteTracker(n_init=3)
+    for step in range(3):
+        tracks = tracker.update_tracks([det(100 + step, 50, 0.9)])
+
+    assert confirmed_ids(tracks) == [1]
+    assert tracks[0].time_since_update == 0
+
+
+def test_features_are_cleared_every_frame():
+    tracker = ByteTracker(n_init=1)
+    track = tracker.update_tracks([det(100, 50, 0.9)])[0]
+    track.features = ["embedding"]
+
+    tracks = tracker.update_tracks([det(101, 50, 0.9)])
+
+    assert tracks[0] is track
+    assert tracks[0].features == []
+
+
+def test_low_confidence_detection_keeps_a_tracked_person():
+    tracker = ByteTracker(n_init=1)
+    tracker.update_tracks([det(100, 50, 0.9)])
+
+    tracks = tracker.update_tracks([det(102, 50, 0.3)])
+
+    assert confirmed_ids(tracks) == [1]
+    assert tracks[0].time_since_update == 0
+
+
+def test_low_confidence_detection_never_starts_a_track():
+    tracker = ByteTracker(n_init=1)
+
+    assert tracker.update_tracks([det(100, 50, 0.3)]) == []
+
+
+def test_confirmed_track_is_dropped_after_max_age_misses():
+    tracker = ByteTracker(n_init=1, max_age=2)
+    tracker.update_tracks([det(100, 50, 0.9)])
+
+    assert len(tracker.update_tracks([])) == 1
+    assert len(tracker.update_tracks([])) == 1
+    assert tracker.update_tracks([]) == []
@@ -0,0 +1,69 @@
+# tests/test_camera_history_store.py
+import numpy as np
+
+from core.CameraHistoryStore import CameraHistory, CameraHistoryStore
+
+
+def visit(history, cam_id, t_in, t_out):
+    history.open(cam_id, t_in)
+    history.close_last(t_out)
+
+
+def test_without_path_history_stays_in_memory():
+    store = CameraHistoryStore(path=None, memory_cap=4)
+    history = CameraHistory(1, store, "cam_a", 0.0)
+    history.close_last(1.0)
+    for i in range(1, 20):
+        visit(history, "cam_b", float(i), i + 0.5)
+
+    assert len(history) == 20
+    assert history.spilled == 0
+    assert store.query(global_id=1).shape[0] == 0
+
+
+def test_old_segments_spill_and_full_history_is_preserved(tmp_path):
+    store = CameraHistoryStore(path=str(tmp_path / "history.bin"), memory_cap=4, block_rows=3)
+    history = CameraHistory(7, store, "cam_a", 0.0)
+    history.close_last(0.5)
+    for i in range(1, 12):
+        visit(history, "cam_a" if i % 2 else "cam_b", float(i), i + 0.5)
+
+    assert history.spilled > 0
+    assert len(history) <= 4
+    full = history.to_array()
+    assert full["t_in"].tolist() == [float(i) for i in range(12)]
+    assert [store.cameras[c] for c in full["camera"][:2]] == ["cam_a", "cam_a"]
+    store.close()
+
+
+def test_query_filters_by_identity_and_time(tmp_path):
+    store = CameraHistoryStore(path=str(tmp_path / "history.bin"), memory_cap=4, block_rows=2)
+    cam = store.camera_index("cam_a")
+    for gid, base in ((1, 0.0), (2, 100.0)):
+        segments = np.array([(cam, base + i, base + i + 0.5) for i in range(5)], dtype=[
+            ("camera", "<i4"), ("t_in", "<f8"), ("t_out", "<f8")])
+        store.spill(gid, segments)
+
+    assert store.query(global_id=2)["t_in"].tolist() == [100.0, 101.0, 102.0, 103.0, 104.0]
+    assert store.query(t_start=2.2, t_end=3.0)["t_in"].tolist() == [2.0, 3.0]
+    assert store.query(global_id=1, t_start=100.0).shape[0] == 0
+    assert store.max_global_id() == 2
+    store.close()
+
+
+def test_reopened_store_keeps_spilled_rows_and_cameras(tmp_path):
+    path = str(tmp_path / "history.bin")
+    store = CameraHistoryStore(path=path, memory_cap=4, block_rows=2)
+    history = CameraHistory(3, store, "cam_x", 0.0)
+    history.close_last(1.0)
+    visit(history, "cam_y", 2.0, 3.0)
+    history.spill_all(4.0)
+    store.close()
+
+    reopened = CameraHistoryStore(path=path, memory_cap=4, block_rows=2)
+    rows = reopened.query(global_id=3)
+
+    assert rows["t_in"].tolist() == [0.0, 2.0]
+    assert [reopened.cameras[c] for c in rows["camera"]] == ["cam_x", "cam_y"]
+    assert reopened.get_stats()["disk_rows"] == 2
+    reopened.close()
@@ -0,0 +1,26 @@
+# tests/test_camera_process.py
+import queue
+import threading
+
+from vision.cameraProcess import CameraProcessHost
+
+
+class FakeStatsSource:
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def get_stats(self) -> dict:
+        return self.stats
+
+
+def test_worker_and_service_stats_are_sent_to_the_parent():
+    stats_queue = queue.Queue()
+    host = CameraProcessHost(0, object(), None, b"", threading.Event(), queue.Queue(), stats_queue=stats_queue)
+    workers = {"cam1": FakeStatsSource({"motion_gate": {"frames": 10, "skipped": 4}}), "cam2": FakeStatsSource({})}
+
+    host._publish_stats(workers, FakeStatsSource({"batches": 3}), None)
+
+    assert stats_queue.get_nowait() == {
+        "workers": {"cam1": {"motion_gate": {"frames": 10, "skipped": 4}}, "cam2": {}},
+        "detection": {"batches": 3},
+    }
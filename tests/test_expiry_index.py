@@ -0,0 +1,90 @@
+# tests/test_expiry_index.py
+import threading
+import time
+
+from core.ExpiryIndex import ExpiryIndex
+
+
+def test_stale_then_expired_in_last_seen_order():
+    index = ExpiryIndex()
+    for gid, t in ((1, 0.0), (2, 1.0), (3, 2.0), (4, 3.0)):
+        index.touch(gid, t)
+
+    assert index.pop_stale(cutoff=2.0) == [1, 2]
+    assert len(index) == 4                     # Dormentes continuam retidas
+    assert index.pop_expired(cutoff=0.5) == [1]
+    assert index.pop_expired(cutoff=10.0) == [2]
+    assert index.pop_stale(cutoff=10.0) == [3, 4]
+
+
+def test_touch_moves_to_the_back_and_revives_dormant():
+    index = ExpiryIndex()
+    index.touch(1, 0.0)
+    index.touch(2, 1.0)
+    index.touch(1, 5.0)
+    assert index.pop_stale(cutoff=2.0) == [2]
+
+    index.touch(2, 6.0)                        # Volta a ser vista: sai das dormentes
+    assert index.pop_expired(cutoff=100.0) == []
+    assert index.pop_stale(cutoff=100.0) == [1, 2]
+
+
+def test_discard_removes_from_both_phases():
+    index = ExpiryIndex()
+    index.touch(1, 0.0)
+    index.touch(2, 0.0)
+    index.pop_stale(cutoff=1.0)
+    index.touch(3, 0.0)
+    index.discard(1)
+    index.discard(3)
+
+    assert len(index) == 1
+    assert index.pop_expired(cutoff=1.0) == [2]
+
+
+def test_next_deadline():
+    index = ExpiryIndex()
+    assert index.next_deadline(10.0, 20.0) == float('inf')
+    index.touch(1, 5.0)
+    assert index.next_deadline(10.0, 20.0) == 15.0
+    index.pop_stale(cutoff=6.0)
+    index.touch(2, 7.0)
+    assert index.next_deadline(10.0, 20.0) == 17.0
+    index.touch(2, 30.0)
+    assert index.next_deadline(10.0, 20.0) == 25.0
+
+
+def test_next_deadline_is_safe_against_concurrent_mutation():
+    index = ExpiryIndex()
+    lock = threading.Lock()
+    stop = threading.Event()
+    errors = []
+
+    def writer():
+        t = 0.0
+        while not stop.is_set():
+            with lock:
+                for gid in range(50):
+                    t += 0.01
+                    index.touch(gid, t)
+                for gid in range(0, 50, 3):
+                    index.discard(gid)
+                index.pop_stale(t - 0.2)
+
+    def reader():
+        # Como _expire_idle_shards: leitura sem o lock da partição
+        while not stop.is_set():
+            try:
+                index.next_deadline(1.0, 2.0)
+            except Exception as e:
+                errors.append(e)
+                return
+
+    threads = [threading.Thread(target=writer), threading.Thread(target=reader)]
+    for thread in threads:
+        thread.start()
+    time.sleep(1.0)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert not errors, errors[:1]
@@ -0,0 +1,47 @@
+# tests/test_feature_extractor.py
+import numpy as np
+
+from vision.featureExtractor import extract_color_histogram, extract_color_histograms, extract_color_signatures
+
+RED, BLUE, GREEN = (0, 0, 220), (200, 40, 0), (30, 180, 30)
+
+
+def block_frame():
+    """Frame com blocos de cor lisa maiores do que as caixas (o blur não mistura cores dentro dos recortes)."""
+    frame = np.zeros((240, 320, 3), dtype=np.uint8)
+    frame[10:130, 10:110] = RED
+    frame[10:130, 150:250] = BLUE
+    frame[140:235, 20:300] = GREEN
+    return frame
+
+
+BOXES = [[20, 20, 100, 120], [160, 20, 240, 120], [40, 150, 280, 225]]
+
+
+def bhattacharyya(a, b):
+    return float(np.sqrt(max(0.0, 1.0 - np.sqrt(a * b).sum())))
+
+
+def test_batched_histograms_match_the_per_box_version():
+    frame = block_frame()
+    batched = extract_color_histograms(frame, BOXES)
+
+    for row, box in zip(batched, BOXES):
+        assert np.allclose(row, extract_color_histogram(frame, box))
+
+
+def test_signatures_are_distributions_that_separate_colors():
+    signatures = extract_color_signatures(block_frame(), BOXES + [[20, 20, 100, 120]])
+
+    assert np.allclose(signatures.sum(axis=1), 1.0)
+    assert bhattacharyya(signatures[0], signatures[3]) < 1e-3
+    assert bhattacharyya(signatures[0], signatures[1]) > 0.9
+    assert bhattacharyya(signatures[1], signatures[2]) > 0.9
+
+
+def test_boxes_outside_the_frame_give_empty_signatures():
+    signatures = extract_color_signatures(block_frame(), [[400, 300, 450, 380], [20, 20, 100, 120]])
+
+    assert not signatures[0].any()
+    assert np.isclose(signatures[1].sum(), 1.0)
+    assert extract_color_signatures(block_frame(), []).shape[0] == 0
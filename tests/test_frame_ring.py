@@ -0,0 +1,119 @@
+# tests/test_frame_ring.py
+import queue
+import threading
+
+import numpy as np
+import pytest
+
+from extraction.FrameRing import FrameRing
+from extraction.SharedFrameRing import SharedFrameRing
+
+
+def frame(value, shape=(2, 4, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def test_latest_frame_wins_and_counts_overwrites():
+    ring = FrameRing("cam", 4, 2)
+    ring.put(frame(1))
+    ring.put(frame(2))
+
+    assert ring.get(timeout=0.1)[0, 0, 0] == 2
+    assert ring.get_stats()["overwritten"] == 1
+    with pytest.raises(queue.Empty):
+        ring.get(timeout=0.01)
+
+
+def test_leased_slot_is_never_reused_by_the_writer():
+    ring = FrameRing("cam", 4, 2)
+    ring.put(frame(1))
+    leased = ring.get(timeout=0.1)
+    for value in range(2, 10):
+        ring.put(frame(value))
+        # O worker continua a ver o seu frame até ao get() seguinte
+        assert leased[0, 0, 0] == 1
+    assert ring.get(timeout=0.1)[0, 0, 0] == 9
+
+
+def test_abort_releases_only_the_callers_reservation():
+    ring = FrameRing("cam", 4, 2)
+    ring.begin_write()[:] = 7
+
+    other = threading.Thread(target=ring.abort_write)
+    other.start()
+    other.join()
+    ring.commit_write()
+
+    assert ring.get(timeout=0.1)[0, 0, 0] == 7
+    assert ring.get_stats()["dropped"] == 0
+
+
+def test_abort_by_the_writer_drops_the_frame():
+    ring = FrameRing("cam", 4, 2)
+    ring.begin_write()
+    ring.abort_write()
+    ring.abort_write()                 # Sem reserva: não faz nada
+    ring.commit_write()                # Nada reservado: não publica
+
+    assert ring.get_stats()["dropped"] == 1
+    assert ring.needs_frame()
+
+
+def test_second_writer_thread_is_rejected_while_a_slot_is_reserved():
+    ring = FrameRing("cam", 4, 2)
+    ring.begin_write()[:] = 5
+    errors = []
+
+    def intruder():
+        try:
+            ring.begin_write()[:] = 9
+        except RuntimeError as e:
+            errors.append(e)
+        ring.commit_write()            # Não é o dono da reserva: não publica
+
+    other = threading.Thread(target=intruder)
+    other.start()
+    other.join()
+    assert len(errors) == 1
+    assert ring.needs_frame()
+
+    ring.commit_write()
+    assert ring.get(timeout=0.1)[0, 0, 0] == 5
+
+
+def test_rebegin_by_the_writer_drops_the_old_reservation():
+    ring = FrameRing("cam", 4, 2)
+    ring.put(frame(1))
+    leased = ring.get(timeout=0.1)
+    ring.put(frame(2))
+    ring.begin_write()[:] = 3
+    ring.begin_write()[:] = 4
+    ring.commit_write()
+
+    assert leased[0, 0, 0] == 1
+    assert ring.get(timeout=0.1)[0, 0, 0] == 4
+    assert ring.get_stats()["dropped"] == 1
+    assert ring.get_stats()["overwritten"] == 1
+
+
+def test_drop_and_wrong_shape_are_counted():
+    ring = FrameRing("cam", 4, 2)
+    ring.drop()
+    ring.put(frame(1, shape=(3, 3, 3)))
+    assert ring.get_stats() == {"written": 0, "read": 0, "overwritten": 0, "dropped": 2}
+
+
+def test_shared_ring_abort_without_reservation_is_a_no_op():
+    ring = SharedFrameRing.create("cam", 4, 2)
+    try:
+        ring.abort_write()
+        ring.put(frame(3))
+        ring.begin_write()
+        ring.abort_write()
+
+        reader = SharedFrameRing.attach(ring.name, 4, 2)
+        assert reader.get(timeout=0.1)[0, 0, 0] == 3
+        assert ring.get_stats()["dropped"] == 1
+        reader.close()
+    finally:
+        ring.close()
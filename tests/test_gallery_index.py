@@ -0,0 +1,115 @@
+# tests/test_gallery_index.py
+import threading
+
+import numpy as np
+
+from core.GalleryIndex import IVFGalleryIndex
+from core.IdentityGallery import IdentityGallery
+
+
+def filled_gallery(n=200, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    gallery = IdentityGallery(initial_capacity=8)
+    for gid in range(1, n + 1):
+        gallery.upsert(gid, rng.normal(size=dim).astype(np.float32), [0, 0], False, f"cam{gid % 4}", 0.0)
+    return gallery
+
+
+def test_synchronous_training_assigns_every_live_slot():
+    gallery = filled_gallery()
+    index = IVFGalleryIndex(gallery, n_lists=8, min_train_size=50)
+    index.maybe_train()
+
+    assert index.is_trained and index.centroids.shape == (8, 16)
+    live = gallery.live_mask()
+    assert (index.slot_list[:gallery._high_water][live] >= 0).all()
+
+
+def test_background_training_does_not_hold_the_lock():
+    gallery = filled_gallery()
+    lock = threading.Lock()
+    index = IVFGalleryIndex(gallery, n_lists=8, min_train_size=50, lock=lock)
+    with lock:
+        index.maybe_train()
+        # O treino corre noutra thread: com o lock na mão, ainda nada foi instalado
+        assert not index.is_trained
+    index.wait_for_training(timeout=10)
+
+    assert index.is_trained
+    assert (index.slot_list[:gallery._high_water][gallery.live_mask()] >= 0).all()
+
+
+def test_slots_written_during_training_are_assigned_on_install():
+    gallery = filled_gallery()
+    lock = threading.Lock()
+    index = IVFGalleryIndex(gallery, n_lists=8, min_train_size=50, lock=lock)
+    with lock:
+        index.maybe_train()
+        slot = gallery.upsert(999, np.ones(16, dtype=np.float32), [0, 0], False, "cam0", 0.0)
+        index.on_upsert(slot)
+    index.wait_for_training(timeout=10)
+
+    assert index.slot_list[slot] >= 0
+
+
+def test_candidates_always_include_the_query_environment():
+    gallery = filled_gallery()
+    index = IVFGalleryIndex(gallery, n_lists=8, n_probe=1, min_train_size=50)
+    index.maybe_train()
+    env_mask = np.zeros(len(gallery.camera_ids), dtype=bool)
+    env_mask[gallery.camera_index("cam1")] = True
+
+    mask = index.candidates(np.ones(16, dtype=np.float32), env_mask, current_time=0.0, max_time_lost=10.0)
+    same_env = gallery.camera_idx[:gallery._high_water] == gallery.camera_index("cam1")
+    assert mask[same_env].all()
+    assert mask.sum() < gallery._high_water
+
+
+def test_installed_index_is_never_seen_with_training_in_progress():
+    gallery = filled_gallery()
+    lock = threading.Lock()
+    index = IVFGalleryIndex(gallery, n_lists=8, min_train_size=50, lock=lock)
+    with lock:
+        index.maybe_train()
+    while True:
+        with lock:
+            if index.is_trained:
+                assert index._training is None
+                break
+    index.wait_for_training(timeout=10)
+
+
+def test_candidates_exclude_slots_outside_the_time_window():
+    gallery = filled_gallery()
+    stale = gallery.upsert(999, np.ones(16, dtype=np.float32), [0, 0], False, "cam1", -100.0)
+    index = IVFGalleryIndex(gallery, n_lists=8, n_probe=8, min_train_size=50)
+    index.maybe_train()
+    env_mask = np.ones(len(gallery.camera_ids), dtype=bool)
+
+    mask = index.candidates(np.ones(16, dtype=np.float32), env_mask, current_time=0.0, max_time_lost=10.0)
+    assert not mask[stale]
+    assert mask.sum() == gallery._high_water - 1
+
+
+def test_stats_are_consistent_under_concurrent_queries():
+    gallery = filled_gallery()
+    index = IVFGalleryIndex(gallery, n_lists=8, min_train_size=50)
+    index.maybe_train()
+    env_mask = np.zeros(len(gallery.camera_ids), dtype=bool)
+    query = np.ones(16, dtype=np.float32)
+
+    def run():
+        for i in range(250):
+            index.candidates(query, env_mask, current_time=0.0, max_time_lost=10.0)
+            index.record_recall(i, i if i % 2 else -1)
+
+    threads = [threading.Thread(target=run) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = index.get_stats()
+    assert stats["queries"] == 1000
+    assert stats["recall_samples"] == 1000
+    assert stats["recall"] == 0.5
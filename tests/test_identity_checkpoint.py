@@ -0,0 +1,104 @@
+# tests/test_identity_checkpoint.py
+import numpy as np
+import pytest
+
+from core.GlobalIdentityManager import GlobalIdentityManager
+from core.IdentityCheckpoint import read_checkpoint, write_checkpoint
+
+
+def test_arrays_round_trip_through_mmap(tmp_path):
+    path = str(tmp_path / "ck.bin")
+    arrays = {
+        "ids": np.arange(5, dtype=np.int64),
+        "features": np.random.default_rng(0).normal(size=(5, 7)).astype(np.float32),
+        "empty": np.zeros((0, 3), dtype=np.float32),
+        "flags": np.array([True, False, True, True, False]),
+    }
+    write_checkpoint(path, arrays, {"next_global_id": 42, "cameras": ["a", "b"]})
+
+    meta, loaded = read_checkpoint(path)
+    assert meta["next_global_id"] == 42 and meta["cameras"] == ["a", "b"]
+    for name, array in arrays.items():
+        assert loaded[name].dtype == array.dtype
+        assert np.array_equal(loaded[name], array)
+    assert loaded["features"].ctypes.data % 64 == 0
+
+
+def test_rejects_foreign_files(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"not a checkpoint at all")
+    with pytest.raises(ValueError):
+        read_checkpoint(str(path))
+
+
+class Config:
+    MAX_TIME_LOST = 50.0
+    CAMERA_HISTORY_MEMORY_CAP = 4
+    AUTO_CLUSTER_TIME_THRESHOLD = 5.0
+
+    def __init__(self, tmp_path):
+        self.CAMERA_HISTORY_SPILL_PATH = str(tmp_path / "history.bin")
+
+
+def history(manager, gid):
+    return [(r["camera_id"], r["timestamp_in"]) for r in manager.get_snapshot().raw_history(gid)]
+
+
+def populated_manager(config):
+    manager = GlobalIdentityManager(config)
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(20, 32)).astype(np.float32)
+    gids = [manager.assign_global_ids([f], [[10 * i, 10, 10 * i + 40, 100]], f"cam{i % 4}", 0.0)[0]
+            for i, f in enumerate(features)]
+    # As 10 primeiras continuam ativas e trocam de câmara (o histórico despeja para disco)
+    for step in range(1, 15):
+        for i, gid in enumerate(gids[:10]):
+            manager.update_existing_identity(gid, None, [0, 10, 40, 100], f"cam{(step + i) % 4}", step * 3.0)
+    return manager, gids
+
+
+def test_restore_brings_back_recent_identities_only(tmp_path):
+    config = Config(tmp_path)
+    manager, gids = populated_manager(config)
+    expected = {gid: history(manager, gid) for gid in gids[:10]}
+    manager.checkpoint(str(tmp_path / "ck.bin"))
+    manager.close()
+
+    restored = GlobalIdentityManager(config)
+    assert restored.restore_checkpoint(str(tmp_path / "ck.bin"), current_time=60.0) == 10
+    assert restored.next_global_id == manager.next_global_id
+    assert restored.cluster_manager.parent == manager.cluster_manager.parent
+    for gid in gids[:10]:
+        assert gid in restored._identity_shard
+        assert history(restored, gid) == expected[gid]
+        live = restored._identity_shard[gid].identities[gid]
+        original = manager.get_snapshot().records[gid]
+        assert np.allclose(live.feature_vector, original.feature_vector)
+    # As restantes (vistas em t=0) ficaram só com o histórico em disco
+    for gid in gids[10:]:
+        assert gid not in restored._identity_shard
+        assert restored.get_identity_history(gid)
+
+
+def test_restore_skips_segments_spilled_after_the_checkpoint(tmp_path):
+    config = Config(tmp_path)
+    manager, gids = populated_manager(config)
+    manager.checkpoint(str(tmp_path / "ck.bin"))
+    for step in range(15, 18):
+        manager.update_existing_identity(gids[0], None, [0, 10, 40, 100], f"cam{step % 4}", step * 3.0)
+    manager.close()
+
+    restored = GlobalIdentityManager(config)
+    restored.restore_checkpoint(str(tmp_path / "ck.bin"), current_time=60.0)
+    keys = history(restored, gids[0])
+    assert len(keys) == len(set(keys))
+    assert [t for _, t in keys] == sorted(t for _, t in keys)
+
+
+def test_cold_start_never_reuses_spilled_ids(tmp_path):
+    config = Config(tmp_path)
+    manager, gids = populated_manager(config)
+    manager.close()
+
+    fresh = GlobalIdentityManager(config)
+    assert fresh.next_global_id > max(gids[:10])
@@ -0,0 +1,128 @@
+# tests/test_identity_gallery.py
+import numpy as np
+from scipy.spatial.distance import cosine
+
+from core.IdentityGallery import IdentityGallery
+
+INTRA, INTER = 0.25, 0.40
+MAX_TIME_LOST, MAX_SPATIAL = 10.0, 150
+
+
+def reference_costs(identities, query, center, cam_id, current_time, exclude):
+    """Ciclo original por identidade (GlobalIdentityManager.get_or_create_global_id da versão base)."""
+    costs = {}
+    for gid, ident in identities.items():
+        if gid in exclude:
+            continue
+        time_lost = current_time - ident["last_seen"]
+        if time_lost > MAX_TIME_LOST:
+            continue
+        appearance_dist = cosine(query, ident["feature"])
+        if ident["camera"] == cam_id:
+            spatial_dist = np.linalg.norm(center - ident["center"])
+            if spatial_dist > MAX_SPATIAL and time_lost < 1.0:
+                continue
+            if not ident["near_edge"] and not appearance_dist > 0.50:
+                if spatial_dist < 80 and time_lost < 2.0:
+                    appearance_dist *= 0.1
+                elif spatial_dist < 150 and time_lost < 4.0:
+                    appearance_dist *= 0.4
+            if appearance_dist < INTRA:
+                costs[gid] = appearance_dist
+        elif appearance_dist < INTER:
+            costs[gid] = appearance_dist
+    return costs
+
+
+def make_identities(rng, n=120, dim=32):
+    base = rng.normal(size=(8, dim))
+    identities = {}
+    for gid in range(1, n + 1):
+        # Vetores agrupados em torno de poucos protótipos, para haver pares abaixo dos limiares
+        feature = base[gid % 8] + rng.normal(scale=0.35, size=dim)
+        identities[gid] = {
+            "feature": feature.astype(np.float32),
+            "center": rng.uniform(0, 300, size=2),
+            "near_edge": bool(rng.random() < 0.2),
+            "camera": f"cam{gid % 3}",
+            "last_seen": float(rng.uniform(0, 14)),
+        }
+    return identities
+
+
+def build_gallery(identities):
+    gallery = IdentityGallery(initial_capacity=4)
+    for gid, ident in identities.items():
+        gallery.upsert(gid, ident["feature"], ident["center"], ident["near_edge"], ident["camera"], ident["last_seen"])
+    return gallery
+
+
+def test_score_matches_original_loop():
+    rng = np.random.default_rng(7)
+    identities = make_identities(rng)
+    gallery = build_gallery(identities)
+    # Slots libertados e reutilizados não podem afetar o resultado
+    for gid in (3, 17, 40):
+        gallery.remove(gid)
+        del identities[gid]
+
+    queries = np.stack([identities[gid]["feature"] + rng.normal(scale=0.2, size=32) for gid in (1, 2, 5, 9, 11)])
+    centers = rng.uniform(0, 300, size=(5, 2))
+    exclude = {2, 50}
+    current_time = 12.0
+
+    for cam_id in ("cam0", "cam1", "cam2"):
+        gids, cost = gallery.score(queries, centers, cam_id, current_time, exclude, INTRA, INTER, MAX_TIME_LOST, MAX_SPATIAL)
+        for q in range(queries.shape[0]):
+            expected = reference_costs(identities, queries[q], centers[q], cam_id, current_time, exclude)
+            finite = np.isfinite(cost[q])
+            got = dict(zip(gids[finite].tolist(), cost[q][finite].tolist()))
+            assert got.keys() == expected.keys()
+            for gid, value in expected.items():
+                assert np.isclose(got[gid], value, atol=1e-5)
+
+
+def test_score_respects_candidate_masks():
+    rng = np.random.default_rng(3)
+    gallery = build_gallery(make_identities(rng, n=40))
+    queries = rng.normal(size=(2, 32)).astype(np.float32)
+    centers = np.zeros((2, 2))
+    masks = np.zeros((2, gallery._high_water), dtype=bool)
+    masks[0, :10] = True
+
+    gids, cost = gallery.score(queries, centers, "cam0", 12.0, set(), 2.0, 2.0, MAX_TIME_LOST, MAX_SPATIAL, candidate_masks=masks)
+    slots = np.array([gallery.gid_to_slot[g] for g in gids.tolist()])
+    assert np.isinf(cost[0][slots >= 10]).all()
+    assert np.isinf(cost[1]).all()
+
+
+def test_snapshot_is_independent():
+    rng = np.random.default_rng(5)
+    identities = make_identities(rng, n=10)
+    gallery = build_gallery(identities)
+    snap = gallery.snapshot()
+    gallery.remove(1)
+    gallery.upsert(2, np.zeros(32, dtype=np.float32) + 1, [0, 0], False, "cam9", 99.0)
+
+    assert 1 in snap and 1 not in gallery
+    assert np.allclose(snap.features[snap.gid_to_slot[2]], identities[2]["feature"])
+
+
+def test_color_prefilter_drops_candidates_with_a_different_color():
+    red, blue = np.zeros(128, dtype=np.float32), np.zeros(128, dtype=np.float32)
+    red[0], blue[100] = 1.0, 1.0
+    feature = np.ones(32, dtype=np.float32)
+    gallery = IdentityGallery(initial_capacity=4)
+    gallery.upsert(1, feature, [0, 0], False, "cam0", 0.0, color_signature=red)
+    gallery.upsert(2, feature, [0, 0], False, "cam0", 0.0, color_signature=blue)
+    gallery.upsert(3, feature, [0, 0], False, "cam0", 0.0)
+
+    def matched(query_color):
+        gids, cost = gallery.score(feature[None, :], np.zeros((1, 2)), "cam1", 1.0, set(), INTRA, INTER,
+                                   MAX_TIME_LOST, MAX_SPATIAL, query_colors=query_color[None, :], color_threshold=0.6)
+        return set(gids[np.isfinite(cost[0])].tolist())
+
+    # Sem assinatura (na galeria ou na consulta) a cor não exclui ninguém
+    assert matched(red) == {1, 3}
+    assert matched(blue) == {2, 3}
+    assert matched(np.zeros(128, dtype=np.float32)) == {1, 2, 3}
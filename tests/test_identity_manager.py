@@ -0,0 +1,119 @@
+# tests/test_identity_manager.py
+import threading
+
+import numpy as np
+
+from core.GlobalIdentityManager import GlobalIdentityManager
+
+
+class AnnConfig:
+    REID_ANN_INDEX = True
+    REID_ANN_MIN_GALLERY_SIZE = 50
+    REID_ANN_RECALL_SAMPLE_RATE = 1.0
+    REID_ANN_REPORT_INTERVAL = 10
+    MAX_TIME_LOST = 1e9
+    CAMERA_HISTORY_SPILL_PATH = None
+
+
+class ExactConfig:
+    SIMILARITY_THRESHOLD = 0.20
+    INTER_CAMERA_THRESHOLD = 0.35
+    MAX_TIME_LOST = 10.0
+    CAMERA_HISTORY_SPILL_PATH = None
+
+
+def unit(degrees, dim=32):
+    """Vetor unitário no plano dos dois primeiros eixos, a `degrees` graus do primeiro."""
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[0], vector[1] = np.cos(np.radians(degrees)), np.sin(np.radians(degrees))
+    return vector
+
+
+def run_with_timeout(target, timeout=30.0):
+    errors = []
+
+    def wrapper():
+        try:
+            target()
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=wrapper, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "assign_global_ids bloqueou (deadlock no lock da partição?)"
+    assert not errors, errors
+
+
+def test_recall_sampling_with_ann_index_does_not_deadlock():
+    manager = GlobalIdentityManager(AnnConfig())
+    rng = np.random.default_rng(0)
+
+    def feed():
+        # Muitas amostras de recall: o relatório (get_index_stats) é pedido várias vezes
+        for i in range(120):
+            features = list(rng.normal(size=(2, 32)).astype(np.float32))
+            manager.assign_global_ids(features, [[0, 0, 10, 10]] * 2, f"cam{i % 3}", float(i))
+
+    run_with_timeout(feed)
+    for shard in manager.shards:
+        shard.index.wait_for_training(timeout=10)
+    stats = manager.get_index_stats()
+    assert sum(s["recall_samples"] for s in stats.values()) == 240
+
+
+def test_recall_is_credited_to_the_camera_shard():
+    manager = GlobalIdentityManager(AnnConfig())
+    rng = np.random.default_rng(1)
+
+    def feed():
+        for i in range(30):
+            manager.assign_global_ids([rng.normal(size=32).astype(np.float32)], [[0, 0, 10, 10]], "camB", float(i))
+
+    run_with_timeout(feed)
+    home = manager._camera_shard["camB"]
+    for shard in manager.shards:
+        expected = 30 if shard is home else 0
+        assert shard.index.get_stats()["recall_samples"] == expected
+
+
+def test_identities_are_matched_across_frames():
+    manager = GlobalIdentityManager(AnnConfig())
+    rng = np.random.default_rng(2)
+    features = rng.normal(size=(3, 32)).astype(np.float32)
+    boxes = [[100, 100, 150, 200], [300, 100, 350, 200], [500, 100, 550, 200]]
+
+    first = manager.assign_global_ids(list(features), boxes, "cam0", 0.0)
+    second = manager.assign_global_ids(list(features[::-1]), boxes[::-1], "cam0", 0.5)
+
+    assert len(set(first)) == 3
+    assert second == first[::-1]
+
+
+def test_batched_assignment_is_optimal_and_order_independent():
+    # A (0°) e B (60°); q1 (29°) está um pouco mais perto de A, mas q2 (-5°) só é compatível com A.
+    # Uma atribuição gulosa na ordem das faixas daria A a q1 e deixaria q2 sem par.
+    boxes = [[100, 100, 150, 200], [300, 100, 350, 200]]
+
+    def assign(order):
+        manager = GlobalIdentityManager(ExactConfig())
+        gid_a, gid_b = manager.assign_global_ids([unit(0), unit(60)], boxes, "cam0", 0.0)
+        queries = [unit(29), unit(-5)]
+        result = manager.assign_global_ids([queries[i] for i in order], [boxes[i] for i in order], "cam1", 5.0)
+        return gid_a, gid_b, result
+
+    gid_a, gid_b, result = assign([0, 1])
+    assert result == [gid_b, gid_a]
+    gid_a, gid_b, result = assign([1, 0])
+    assert result == [gid_a, gid_b]
+
+
+def test_one_identity_is_never_given_to_two_tracks_of_the_same_frame():
+    manager = GlobalIdentityManager(ExactConfig())
+    boxes = [[100, 100, 150, 200], [300, 100, 350, 200]]
+    (gid_a,) = manager.assign_global_ids([unit(0)], boxes[:1], "cam0", 0.0)
+
+    result = manager.assign_global_ids([unit(1), unit(2)], boxes, "cam1", 5.0)
+
+    assert result.count(gid_a) == 1
+    assert len(set(result)) == 2
@@ -0,0 +1,63 @@
+# tests/test_identity_update_buffer.py
+import numpy as np
+
+from core.GlobalIdentity import GlobalIdentity
+from core.IdentityUpdateBuffer import IdentityUpdateBuffer
+
+
+def test_coalesced_ema_equals_sequential_updates():
+    rng = np.random.default_rng(0)
+    initial = rng.normal(size=16).astype(np.float32)
+    observations = rng.normal(size=(7, 16)).astype(np.float32)
+
+    sequential = GlobalIdentity(1, initial.copy(), [0, 0, 10, 10], "cam0", 0.0)
+    for i, feature in enumerate(observations):
+        sequential.update(feature, [i, 0, i + 10, 10], "cam0", 0.1 * (i + 1))
+
+    buffer = IdentityUpdateBuffer("cam0")
+    for i, feature in enumerate(observations):
+        buffer.add(1, feature, [i, 0, i + 10, 10], 0.1 * (i + 1))
+    (update,) = buffer.drain()
+    coalesced = GlobalIdentity(1, initial.copy(), [0, 0, 10, 10], "cam0", 0.0)
+    coalesced.update_coalesced(update.feature_decay, update.feature_increment, update.bbox, "cam0", update.last_time)
+
+    assert update.count == 7
+    assert np.allclose(coalesced.feature_vector, sequential.feature_vector, atol=1e-5)
+    assert coalesced.last_bbox == sequential.last_bbox
+    assert coalesced.last_seen == sequential.last_seen
+
+
+def test_updates_without_features_keep_the_vector():
+    buffer = IdentityUpdateBuffer("cam0")
+    buffer.add(5, None, [1, 2, 3, 4], 1.0)
+    buffer.add(5, None, [2, 3, 4, 5], 2.0)
+    (update,) = buffer.drain()
+
+    assert update.feature_increment is None and update.feature_decay == 1.0
+    assert update.bbox == [2, 3, 4, 5] and update.last_time == 2.0
+
+
+def test_latest_color_signature_wins():
+    buffer = IdentityUpdateBuffer("cam0")
+    buffer.add(1, None, [0, 0, 1, 1], 1.0, color_signature=np.array([1.0, 0.0]))
+    buffer.add(1, None, [0, 0, 1, 1], 2.0)
+    buffer.add(1, None, [0, 0, 1, 1], 3.0, color_signature=np.array([0.0, 1.0]))
+    (update,) = buffer.drain()
+
+    assert np.array_equal(update.color_signature, [0.0, 1.0])
+
+
+def test_one_entry_per_identity_and_flush_deadline():
+    buffer = IdentityUpdateBuffer("cam0", flush_interval=0.25)
+    assert not buffer.is_due(10.0)          # Buffer vazio nunca está pendente
+    for t in (10.0, 10.1, 10.2):
+        buffer.add(1, np.ones(4), [0, 0, 1, 1], t)
+        buffer.add(2, np.ones(4), [0, 0, 1, 1], t)
+
+    assert len(buffer) == 2
+    assert not buffer.is_due(10.2)
+    assert buffer.is_due(10.25)
+    assert len(buffer.drain(10.25)) == 2
+    assert len(buffer) == 0
+    stats = buffer.get_stats()
+    assert stats["received"] == 6 and stats["flushed"] == 2 and stats["coalescing_ratio"] == 3.0
@@ -0,0 +1,42 @@
+# tests/test_mjpeg_server.py
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from ui.mjpegServer import MJPEGStreamServer
+
+
+@pytest.fixture
+def server():
+    stop_event = threading.Event()
+    server = MJPEGStreamServer(object(), stop_event, port=0)
+    server.start()
+    yield server
+    stop_event.set()
+    server.join(timeout=2.0)
+
+
+def url(server, path):
+    host, port = server.address
+    return f"http://{host}:{port}{path}"
+
+
+def test_unknown_stream_is_404_and_is_not_registered(server):
+    with pytest.raises(urllib.error.HTTPError) as excinfo:
+        urllib.request.urlopen(url(server, "/stream/nao_existe"), timeout=2.0)
+
+    assert excinfo.value.code == 404
+    assert "nao_existe" not in server._streams
+
+
+def test_index_lists_registered_cameras_escaped(server):
+    server.wants_frame("<b>cam</b>", 0.0)
+
+    with urllib.request.urlopen(url(server, "/"), timeout=2.0) as response:
+        body = response.read().decode("utf-8")
+
+    assert "<b>cam</b>" not in body
+    assert "&lt;b&gt;cam&lt;/b&gt;" in body
+    assert 'href="/stream/%3Cb%3Ecam%3C%2Fb%3E"' in body
@@ -0,0 +1,77 @@
+# tests/test_read_kafka_command.py
+import pytest
+
+pytest.importorskip("confluent_kafka")
+
+from extraction.frameReaderCommand import ReadKafkaCommand as kafka_module
+
+
+class FakeMessage:
+    def __init__(self, key: bytes, value: bytes):
+        self._key, self._value = key, value
+
+    def error(self):
+        return None
+
+    def key(self):
+        return self._key
+
+    def value(self):
+        return self._value
+
+
+class FakeConsumer:
+    def __init__(self, events: list, batches: list):
+        self.events = events
+        self.batches = batches
+
+    def subscribe(self, topics, on_revoke=None):
+        pass
+
+    def consume(self, num_messages, timeout):
+        self.events.append("consume")
+        return self.batches.pop(0) if self.batches else []
+
+    def commit(self, asynchronous=True):
+        self.events.append("commit")
+
+    def assignment(self):
+        return []
+
+    def position(self, partitions):
+        return []
+
+
+class FakeDecoder:
+    def __init__(self, events: list):
+        self.events = events
+
+    def decode_batch(self, latest: dict):
+        self.events.append(("decode", sorted(latest)))
+
+
+@pytest.fixture
+def command(monkeypatch):
+    events = []
+    batches = [[FakeMessage(b"cam1", b"a"), FakeMessage(b"cam2", b"b"), FakeMessage(b"cam1", b"c")]]
+    monkeypatch.setattr(kafka_module, "Consumer", lambda conf: FakeConsumer(events, batches))
+    monkeypatch.setattr(kafka_module, "FrameDecoder", lambda *args, **kwargs: FakeDecoder(events))
+    cmd = kafka_module.ReadKafkaCommand(None, "localhost:9092", "frames", "group", 640, 480, commit_interval=0.0)
+    return cmd, events
+
+
+def test_offsets_are_committed_only_after_the_batch_is_decoded(command):
+    cmd, events = command
+    cmd.execute()
+
+    assert events == ["consume", ("decode", ["cam1", "cam2"]), "commit"]
+    assert cmd.camera_messages == {"cam1": 2, "cam2": 1}
+
+
+def test_idle_polls_still_commit_and_measure_lag(command):
+    cmd, events = command
+    cmd.execute()
+    events.clear()
+    cmd.execute()
+
+    assert events == ["consume", "commit"]
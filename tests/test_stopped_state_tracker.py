@@ -0,0 +1,69 @@
+# tests/test_stopped_state_tracker.py
+import numpy as np
+
+from core.StoppedStateTracker import StoppedStateTracker
+
+
+class Config:
+    STOPPED_SECONDS_THRESHOLD = 2.0
+    STOPPED_PIXEL_THRESHOLD = 10.0
+    MOVEMENT_BREAKOUT_THRESHOLD = 30.0
+
+
+def test_person_standing_still_becomes_stopped_and_breaks_out():
+    tracker = StoppedStateTracker(Config(), history_length=16)
+    box = [100, 100, 140, 200]
+    t = 0.0
+    for _ in range(30):
+        stopped, elapsed = tracker.update_and_evaluate(1, box, t)
+        t += 0.1
+    assert stopped and elapsed >= Config.STOPPED_SECONDS_THRESHOLD
+
+    stopped, _ = tracker.update_and_evaluate(1, [200, 100, 240, 200], t)
+    assert not stopped
+
+
+def test_batch_matches_single_updates():
+    rng = np.random.default_rng(0)
+    single = StoppedStateTracker(Config(), history_length=8)
+    batch = StoppedStateTracker(Config(), history_length=8)
+    positions = {gid: np.array([50.0 * gid, 50.0]) for gid in range(1, 6)}
+    for step in range(60):
+        t = step * 0.1
+        gids, boxes = [], []
+        for gid in positions:
+            # Metade das pessoas quase parada, metade a andar
+            positions[gid] += rng.normal(scale=0.5 if gid % 2 else 4.0, size=2)
+            x, y = positions[gid]
+            gids.append(gid)
+            boxes.append([x, y, x + 20, y + 40])
+        expected = [single.update_and_evaluate(gid, box, t) for gid, box in zip(gids, boxes)]
+        stopped, elapsed = batch.update_and_evaluate_batch(gids, boxes, t)
+        assert stopped.tolist() == [e[0] for e in expected]
+        assert np.allclose(elapsed, [e[1] for e in expected])
+
+
+def test_evict_frees_idle_untracked_slots_for_reuse():
+    tracker = StoppedStateTracker(Config(), initial_capacity=2)
+    for gid in (1, 2, 3):
+        tracker.update_and_evaluate(gid, [0, 0, 10, 10], 0.0)
+    tracker.update_and_evaluate(3, [0, 0, 10, 10], 4.0)
+    capacity = tracker._ids.shape[0]
+
+    # 1 está fora do tracker há mais do que a tolerância; 2 ainda é seguido; 3 foi visto há pouco
+    assert tracker.evict(tracked_ids={2}, current_time=5.0, grace=2.0) == 1
+    assert len(tracker) == 2 and not tracker.is_stopped(1)
+
+    tracker.update_and_evaluate(4, [0, 0, 10, 10], 5.0)
+    assert tracker._ids.shape[0] == capacity    # O slot libertado foi reutilizado
+
+
+def test_new_identity_in_reused_slot_starts_fresh():
+    tracker = StoppedStateTracker(Config(), initial_capacity=2)
+    for step in range(40):
+        tracker.update_and_evaluate(1, [0, 0, 10, 10], step * 0.1)
+    assert tracker.is_stopped(1)
+    tracker.evict(tracked_ids=set(), current_time=10.0, grace=1.0)
+
+    stopped, elapsed = tracker.update_and_evaluate(2, [0, 0, 10, 10], 10.0)
+    assert not stopped and elapsed == 0.0
@@ -0,0 +1,57 @@
+# tests/test_tracking_export_writer.py
+import csv
+
+import pytest
+
+from core.TrackingExportWriter import VISIT_FIELDS, TrackingExportWriter
+
+
+def visit(global_id, t_in):
+    return {"global_id": global_id, "ambiente_id": "amb_1", "timestamp_in": t_in,
+            "timestamp_out": t_in + 1.0, "duration_seconds": 1.0}
+
+
+def read_rows(paths):
+    rows = []
+    for path in sorted(paths):
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            assert tuple(reader.fieldnames) == VISIT_FIELDS
+            rows.extend(reader)
+    return rows
+
+
+def test_batches_rotate_by_size_and_every_visit_is_written(tmp_path):
+    writer = TrackingExportWriter(directory=str(tmp_path), batch_size=2, flush_interval=60.0,
+                                  rotate_max_bytes=1, rotate_seconds=0, fsync="none")
+    writer.start()
+    for i in range(6):
+        writer.submit([visit(i, float(i))])
+    writer.close(timeout=5.0)
+
+    files = list(tmp_path.glob("tracking_visits_*.csv"))
+    stats = writer.get_stats()
+    assert stats["written"] == 6
+    assert stats["errors"] == 0
+    assert stats["files"] == len(files) == stats["batches"]
+    assert [int(row["global_id"]) for row in read_rows(files)] == list(range(6))
+
+
+def test_requests_are_resolved_on_the_writer_thread(tmp_path):
+    writer = TrackingExportWriter(directory=str(tmp_path), batch_size=10, fsync="none",
+                                  resolve=lambda global_id, final: [visit(global_id, 0.0)] if final else [])
+    writer.start()
+    writer.submit((4, True))
+    writer.submit((5, False))
+    writer.close(timeout=5.0)
+
+    rows = read_rows(tmp_path.glob("*.csv"))
+    assert [row["global_id"] for row in rows] == ["4"]
+    assert writer.get_stats()["files"] == 1
+
+
+def test_unknown_options_are_rejected():
+    with pytest.raises(ValueError):
+        TrackingExportWriter(file_format="xlsx")
+    with pytest.raises(ValueError):
+        TrackingExportWriter(fsync="always")
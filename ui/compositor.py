@@ -0,0 +1,83 @@
+# ui/compositor.py
+import math
+import time
+import logging
+import threading
+import cv2
+import numpy as np
+
+from ui.display import draw_person_annotation
+
+
+class DisplayCompositor(threading.Thread):
+    """
+    Única thread de interface: junta as câmaras num mosaico e mostra-o com cv2.imshow
+    a um FPS máximo. Os workers só publicam o frame e registos leves de anotação
+    (global_id, caixa, parado, tempo parado); o desenho e a GUI ficam fora do caminho crítico.
+    Só o registo mais recente de cada câmara é guardado.
+    """
+    def __init__(self, config, stop_event: threading.Event, max_fps: float = 15.0, tile_width: int = 480,
+                 window_name: str = "SmartBuildings"):
+        super().__init__(daemon=True, name="DisplayCompositor")
+        self.config = config
+        self.stop_event = stop_event
+        self.frame_interval = 1.0 / max_fps if max_fps and max_fps > 0 else 0.0
+        self.tile_width = tile_width
+        self.tile_height = int(round(tile_width * config.PROCESSING_HEIGHT / config.PROCESSING_WIDTH))
+        self.window_name = window_name
+
+        self._latest = {}
+        self._last_publish = {}
+        self._lock = threading.Lock()
+        self.rendered = 0
+
+    def wants_frame(self, cam_id: str, current_time: float) -> bool:
+        """Evita copiar frames que o mosaico nunca chegaria a mostrar."""
+        return current_time - self._last_publish.get(cam_id, float('-inf')) >= self.frame_interval
+
+    def publish(self, cam_id: str, frame: np.ndarray, annotations: list, current_time: float):
+        """Recebe uma cópia do frame (só de leitura) e as anotações correspondentes."""
+        with self._lock:
+            self._latest[cam_id] = (frame, annotations)
+            self._last_publish[cam_id] = current_time
+
+    def _render_tile(self, frame: np.ndarray, annotations: list) -> np.ndarray:
+        tile = cv2.resize(frame, (self.tile_width, self.tile_height), interpolation=cv2.INTER_AREA)
+        sx = self.tile_width / frame.shape[1]
+        sy = self.tile_height / frame.shape[0]
+        for global_id, box, is_stopped, elapsed in annotations:
+            scaled = [box[0] * sx, box[1] * sy, box[2] * sx, box[3] * sy]
+            draw_person_annotation(tile, scaled, global_id, is_stopped, elapsed, self.config)
+        return tile
+
+    def _render_mosaic(self, latest: dict) -> np.ndarray:
+        cam_ids = sorted(latest)
+        cols = math.ceil(math.sqrt(len(cam_ids)))
+        rows = math.ceil(len(cam_ids) / cols)
+        mosaic = np.zeros((rows * self.tile_height, cols * self.tile_width, 3), dtype=np.uint8)
+        for i, cam_id in enumerate(cam_ids):
+            r, c = divmod(i, cols)
+            y, x = r * self.tile_height, c * self.tile_width
+            mosaic[y:y + self.tile_height, x:x + self.tile_width] = self._render_tile(*latest[cam_id])
+            cv2.putText(mosaic, str(cam_id), (x + 6, y + 18), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
+        return mosaic
+
+    def run(self):
+        logging.info(f"[{self.name}] Mosaico ativo (máx. {1.0 / self.frame_interval if self.frame_interval else 0:.0f} FPS).")
+        while not self.stop_event.is_set():
+            started = time.monotonic()
+            with self._lock:
+                latest = dict(self._latest)
+
+            if latest:
+                cv2.imshow(self.window_name, self._render_mosaic(latest))
+                self.rendered += 1
+            if cv2.waitKey(1) & 0xFF == ord('q'):
+                self.stop_event.set()
+                break
+
+            remaining = self.frame_interval - (time.monotonic() - started)
+            if remaining > 0:
+                self.stop_event.wait(remaining)
+        if self.rendered:
+            cv2.destroyWindow(self.window_name)
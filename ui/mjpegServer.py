@@ -0,0 +1,190 @@
+# ui/mjpegServer.py
+import html
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote
+import cv2
+import numpy as np
+
+from ui.display import draw_person_annotation
+
+_BOUNDARY = "frame"
+
+
+class _CameraStream:
+    """Último JPEG de uma câmara e o estado de codificação/clientes."""
+    __slots__ = ("jpeg", "seq", "clients", "encoding", "last_publish")
+
+    def __init__(self):
+        self.jpeg = None
+        self.seq = 0
+        self.clients = 0
+        self.encoding = False
+        self.last_publish = float('-inf')
+
+
+class MJPEGStreamServer(threading.Thread):
+    """
+    Endpoint HTTP local com um stream MJPEG anotado por câmara (/stream/<cam_id>).
+
+    Destino de anotações dos CameraWorkers: só aceita frames de câmaras com clientes ligados,
+    até `max_fps`. O desenho e a codificação JPEG correm num pool de encoders e, se uma câmara
+    ainda tem um frame em codificação, o novo é descartado. Cada cliente envia apenas o JPEG
+    mais recente quando está pronto para mais, pelo que um cliente lento só perde frames
+    e nunca atrasa o tracking nem os outros clientes.
+    """
+    def __init__(self, config, stop_event: threading.Event, host: str = "127.0.0.1", port: int = 8080,
+                 quality: int = 70, max_fps: float = 10.0, encoders: int = 2):
+        super().__init__(daemon=True, name="MJPEGStreamServer")
+        self.config = config
+        self.stop_event = stop_event
+        self.quality = quality
+        self.frame_interval = 1.0 / max_fps if max_fps and max_fps > 0 else 0.0
+
+        self._streams = {}
+        self._cond = threading.Condition()
+        self._encoders = ThreadPoolExecutor(max_workers=encoders, thread_name_prefix="MJPEGEncoder")
+
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._httpd.timeout = 0.5
+        self.address = self._httpd.server_address
+
+        self.encoded = 0
+        self.dropped = 0
+
+    # --- Lado dos workers -------------------------------------------------------------
+
+    def _register(self, cam_id: str) -> _CameraStream:
+        """Só os workers criam streams: os pedidos HTTP nunca acrescentam entradas."""
+        stream = self._streams.get(cam_id)
+        if stream is None:
+            with self._cond:
+                stream = self._streams.setdefault(cam_id, _CameraStream())
+        return stream
+
+    def wants_frame(self, cam_id: str, current_time: float) -> bool:
+        stream = self._register(cam_id)     # Regista a câmara para aparecer no índice
+        if stream.clients <= 0:
+            return False
+        return current_time - stream.last_publish >= self.frame_interval
+
+    def publish(self, cam_id: str, frame: np.ndarray, annotations: list, current_time: float):
+        stream = self._register(cam_id)
+        with self._cond:
+            if stream.encoding:
+                self.dropped += 1
+                return
+            stream.encoding = True
+            stream.last_publish = current_time
+        self._encoders.submit(self._encode, cam_id, stream, frame, annotations)
+
+    def _encode(self, cam_id: str, stream: _CameraStream, frame: np.ndarray, annotations: list):
+        try:
+            annotated = frame.copy()   # O frame recebido é partilhado com os outros destinos
+            for global_id, box, is_stopped, elapsed in annotations:
+                draw_person_annotation(annotated, box, global_id, is_stopped, elapsed, self.config)
+            ok, buffer = cv2.imencode(".jpg", annotated, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+        except Exception as e:
+            logging.debug(f"[{self.name}] Falha ao codificar frame de '{cam_id}': {e}")
+            ok = False
+        with self._cond:
+            stream.encoding = False
+            if ok:
+                stream.jpeg = buffer.tobytes()
+                stream.seq += 1
+                self.encoded += 1
+                self._cond.notify_all()
+
+    # --- Lado HTTP --------------------------------------------------------------------
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):
+                logging.debug(f"[MJPEG] {self.address_string()} {fmt % args}")
+
+            def do_GET(self):
+                if self.path.startswith("/stream/"):
+                    server._serve_stream(self, unquote(self.path[len("/stream/"):]))
+                elif self.path in ("/", "/index.html"):
+                    server._serve_index(self)
+                else:
+                    self.send_error(404)
+
+        return Handler
+
+    def _serve_index(self, handler: BaseHTTPRequestHandler):
+        with self._cond:
+            cam_ids = sorted(self._streams)
+        links = "".join(
+            f'<li><a href="/stream/{html.escape(quote(cam_id, safe=""))}">{html.escape(cam_id)}</a></li>'
+            for cam_id in cam_ids
+        )
+        body = f"<html><body><h1>Câmaras</h1><ul>{links}</ul></body></html>".encode("utf-8")
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/html; charset=utf-8")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _serve_stream(self, handler: BaseHTTPRequestHandler, cam_id: str):
+        stream = self._streams.get(cam_id)
+        if stream is None:
+            handler.send_error(404)
+            return
+        with self._cond:
+            stream.clients += 1
+        handler.send_response(200)
+        handler.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={_BOUNDARY}")
+        handler.send_header("Cache-Control", "no-cache")
+        handler.end_headers()
+
+        last_seq = 0
+        try:
+            while not self.stop_event.is_set():
+                with self._cond:
+                    self._cond.wait_for(lambda: stream.seq != last_seq or self.stop_event.is_set(), timeout=1.0)
+                    if stream.seq == last_seq:
+                        continue
+                    jpeg, last_seq = stream.jpeg, stream.seq
+                handler.wfile.write(
+                    f"--{_BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode("ascii")
+                )
+                handler.wfile.write(jpeg)
+                handler.wfile.write(b"\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with self._cond:
+                stream.clients -= 1
+
+    def run(self):
+        logging.info(f"[{self.name}] Streams MJPEG em http://{self.address[0]}:{self.address[1]}/")
+        while not self.stop_event.is_set():
+            self._httpd.handle_request()
+        self._httpd.server_close()
+        self._encoders.shutdown(wait=False)
+
+    def get_stats(self) -> dict:
+        return {
+            "clients": {cam_id: stream.clients for cam_id, stream in self._streams.items() if stream.clients},
+            "encoded": self.encoded,
+            "dropped": self.dropped,
+        }
+
+
+def create_mjpeg_server(config, stop_event, port_offset: int = 0) -> MJPEGStreamServer:
+    """Cria o servidor a partir da configuração (`port_offset` separa os processos de câmaras)."""
+    return MJPEGStreamServer(
+        config,
+        stop_event,
+        host=getattr(config, 'HTTP_STREAM_HOST', "127.0.0.1"),
+        port=getattr(config, 'HTTP_STREAM_PORT', 8080) + port_offset,
+        quality=getattr(config, 'HTTP_STREAM_QUALITY', 70),
+        max_fps=getattr(config, 'HTTP_STREAM_MAX_FPS', 10.0),
+        encoders=getattr(config, 'HTTP_STREAM_ENCODERS', 2)
+    )
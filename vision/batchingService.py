@@ -0,0 +1,145 @@
+# vision/batchingService.py
+import threading
+import queue
+import time
+import logging
+
+
+class BatchRequest:
+    """Pedido submetido a um serviço de batching; o worker espera pelo resultado com wait()."""
+    __slots__ = ("payload", "size", "enqueued_at", "_done", "_result", "_error")
+
+    def __init__(self, payload, size: int = 1):
+        self.payload = payload
+        self.size = size
+        self.enqueued_at = time.perf_counter()
+        self._done = threading.Event()
+        self._result = None
+        self._error = None
+
+    def set_result(self, result):
+        self._result = result
+        self._done.set()
+
+    def set_error(self, error: Exception):
+        self._error = error
+        self._done.set()
+
+    def wait(self, timeout: float = None):
+        if not self._done.wait(timeout):
+            raise TimeoutError("Pedido de inferência expirou sem resposta.")
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+
+class DynamicBatchingService(threading.Thread):
+    """
+    Thread que agrupa pedidos de várias câmaras em batches dinâmicos.
+    Um batch fecha quando atinge `max_batch_size` itens ou quando o pedido mais antigo
+    já esperou `max_wait_ms`. As subclasses implementam _process_batch(payloads) -> resultados.
+    """
+    def __init__(self, stop_event: threading.Event, max_batch_size: int = 8, max_wait_ms: float = 10.0, name: str = "BatchingService"):
+        super().__init__(daemon=True, name=name)
+        self.stop_event = stop_event
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self._requests = queue.Queue()
+        self._carry = None
+
+        # Métricas
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+        self.items = 0
+        self.queue_delay_sum = 0.0
+        self.queue_delay_max = 0.0
+        self.process_time_sum = 0.0
+
+    def submit(self, payload, size: int = 1) -> BatchRequest:
+        request = BatchRequest(payload, size)
+        self._requests.put(request)
+        return request
+
+    def _process_batch(self, payloads: list) -> list:
+        raise NotImplementedError
+
+    def _next_batch(self) -> list:
+        first = self._carry
+        self._carry = None
+        if first is None:
+            try:
+                first = self._requests.get(timeout=0.5)
+            except queue.Empty:
+                return []
+
+        batch = [first]
+        filled = first.size
+        deadline = first.enqueued_at + self.max_wait
+        while filled < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                request = self._requests.get(timeout=remaining) if remaining > 0 else self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if filled + request.size > self.max_batch_size:
+                # Não cabe: abre o próximo batch
+                self._carry = request
+                break
+            batch.append(request)
+            filled += request.size
+        return batch
+
+    def run(self):
+        logging.info(f"[{self.name}] Ativo (batch máximo {self.max_batch_size}, espera máxima {self.max_wait * 1000:.0f} ms).")
+
+        while not self.stop_event.is_set():
+            batch = self._next_batch()
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            try:
+                results = self._process_batch([request.payload for request in batch])
+            except Exception as e:
+                logging.error(f"[{self.name}] Falha no batch: {e}")
+                for request in batch:
+                    request.set_error(e)
+                continue
+            finished = time.perf_counter()
+
+            for request, result in zip(batch, results):
+                request.set_result(result)
+
+            delays = [started - request.enqueued_at for request in batch]
+            with self._stats_lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.items += sum(request.size for request in batch)
+                self.queue_delay_sum += sum(delays)
+                self.queue_delay_max = max(self.queue_delay_max, max(delays))
+                self.process_time_sum += finished - started
+
+        # Liberta quem ainda estiver à espera
+        pending = [self._carry] if self._carry else []
+        while True:
+            try:
+                pending.append(self._requests.get_nowait())
+            except queue.Empty:
+                break
+        for request in pending:
+            request.set_error(RuntimeError("Serviço encerrado."))
+        logging.info(f"[{self.name}] Encerrado.")
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            requests = self.requests
+            return {
+                "batches": self.batches,
+                "requests": self.requests,
+                "items": self.items,
+                "avg_batch_fill": (self.items / self.batches) / self.max_batch_size if self.batches else 0.0,
+                "avg_queue_delay_ms": 1000 * self.queue_delay_sum / requests if requests else 0.0,
+                "max_queue_delay_ms": 1000 * self.queue_delay_max,
+                "avg_batch_time_ms": 1000 * self.process_time_sum / self.batches if self.batches else 0.0,
+            }
@@ -0,0 +1,167 @@
+# vision/byteTracker.py
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+# Filtro de Kalman (x, y, razão de aspeto, altura) já usado pelo Deep SORT
+from deep_sort_realtime.deep_sort.kalman_filter import KalmanFilter
+
+
+class ByteTrack:
+    """Faixa com a mesma interface usada pelo CameraWorker nas faixas do Deep SORT."""
+    _TENTATIVE, _CONFIRMED, _DELETED = 1, 2, 3
+
+    def __init__(self, track_id: int, mean: np.ndarray, covariance: np.ndarray, n_init: int, max_age: int):
+        self.track_id = track_id
+        self.mean = mean
+        self.covariance = covariance
+        self.hits = 1
+        self.time_since_update = 0
+        self.state = ByteTrack._TENTATIVE if n_init > 1 else ByteTrack._CONFIRMED
+        self._n_init = n_init
+        self._max_age = max_age
+
+        # Embedding calculado a pedido pelo worker (só para faixas novas ou em refrescamento)
+        self.features = []
+        self.last_embedding_time = float('-inf')
+
+    def is_confirmed(self) -> bool:
+        return self.state == ByteTrack._CONFIRMED
+
+    def is_tentative(self) -> bool:
+        return self.state == ByteTrack._TENTATIVE
+
+    def is_deleted(self) -> bool:
+        return self.state == ByteTrack._DELETED
+
+    def to_ltrb(self) -> np.ndarray:
+        x, y, a, h = self.mean[:4]
+        w = a * h
+        return np.array([x - w / 2, y - h / 2, x + w / 2, y + h / 2])
+
+    def predict(self, kf: KalmanFilter):
+        self.mean, self.covariance = kf.predict(self.mean, self.covariance)
+        self.time_since_update += 1
+
+    def update(self, kf: KalmanFilter, measurement: np.ndarray):
+        self.mean, self.covariance = kf.update(self.mean, self.covariance, measurement)
+        self.hits += 1
+        self.time_since_update = 0
+        if self.is_tentative() and self.hits >= self._n_init:
+            self.state = ByteTrack._CONFIRMED
+
+    def mark_missed(self):
+        if self.is_tentative() or self.time_since_update > self._max_age:
+            self.state = ByteTrack._DELETED
+
+
+def _ltwh_to_xyah(ltwh) -> np.ndarray:
+    left, top, w, h = ltwh
+    return np.array([left + w / 2, top + h / 2, w / max(h, 1e-6), h], dtype=np.float64)
+
+
+def _iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """IoU entre todas as caixas ltrb de A (N x 4) e B (M x 4)."""
+    if boxes_a.size == 0 or boxes_b.size == 0:
+        return np.zeros((boxes_a.shape[0], boxes_b.shape[0]))
+    lt = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    rb = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+def _associate(tracks: list, det_boxes: np.ndarray, max_cost: float):
+    """Associação húngara por custo 1 - IoU. Devolve (pares, faixas livres, deteções livres)."""
+    if not tracks or det_boxes.shape[0] == 0:
+        return [], list(range(len(tracks))), list(range(det_boxes.shape[0]))
+    cost = 1.0 - _iou_matrix(np.array([t.to_ltrb() for t in tracks]), det_boxes)
+    rows, cols = linear_sum_assignment(cost)
+    matches = [(r, c) for r, c in zip(rows, cols) if cost[r, c] <= max_cost]
+    matched_t = {r for r, _ in matches}
+    matched_d = {c for _, c in matches}
+    return (
+        matches,
+        [i for i in range(len(tracks)) if i not in matched_t],
+        [j for j in range(det_boxes.shape[0]) if j not in matched_d],
+    )
+
+
+class ByteTracker:
+    """
+    Tracker por IoU + Kalman ao estilo ByteTrack, sem embeddings por frame.
+
+    1.ª passagem: deteções de confiança alta contra as faixas ativas/perdidas;
+    2.ª passagem: deteções de confiança baixa recuperam as faixas que ficaram por associar
+    (pessoas parcialmente ocultas); as faixas tentativas só aceitam deteções altas.
+    As deteções altas que sobram (acima de `new_track_thresh`) criam faixas novas.
+    A aparência fica a cargo do worker, que só calcula embeddings para faixas novas ou em refrescamento.
+    """
+    def __init__(self, max_age: int = 90, n_init: int = 3, high_thresh: float = 0.5, low_thresh: float = 0.1,
+                 new_track_thresh: float = 0.6, match_thresh: float = 0.8, low_match_thresh: float = 0.5,
+                 tentative_match_thresh: float = 0.7):
+        self.kf = KalmanFilter()
+        self.max_age = max_age
+        self.n_init = n_init
+        self.high_thresh = high_thresh
+        self.low_thresh = low_thresh
+        self.new_track_thresh = new_track_thresh
+        self.match_thresh = match_thresh
+        self.low_match_thresh = low_match_thresh
+        self.tentative_match_thresh = tentative_match_thresh
+
+        self.tracks: list[ByteTrack] = []
+        self._next_id = 1
+
+    def predict(self):
+        for track in self.tracks:
+            track.predict(self.kf)
+
+    def update_tracks(self, raw_detections: list, frame=None, embeds=None) -> list:
+        """Mesma assinatura do DeepSort.update_tracks (frame/embeds são ignorados)."""
+        self.predict()
+        for track in self.tracks:
+            track.features = []
+
+        ltwh = np.array([d[0] for d in raw_detections], dtype=np.float64).reshape(-1, 4)
+        conf = np.array([d[1] for d in raw_detections], dtype=np.float64)
+        ltrb = np.hstack([ltwh[:, :2], ltwh[:, :2] + ltwh[:, 2:]])
+        high = np.flatnonzero(conf >= self.high_thresh)
+        low = np.flatnonzero((conf >= self.low_thresh) & (conf < self.high_thresh))
+
+        confirmed = [t for t in self.tracks if t.is_confirmed()]
+        tentative = [t for t in self.tracks if t.is_tentative()]
+
+        # 1.ª passagem: confiança alta
+        matches, free_tracks, free_high = _associate(confirmed, ltrb[high], self.match_thresh)
+        for ti, dj in matches:
+            confirmed[ti].update(self.kf, _ltwh_to_xyah(ltwh[high[dj]]))
+
+        # 2.ª passagem: confiança baixa, só para faixas que estavam a ser seguidas no frame anterior
+        remaining = [confirmed[i] for i in free_tracks if confirmed[i].time_since_update <= 1]
+        lost = [confirmed[i] for i in free_tracks if confirmed[i].time_since_update > 1]
+        matches, free_remaining, _ = _associate(remaining, ltrb[low], self.low_match_thresh)
+        for ti, dj in matches:
+            remaining[ti].update(self.kf, _ltwh_to_xyah(ltwh[low[dj]]))
+        for track in [remaining[i] for i in free_remaining] + lost:
+            track.mark_missed()
+
+        # Faixas tentativas contra as deteções altas que sobraram
+        left_high = high[free_high]
+        matches, free_tentative, free_left = _associate(tentative, ltrb[left_high], self.tentative_match_thresh)
+        for ti, dj in matches:
+            tentative[ti].update(self.kf, _ltwh_to_xyah(ltwh[left_high[dj]]))
+        for i in free_tentative:
+            tentative[i].mark_missed()
+
+        # Novas faixas
+        for dj in free_left:
+            det = left_high[dj]
+            if conf[det] < self.new_track_thresh:
+                continue
+            mean, covariance = self.kf.initiate(_ltwh_to_xyah(ltwh[det]))
+            self.tracks.append(ByteTrack(self._next_id, mean, covariance, self.n_init, self.max_age))
+            self._next_id += 1
+
+        self.tracks = [t for t in self.tracks if not t.is_deleted()]
+        return self.tracks
@@ -0,0 +1,134 @@
+# vision/cameraProcess.py
+import time
+import queue
+import logging
+import multiprocessing
+
+from core.IdentityManagerServer import connect_identity_manager
+from extraction.SharedFrameRing import SharedFrameRing
+
+
+class CameraProcessHost(multiprocessing.Process):
+    """
+    Processo que aloja um grupo de CameraWorkers fora do interpretador principal (fora do GIL dele).
+    Os frames chegam por SharedFrameRing (memória partilhada) e as identidades são resolvidas
+    por proxy no GlobalIdentityManager do processo principal.
+    Novas câmaras são anunciadas pela fila de controlo: ("add", cam_id, ring_name).
+    As métricas dos workers e dos serviços do processo seguem para o principal pela `stats_queue`
+    a cada STATS_LOG_INTERVAL segundos.
+    """
+    def __init__(self, host_id: int, config, manager_address, manager_authkey: bytes, stop_event, control_queue,
+                 stats_queue=None):
+        super().__init__(daemon=True, name=f"CameraProcess-{host_id}")
+        self.host_id = host_id
+        self.config = config
+        self.manager_address = manager_address
+        self.manager_authkey = manager_authkey
+        self.stop_event = stop_event
+        self.control_queue = control_queue
+        self.stats_queue = stats_queue
+
+    def run(self):
+        # Imports pesados apenas no processo filho
+        from vision.cameraWorker import CameraWorker
+        from vision.detectionService import DetectionService
+        from vision.embeddingService import EmbeddingService
+        from ui.compositor import DisplayCompositor
+        from ui.mjpegServer import create_mjpeg_server
+
+        logging.basicConfig(
+            level=logging.INFO,
+            format='%(asctime)s - [%(processName)s/%(threadName)s] - %(levelname)s - %(message)s',
+            datefmt='%H:%M:%S'
+        )
+
+        global_manager = connect_identity_manager(self.manager_address, self.manager_authkey)
+
+        detection_service = None
+        if getattr(self.config, 'SHARED_DETECTOR', True):
+            detection_service = DetectionService(self.config, self.stop_event)
+            detection_service.start()
+
+        embedding_service = None
+        if getattr(self.config, 'SHARED_EMBEDDER', True):
+            embedding_service = EmbeddingService(self.config, self.stop_event)
+            embedding_service.start()
+
+        sinks = []
+        if getattr(self.config, 'DISPLAY_MODE', 'window') == 'window':
+            compositor = DisplayCompositor(
+                self.config,
+                self.stop_event,
+                max_fps=getattr(self.config, 'DISPLAY_MAX_FPS', 15.0),
+                tile_width=getattr(self.config, 'DISPLAY_TILE_WIDTH', 480),
+                window_name=f"SmartBuildings {self.name}"
+            )
+            compositor.start()
+            sinks.append(compositor)
+        if getattr(self.config, 'HTTP_STREAM', False):
+            # Um porto por processo: HTTP_STREAM_PORT + host_id
+            stream_server = create_mjpeg_server(self.config, self.stop_event, port_offset=self.host_id)
+            stream_server.start()
+            sinks.append(stream_server)
+
+        workers, rings = {}, []
+        stats_interval = getattr(self.config, 'STATS_LOG_INTERVAL', 30.0)
+        last_stats = time.time()
+        while not self.stop_event.is_set():
+            if self.stats_queue is not None and time.time() - last_stats >= stats_interval:
+                last_stats = time.time()
+                self._publish_stats(workers, detection_service, embedding_service)
+            try:
+                command, cam_id, ring_name = self.control_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if command != "add" or cam_id in workers:
+                continue
+
+            ring = SharedFrameRing.attach(
+                ring_name,
+                self.config.PROCESSING_WIDTH,
+                self.config.PROCESSING_HEIGHT,
+                getattr(self.config, 'FRAME_RING_SLOTS', 3)
+            )
+            rings.append(ring)
+            worker = CameraWorker(
+                cam_id=cam_id,
+                input_queue=ring,
+                config=self.config,
+                global_manager=global_manager,
+                stop_event=self.stop_event,
+                detector=detection_service,
+                sinks=sinks,
+                embedder=embedding_service
+            )
+            worker.start()
+            workers[cam_id] = worker
+            logging.info(f"[{self.name}] Câmara '{cam_id}' alojada neste processo.")
+
+        for worker in workers.values():
+            worker.join(timeout=2)
+        if detection_service:
+            detection_service.join(timeout=2)
+        if embedding_service:
+            embedding_service.join(timeout=2)
+        for sink in sinks:
+            sink.join(timeout=2)
+        for ring in rings:
+            ring.close()
+        if self.stats_queue is not None:
+            # Métricas por ler não devem atrasar a saída do processo
+            self.stats_queue.cancel_join_thread()
+        logging.info(f"[{self.name}] Encerrado.")
+
+    def _publish_stats(self, workers: dict, detection_service, embedding_service):
+        """Envia ao processo principal as métricas dos workers e dos serviços deste processo."""
+        report = {"workers": {cam_id: worker.get_stats() for cam_id, worker in workers.items()}}
+        if detection_service:
+            report["detection"] = detection_service.get_stats()
+        if embedding_service:
+            report["embedding"] = embedding_service.get_stats()
+        try:
+            self.stats_queue.put_nowait(report)
+        except queue.Full:
+            pass
@@ -1,140 +1,315 @@
 # vision/cameraWorker.py
-import cv2
 import time
 import queue
 import threading
 import numpy as np
-from ultralytics import YOLO
 
 # Importação do Deep SORT
 from deep_sort_realtime.deepsort_tracker import DeepSort
 
 from core.StoppedStateTracker import StoppedStateTracker
-from ui.display import draw_person_annotation
+from core.IdentityUpdateBuffer import IdentityUpdateBuffer
+from vision.detectionService import detection_kwargs
+from vision.detectors.DetectorFactory import create_detector
+from vision.byteTracker import ByteTracker
+from vision.detectionStride import AdaptiveDetectionStride
+from vision.embeddingService import crop_detections, create_embedding_backend
+from vision.featureExtractor import extract_color_signatures
+from vision.motionGate import MotionGate
 
 class CameraWorker(threading.Thread):
-    def __init__(self, cam_id: str, input_queue: queue.Queue, config, global_manager, stop_event: threading.Event):
+    def __init__(self, cam_id: str, input_queue: queue.Queue, config, global_manager, stop_event: threading.Event, detector=None, sinks=None, embedder=None):
         super().__init__(daemon=True, name=f"Worker-{cam_id}")
         self.cam_id = cam_id
         self.input_queue = input_queue
         self.config = config
         self.global_manager = global_manager
         self.stop_event = stop_event
+
+        # Serviço de deteção partilhado (DetectionService); sem ele, o worker carrega o seu próprio YOLO
+        self.detector = detector
+        # Embedder de aparência partilhado (EmbeddingService); sem ele, o Deep SORT usa o seu MobileNet
+        self.embedder = embedder
+
+        # Destinos das anotações (compositor de ecrã, stream HTTP...); vazio = modo headless
+        self.sinks = list(sinks or [])
+
+        # Deteção 1 em cada K frames, com o filtro de Kalman do tracker a prever entre deteções
+        self.detection_stride = None
+        if getattr(config, 'ADAPTIVE_DETECTION', False):
+            self.detection_stride = AdaptiveDetectionStride(
+                min_stride=getattr(config, 'DETECTION_STRIDE_MIN', 1),
+                max_stride=getattr(config, 'DETECTION_STRIDE_MAX', 6),
+                crowd_tracks=getattr(config, 'DETECTION_CROWD_TRACKS', 8),
+                fast_speed=getattr(config, 'DETECTION_FAST_SPEED', 12.0),
+                static_speed=getattr(config, 'DETECTION_STATIC_SPEED', 1.5)
+            )
+        
+        # Filtro de movimento antes do detetor (câmaras de corredor vazias a maior parte do tempo)
+        self.motion_gate = None
+        if getattr(config, 'MOTION_GATE', False):
+            self.motion_gate = MotionGate(
+                width=getattr(config, 'MOTION_GATE_WIDTH', 160),
+                pixel_threshold=getattr(config, 'MOTION_GATE_PIXEL_THRESHOLD', 25),
+                min_changed_fraction=getattr(config, 'MOTION_GATE_MIN_CHANGED_FRACTION', 0.002),
+                force_interval=getattr(config, 'MOTION_GATE_FORCE_INTERVAL', 2.0)
+            )
+        
+        # Tracker local: "deepsort" (embedding por deteção) ou "bytetrack" (IoU + Kalman, embeddings a pedido)
+        self.tracker_mode = getattr(config, 'TRACKER_MODE', 'deepsort')
+        self.embedding_refresh_interval = getattr(config, 'EMBEDDING_REFRESH_INTERVAL', 1.0)
+
+        # Assinaturas de cor para o pré-filtro do GlobalIdentityManager
+        self.color_prefilter = getattr(config, 'COLOR_PREFILTER', False)
         
         self.local_to_global_map = {}
 
+    def _embed_on_demand(self, tracks, frame, current_time: float, local_embedder=None):
+        """
+        Modo ByteTrack: calcula embeddings só para as faixas confirmadas ainda sem identidade global
+        e para as que não são refrescadas há `embedding_refresh_interval` segundos.
+        O embedding fica em track.features, como no Deep SORT, e o resto do ciclo não muda.
+        """
+        needing = [
+            track for track in tracks
+            if track.is_confirmed() and track.time_since_update == 0 and (
+                track.track_id not in self.local_to_global_map
+                or current_time - track.last_embedding_time >= self.embedding_refresh_interval
+            )
+        ]
+        if not needing:
+            return
+        bbs = []
+        for track in needing:
+            x1, y1, x2, y2 = track.to_ltrb()
+            bbs.append(([x1, y1, x2 - x1, y2 - y1], 1.0, 0))
+        crops = crop_detections(frame, bbs)
+        embeddings = self.embedder.embed(crops) if self.embedder is not None else local_embedder.predict(crops)
+        for track, embedding in zip(needing, embeddings):
+            track.features = [embedding]
+            track.last_embedding_time = current_time
+
+    def _flush_due_updates(self, update_buffer: IdentityUpdateBuffer, current_time: float):
+        if update_buffer is not None and update_buffer.is_due(current_time):
+            self.global_manager.apply_updates(self.cam_id, update_buffer.drain(current_time))
+
+    def get_stats(self) -> dict:
+        stats = {}
+        if self.detection_stride is not None:
+            stats["detection"] = self.detection_stride.get_stats()
+        if self.motion_gate is not None:
+            stats["motion_gate"] = self.motion_gate.get_stats()
+        return stats
+
     def run(self):
-        # YOLO apenas para deteção
-        model = YOLO(self.config.YOLO_MODEL_PATH, verbose=False)
+        # Detetor próprio apenas quando não há serviço partilhado (backend em DETECTOR_BACKEND)
+        local_detector = None
+        if self.detector is None:
+            local_detector = create_detector(self.config, detection_kwargs(self.config))
         state_tracker = StoppedStateTracker(self.config)
+        state_eviction_grace = getattr(self.config, 'STOPPED_STATE_EVICT_AFTER', 5.0)
+        last_eviction = 0.0
 
-        # CORREÇÃO 1: Ajuste rigoroso da supressão de não-máximos (NMS)
-        tracker = DeepSort(
-            max_age=90,
-            n_init=3,
-            nms_max_overlap=0.45,    # <-- MUDADO DE 1.0. Impede caixas sobrepostas na mesma pessoa
-            max_cosine_distance=0.2,
-            embedder="mobilenet",
-            half=True,               
-            bgr=True
-        )
+        # Atualizações de identidade coalescidas localmente e despejadas em bloco no manager
+        flush_interval = getattr(self.config, 'IDENTITY_UPDATE_FLUSH_INTERVAL', 0.25)
+        update_buffer = IdentityUpdateBuffer(self.cam_id, flush_interval) if flush_interval > 0 else None
+        # Sem frames, a espera também acorda a tempo do despejo (o atraso fica limitado a flush_interval)
+        queue_timeout = min(1.0, flush_interval) if update_buffer is not None else 1.0
 
-        print(f"[{self.name}] Iniciado com Deep SORT (Otimizado) a aguardar frames...")
+        if self.tracker_mode == "bytetrack":
+            # IoU + Kalman; embeddings só para faixas novas e no refrescamento periódico
+            tracker = ByteTracker(
+                max_age=90,
+                n_init=3,
+                high_thresh=getattr(self.config, 'TRACK_HIGH_THRESH', 0.5),
+                low_thresh=getattr(self.config, 'TRACK_LOW_THRESH', 0.1),
+                new_track_thresh=getattr(self.config, 'TRACK_NEW_THRESH', 0.6)
+            )
+            predict_tracks, current_tracks = tracker.predict, lambda: tracker.tracks
+            local_embedder = create_embedding_backend(self.config) if self.embedder is None else None
+        else:
+            # CORREÇÃO 1: Ajuste rigoroso da supressão de não-máximos (NMS)
+            tracker = DeepSort(
+                max_age=90,
+                n_init=3,
+                nms_max_overlap=0.45,    # <-- MUDADO DE 1.0. Impede caixas sobrepostas na mesma pessoa
+                max_cosine_distance=0.2,
+                embedder=None if self.embedder is not None else "mobilenet",
+                half=True,               
+                bgr=True
+            )
+            predict_tracks, current_tracks = tracker.tracker.predict, lambda: tracker.tracker.tracks
+
+        tracker_name = "ByteTrack (IoU + Kalman)" if self.tracker_mode == "bytetrack" else "Deep SORT (Otimizado)"
+        print(f"[{self.name}] Iniciado com {tracker_name} a aguardar frames...")
+        last_visible = []
 
         while not self.stop_event.is_set():
+            # Verificado em cada volta, incluindo câmaras paradas e frames descartados
+            self._flush_due_updates(update_buffer, time.time())
             try:
-                frame = self.input_queue.get(timeout=1.0)
+                frame = self.input_queue.get(timeout=queue_timeout)
             except queue.Empty:
                 continue
 
             current_time = time.time()
+
+            # Filtro de movimento: sem mudança e só com pessoas paradas (ou ninguém), o frame
+            # salta deteção e tracking e reaproveita as últimas caixas
+            can_skip = all(state_tracker.is_stopped(global_id) for global_id, _ in last_visible)
+            if self.motion_gate is not None and not self.motion_gate.should_process(frame, current_time, can_skip):
+                visible = last_visible
+            else:
+                run_detection = self.detection_stride is None or self.detection_stride.should_detect()
+                if run_detection:
+                    # CORREÇÃO 2: Adição do iou=0.45 no YOLO (ver DETECTION_KWARGS).
+                    # Isto impede que o YOLO envie um corpo e um rosto como duas pessoas diferentes.
+                    if self.detector is not None:
+                        try:
+                            detections = self.detector.detect(frame)
+                        except Exception as e:
+                            print(f"[{self.name}] Deteção falhou: {e}")
+                            continue
+                    else:
+                        detections = local_detector.detect(frame)
+
+                    # Caixas degeneradas são descartadas aqui com a mesma regra do Deep SORT,
+                    # para que os embeddings fiquem alinhados com as deteções que ele mantém
+                    bbs = [
+                        ([x1, y1, x2 - x1, y2 - y1], float(conf), int(cls))
+                        for x1, y1, x2, y2, conf, cls in detections
+                        if x2 - x1 > 0 and y2 - y1 > 0
+                    ]
+                
+                    # Embeddings calculados em batch pelo serviço partilhado (se existir)
+                    embeds = None
+                    if self.embedder is not None and self.tracker_mode != "bytetrack":
+                        try:
+                            embeds = self.embedder.embed(crop_detections(frame, bbs))
+                        except Exception as e:
+                            print(f"[{self.name}] Embeddings falharam: {e}")
+                            continue
+
+                    # O Deep SORT rastreia e extrai os vetores
+                    tracks = tracker.update_tracks(bbs, embeds=embeds, frame=frame)
+                    if self.tracker_mode == "bytetrack":
+                        try:
+                            self._embed_on_demand(tracks, frame, current_time, local_embedder)
+                        except Exception as e:
+                            print(f"[{self.name}] Embeddings falharam: {e}")
+                    if self.detection_stride is not None:
+                        stats_fn = getattr(self.input_queue, "get_stats", None)
+                        self.detection_stride.observe(tracks, stats_fn() if stats_fn else None)
+                    frames_since_detection = 0
+                else:
+                    # Frame sem deteção: só a previsão do filtro de Kalman avança
+                    predict_tracks()
+                    tracks = current_tracks()
+                    frames_since_detection = self.detection_stride.frames_since_detection
             
-            # CORREÇÃO 2: Adição do iou=0.45 no YOLO.
-            # Isto impede que o YOLO envie um corpo e um rosto como duas pessoas diferentes.
-            results = model.predict(
-                frame, 
-                classes=[0], 
-                conf=0.50,       # Apenas deteções com mais de 50% de certeza
-                iou=0.45,        # Corta duplicações nativas do YOLO
-                verbose=False
-            )
-            
-            bbs = []
-            if results[0].boxes is not None:
-                for box in results[0].boxes:
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    conf = float(box.conf[0].cpu().numpy())
-                    cls = int(box.cls[0].cpu().numpy())
-                    
-                    w = x2 - x1
-                    h = y2 - y1
-                    bbs.append(([x1, y1, w, h], conf, cls))
-            
-            # O Deep SORT rastreia e extrai os vetores
-            tracks = tracker.update_tracks(bbs, frame=frame)
-            
-            active_local_ids = set()
-            active_global_ids = set()
-            for tid in self.local_to_global_map:
-                active_global_ids.add(self.local_to_global_map[tid])
+                active_local_ids = set()
+                active_global_ids = set()
+                for tid in self.local_to_global_map:
+                    active_global_ids.add(self.local_to_global_map[tid])
             
-            for track in tracks:
+                # Assinaturas de cor de todas as faixas com embedding neste frame, numa única passagem
+                colors = {}
+                if self.color_prefilter and run_detection:
+                    with_features = [t for t in tracks if t.is_confirmed() and t.time_since_update == 0 and t.features]
+                    if with_features:
+                        signatures = extract_color_signatures(frame, [t.to_ltrb() for t in with_features])
+                        colors = {t.track_id: signature for t, signature in zip(with_features, signatures)}
+
+                # Faixas confirmadas (global_id, box) e faixas novas à espera de atribuição
+                visible = []
+                pending_new = []
+
+                for track in tracks:
                 
-                # CORREÇÃO 3: Filtro anti "Caixas Fantasmas/Inchaço"
-                # track.time_since_update > 0 significa que o YOLO não viu a pessoa neste frame exato.
-                # Se isso acontecer, o Deep SORT está a usar o Filtro de Kalman para "adivinhar" onde ela está.
-                # Nós ignoramos estas adivinhações para que a caixa não seja desenhada nem cresça do nada.
-                if not track.is_confirmed() or track.time_since_update > 0:
-                    continue
+                    # CORREÇÃO 3: Filtro anti "Caixas Fantasmas/Inchaço"
+                    # track.time_since_update > 0 significa que o YOLO não viu a pessoa neste frame exato.
+                    # Se isso acontecer, o Deep SORT está a usar o Filtro de Kalman para "adivinhar" onde ela está.
+                    # Nós ignoramos estas adivinhações para que a caixa não seja desenhada nem cresça do nada.
+                    # Exceção: entre deteções (passo adaptativo) aceitam-se as faixas vistas na última deteção.
+                    if not track.is_confirmed() or track.time_since_update > frames_since_detection:
+                        continue
                     
-                local_id = track.track_id
-                active_local_ids.add(local_id)
+                    local_id = track.track_id
+                    active_local_ids.add(local_id)
                 
-                ltrb = track.to_ltrb()
-                box = [ltrb[0], ltrb[1], ltrb[2], ltrb[3]]
+                    ltrb = track.to_ltrb()
+                    box = [ltrb[0], ltrb[1], ltrb[2], ltrb[3]]
                 
-                feature_vector = None
-                if track.features and len(track.features) > 0:
-                    raw_feature = np.array(track.features[-1])
-                    feature_vector = raw_feature / np.linalg.norm(raw_feature)
+                    feature_vector = None
+                    if run_detection and track.features and len(track.features) > 0:
+                        raw_feature = np.array(track.features[-1])
+                        feature_vector = raw_feature / np.linalg.norm(raw_feature)
                 
-                # Registo de nova pessoa ou atualização
-                if local_id not in self.local_to_global_map:
-                    if feature_vector is None:
-                        continue 
-                        
-                    global_id = self.global_manager.get_or_create_global_id(
-                        new_feature_vector=feature_vector,
-                        bbox=box,
-                        cam_id=self.cam_id,
-                        current_time=current_time,
-                        active_global_ids=active_global_ids
-                    )
-                    self.local_to_global_map[local_id] = global_id
-                    active_global_ids.add(global_id)
-                else:
+                    # Registo de nova pessoa (adiado para a atribuição conjunta) ou atualização
+                    if local_id not in self.local_to_global_map:
+                        if feature_vector is None:
+                            continue 
+                        pending_new.append((local_id, box, feature_vector, colors.get(local_id)))
+                        continue
+
+                    # Nos frames de deteção a caixa e o tempo seguem sempre, mesmo sem embedding novo
+                    # (no ByteTrack só há embedding nos refrescamentos); a EMA só avança quando há vetor
                     global_id = self.local_to_global_map[local_id]
-                    if feature_vector is not None:
+                    if run_detection and update_buffer is not None:
+                        update_buffer.add(global_id, feature_vector, box, current_time, colors.get(local_id))
+                    elif run_detection:
                         self.global_manager.update_existing_identity(
                             global_id=global_id,
                             new_feature_vector=feature_vector,
                             bbox=box,
                             cam_id=self.cam_id,
-                            current_time=current_time
+                            current_time=current_time,
+                            color_signature=colors.get(local_id)
                         )
-                
-                # Interface Visual
-                is_stopped, elapsed = state_tracker.update_and_evaluate(global_id, box, current_time)
-                draw_person_annotation(frame, box, global_id, is_stopped, elapsed, self.config)
-
-            # Limpar lixo
-            lost_locals = [lid for lid in self.local_to_global_map if lid not in active_local_ids]
-            for lid in lost_locals:
-                del self.local_to_global_map[lid]
-
-            cv2.imshow(f"Camera {self.cam_id}", frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                self.stop_event.set()
-                break
+                    visible.append((global_id, box))
+
+                # Todas as pessoas novas do frame são atribuídas em conjunto (um único lock)
+                if pending_new:
+                    new_colors = [color for _, _, _, color in pending_new]
+                    new_global_ids = self.global_manager.assign_global_ids(
+                        feature_vectors=[feature for _, _, feature, _ in pending_new],
+                        bboxes=[box for _, box, _, _ in pending_new],
+                        cam_id=self.cam_id,
+                        current_time=current_time,
+                        active_global_ids=active_global_ids,
+                        color_signatures=new_colors if self.color_prefilter else None
+                    )
+                    for (local_id, box, _, _), global_id in zip(pending_new, new_global_ids):
+                        self.local_to_global_map[local_id] = global_id
+                        active_global_ids.add(global_id)
+                        visible.append((global_id, box))
+
+                # Limpar lixo
+                lost_locals = [lid for lid in self.local_to_global_map if lid not in active_local_ids]
+                for lid in lost_locals:
+                    del self.local_to_global_map[lid]
+                last_visible = visible
+
+            # Estado parado/em movimento de todas as pessoas do frame numa única avaliação
+            stopped, elapsed = state_tracker.update_and_evaluate_batch(
+                [global_id for global_id, _ in visible], [box for _, box in visible], current_time
+            )
+            annotations = [
+                (global_id, box, bool(is_stopped), float(seconds))
+                for (global_id, box), is_stopped, seconds in zip(visible, stopped, elapsed)
+            ]
+            if current_time - last_eviction >= 1.0:
+                state_tracker.evict(set(self.local_to_global_map.values()), current_time, state_eviction_grace)
+                last_eviction = current_time
+
+            # Interface Visual: o frame só é copiado se algum destino o for usar
+            sinks = [sink for sink in self.sinks if sink.wants_frame(self.cam_id, current_time)]
+            if sinks:
+                frame_copy = frame.copy()
+                for sink in sinks:
+                    sink.publish(self.cam_id, frame_copy, annotations, current_time)
+
+        if update_buffer is not None and len(update_buffer):
+            self.global_manager.apply_updates(self.cam_id, update_buffer.drain())
 
         print(f"[{self.name}] Encerrado.")
\ No newline at end of file
@@ -0,0 +1,51 @@
+# vision/detectionService.py
+import threading
+import numpy as np
+
+from vision.batchingService import DynamicBatchingService
+from vision.detectors.DetectorFactory import create_detector
+
+# Parâmetros de deteção partilhados entre o serviço e o modo por worker
+DETECTION_KWARGS = dict(
+    classes=[0],
+    conf=0.50,       # Apenas deteções com mais de 50% de certeza
+    iou=0.45,        # Corta duplicações nativas do YOLO
+    verbose=False
+)
+
+
+
+def detection_kwargs(config) -> dict:
+    """
+    Parâmetros de deteção para a configuração atual. O tracker ByteTrack precisa também das
+    deteções de confiança baixa (2.ª passagem), por isso o corte de confiança desce até TRACK_LOW_THRESH.
+    """
+    kwargs = dict(DETECTION_KWARGS)
+    if getattr(config, 'TRACKER_MODE', 'deepsort') == 'bytetrack':
+        kwargs["conf"] = min(kwargs["conf"], getattr(config, 'TRACK_LOW_THRESH', 0.1))
+    return kwargs
+
+
+class DetectionService(DynamicBatchingService):
+    """
+    Detetor único partilhado por todos os CameraWorkers: uma só cópia dos pesos em memória
+    e frames de várias câmaras agrupados em batches dinâmicos num único predict.
+    O backend (ultralytics, ONNX Runtime FP32/INT8 ou OpenCV DNN) vem de DETECTOR_BACKEND.
+    """
+    def __init__(self, config, stop_event: threading.Event):
+        super().__init__(
+            stop_event,
+            max_batch_size=getattr(config, 'DETECTION_MAX_BATCH_SIZE', 8),
+            max_wait_ms=getattr(config, 'DETECTION_MAX_WAIT_MS', 10),
+            name="DetectionService"
+        )
+        self.request_timeout = getattr(config, 'DETECTION_REQUEST_TIMEOUT', 5.0)
+        self.predict_kwargs = detection_kwargs(config)
+        self.detector = create_detector(config, self.predict_kwargs)
+
+    def detect(self, frame: np.ndarray) -> np.ndarray:
+        """Bloqueia o worker até o batch que contém o seu frame ser processado."""
+        return self.submit(frame).wait(self.request_timeout)
+
+    def _process_batch(self, frames: list) -> list:
+        return self.detector.detect_batch(frames)
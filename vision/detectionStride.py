@@ -0,0 +1,78 @@
+# vision/detectionStride.py
+import numpy as np
+
+
+class AdaptiveDetectionStride:
+    """
+    Decide, por câmara, em que frames corre o detetor (1 em cada K).
+    Nos restantes o tracker só avança as previsões do filtro de Kalman.
+
+    K sobe quando o worker não acompanha a entrada (frames substituídos no ring) ou a cena
+    está estática, e desce rapidamente quando há muitas faixas ou movimento rápido,
+    que é quando as previsões se degradam.
+    """
+    def __init__(self, min_stride: int = 1, max_stride: int = 6, crowd_tracks: int = 8,
+                 fast_speed: float = 12.0, static_speed: float = 1.5):
+        self.min_stride = max(1, min_stride)
+        self.max_stride = max(self.min_stride, max_stride)
+        self.crowd_tracks = crowd_tracks
+        self.fast_speed = fast_speed
+        self.static_speed = static_speed
+
+        self.stride = self.min_stride
+        self._frames_since_detection = self.stride     # Primeiro frame é sempre detetado
+        self._last_overwritten = None
+
+        self.frames = 0
+        self.detections = 0
+
+    @property
+    def frames_since_detection(self) -> int:
+        return self._frames_since_detection
+
+    def should_detect(self) -> bool:
+        """Chamado uma vez por frame; True quando é frame de deteção."""
+        self.frames += 1
+        if self._frames_since_detection >= self.stride:
+            self._frames_since_detection = 0
+            self.detections += 1
+            return True
+        self._frames_since_detection += 1
+        return False
+
+    def force_next(self):
+        """Obriga o próximo frame a passar pelo detetor."""
+        self._frames_since_detection = self.stride
+
+    @staticmethod
+    def track_speeds(tracks) -> np.ndarray:
+        """Velocidade (px/frame) de cada faixa confirmada, tirada do estado do filtro de Kalman."""
+        velocities = [track.mean[4:6] for track in tracks if track.is_confirmed() and getattr(track, "mean", None) is not None]
+        if not velocities:
+            return np.zeros(0)
+        return np.linalg.norm(np.asarray(velocities, dtype=np.float64), axis=1)
+
+    def observe(self, tracks, input_stats: dict = None):
+        """Ajusta K depois de um frame de deteção, com base nas faixas e no atraso da entrada."""
+        backlog = False
+        if input_stats is not None and "overwritten" in input_stats:
+            overwritten = input_stats["overwritten"]
+            backlog = self._last_overwritten is not None and overwritten > self._last_overwritten
+            self._last_overwritten = overwritten
+
+        speeds = self.track_speeds(tracks)
+        crowded = speeds.size >= self.crowd_tracks
+        fast = speeds.size > 0 and float(speeds.max()) >= self.fast_speed
+        static = speeds.size == 0 or float(speeds.max()) <= self.static_speed
+
+        if crowded or fast:
+            self.stride = max(self.min_stride, self.stride // 2)
+        elif backlog or static:
+            self.stride = min(self.max_stride, self.stride + 1)
+
+    def get_stats(self) -> dict:
+        return {
+            "stride": self.stride,
+            "frames": self.frames,
+            "detected_ratio": self.detections / self.frames if self.frames else 1.0,
+        }
@@ -0,0 +1,153 @@
+# vision/detectors/DetectorBenchmark.py
+"""
+Compara os backends de deteção no mesmo clip: latência por frame e concordância com um backend
+de referência (por omissão o ultralytics, isto é, o modelo .pt original).
+
+    python -m vision.detectors.DetectorBenchmark --video clip.mp4 --frames 300 --batch 4
+"""
+import time
+import argparse
+import logging
+import cv2
+import numpy as np
+
+from config import Config
+from vision.detectionService import detection_kwargs
+from vision.detectors.DetectorFactory import BACKENDS, create_detector, resolve_model_path
+
+
+def read_clip(path: str, max_frames: int, width: int, height: int) -> list:
+    """Lê o clip uma única vez, já à resolução de processamento, para todos os backends verem os mesmos frames."""
+    capture = cv2.VideoCapture(path)
+    frames = []
+    while len(frames) < max_frames:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frames.append(cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA))
+    capture.release()
+    return frames
+
+
+def _iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    lt = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    rb = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+def match_detections(reference: np.ndarray, candidate: np.ndarray, iou_threshold: float = 0.5):
+    """Associação gulosa por confiança. Devolve (verdadeiros positivos, soma dos IoU associados)."""
+    if reference.shape[0] == 0 or candidate.shape[0] == 0:
+        return 0, 0.0
+    ious = _iou_matrix(candidate[:, :4], reference[:, :4])
+    used = np.zeros(reference.shape[0], dtype=bool)
+    matched, iou_sum = 0, 0.0
+    for i in np.argsort(-candidate[:, 4]):
+        row = np.where(used, -1.0, ious[i])
+        j = int(row.argmax())
+        if row[j] >= iou_threshold:
+            used[j] = True
+            matched += 1
+            iou_sum += row[j]
+    return matched, iou_sum
+
+
+def run_backend(detector, frames: list, batch: int, warmup: int) -> tuple:
+    """Corre o clip em batches de `batch` frames. Devolve (deteções por frame, latências por frame em ms)."""
+    for i in range(min(warmup, len(frames))):
+        detector.detect(frames[i])
+
+    detections, latencies = [], []
+    for start in range(0, len(frames), batch):
+        chunk = frames[start:start + batch]
+        started = time.perf_counter()
+        results = detector.detect_batch(chunk)
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        detections.extend(results)
+        latencies.extend([elapsed_ms / len(chunk)] * len(chunk))
+    return detections, np.array(latencies)
+
+
+def summarize(name: str, detections: list, latencies: np.ndarray, reference: list) -> dict:
+    row = {
+        "backend": name,
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "fps": 1000.0 / float(latencies.mean()),
+        "detections": int(sum(d.shape[0] for d in detections)),
+    }
+    if reference is not None:
+        matched = iou_sum = 0
+        for ref, det in zip(reference, detections):
+            tp, s = match_detections(ref, det)
+            matched += tp
+            iou_sum += s
+        total_ref = sum(d.shape[0] for d in reference)
+        precision = matched / row["detections"] if row["detections"] else 1.0
+        recall = matched / total_ref if total_ref else 1.0
+        row.update(
+            precision=precision,
+            recall=recall,
+            f1=2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+            mean_iou=iou_sum / matched if matched else 0.0,
+        )
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos backends de deteção em CPU.")
+    parser.add_argument("--video", required=True, help="Clip usado por todos os backends")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--reference", default="ultralytics", choices=BACKENDS,
+                        help="Backend cujas deteções servem de referência para a precisão/recall")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--batch", type=int, default=1, help="Frames por chamada (como no DetectionService)")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--calibration-frames", type=int, default=32,
+                        help="Frames do clip usados para calibrar o INT8 estático, se ainda não existir")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', datefmt='%H:%M:%S')
+    config = Config()
+    frames = read_clip(args.video, args.frames, config.PROCESSING_WIDTH, config.PROCESSING_HEIGHT)
+    if not frames:
+        raise SystemExit(f"Não foi possível ler frames de {args.video}.")
+    logging.info(f"{len(frames)} frames lidos de {args.video}.")
+
+    if "onnx_int8" in args.backends:
+        # Calibração com frames espaçados do próprio clip (só se o modelo INT8 ainda não existir)
+        step = max(1, len(frames) // max(1, args.calibration_frames))
+        resolve_model_path(config, "onnx_int8", calibration_frames=frames[::step][:args.calibration_frames])
+
+    predict_kwargs = detection_kwargs(config)
+    order = [args.reference] + [b for b in args.backends if b != args.reference]
+    reference, rows = None, []
+    for name in order:
+        try:
+            detector = create_detector(config, predict_kwargs, backend=name)
+        except Exception as e:
+            logging.error(f"Backend '{name}' indisponível: {e}")
+            continue
+        detections, latencies = run_backend(detector, frames, args.batch, args.warmup)
+        if name == args.reference:
+            reference = detections
+        if name in args.backends:
+            rows.append(summarize(name, detections, latencies, reference if name != args.reference else None))
+
+    print(f"\n{'backend':<12}{'média ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'FPS':>8}{'deteções':>10}"
+          f"{'precisão':>10}{'recall':>8}{'F1':>7}{'IoU':>7}")
+    for row in rows:
+        accuracy = (
+            f"{row['precision']:>10.3f}{row['recall']:>8.3f}{row['f1']:>7.3f}{row['mean_iou']:>7.3f}"
+            if "precision" in row else f"{'(referência)':>32}"
+        )
+        print(f"{row['backend']:<12}{row['mean_ms']:>10.1f}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}"
+              f"{row['fps']:>8.1f}{row['detections']:>10}{accuracy}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# vision/detectors/DetectorFactory.py
+import os
+import shutil
+import logging
+
+from vision.detectors.IDetector import IDetector
+
+# Backends disponíveis em DETECTOR_BACKEND
+BACKENDS = ("ultralytics", "onnx", "onnx_int8", "opencv")
+
+
+def default_onnx_path(model_path: str, suffix: str = "") -> str:
+    return f"{os.path.splitext(model_path)[0]}{suffix}.onnx"
+
+
+def export_onnx(model_path: str, onnx_path: str, input_size: int = 640) -> str:
+    """Exporta o modelo .pt para ONNX (batch dinâmico) com o próprio ultralytics."""
+    from ultralytics import YOLO
+
+    exported = YOLO(model_path, verbose=False).export(format="onnx", imgsz=input_size, dynamic=True, simplify=True)
+    if os.path.abspath(exported) != os.path.abspath(onnx_path):
+        shutil.move(exported, onnx_path)
+    logging.info(f"[Detector] {model_path} exportado para {onnx_path}.")
+    return onnx_path
+
+
+def resolve_model_path(config, backend: str, calibration_frames: list = None) -> str:
+    """
+    Caminho do modelo que o backend vai carregar. As exportações em falta são geradas a partir de
+    YOLO_MODEL_PATH: ONNX FP32 pelo ultralytics e INT8 por quantização do FP32.
+    """
+    if backend == "ultralytics":
+        return config.YOLO_MODEL_PATH
+
+    input_size = getattr(config, 'DETECTOR_INPUT_SIZE', 640)
+    fp32_path = getattr(config, 'DETECTOR_ONNX_PATH', None) or default_onnx_path(config.YOLO_MODEL_PATH)
+    if not os.path.exists(fp32_path):
+        export_onnx(config.YOLO_MODEL_PATH, fp32_path, input_size)
+    if backend != "onnx_int8":
+        return fp32_path
+
+    int8_path = getattr(config, 'DETECTOR_ONNX_INT8_PATH', None) or default_onnx_path(config.YOLO_MODEL_PATH, "_int8")
+    if not os.path.exists(int8_path):
+        from vision.detectors.OnnxRuntimeDetector import quantize_onnx_model
+        quantize_onnx_model(fp32_path, int8_path, calibration_frames, input_size)
+    return int8_path
+
+
+def create_detector(config, predict_kwargs: dict, backend: str = None) -> IDetector:
+    """Cria o backend de deteção escolhido em DETECTOR_BACKEND (ou `backend`, se indicado)."""
+    backend = backend or getattr(config, 'DETECTOR_BACKEND', "ultralytics")
+    if backend not in BACKENDS:
+        raise ValueError(f"DETECTOR_BACKEND desconhecido: '{backend}' (opções: {', '.join(BACKENDS)}).")
+
+    model_path = resolve_model_path(config, backend)
+    kwargs = dict(
+        conf=predict_kwargs.get("conf", 0.5),
+        iou=predict_kwargs.get("iou", 0.45),
+        classes=predict_kwargs.get("classes"),
+        input_size=getattr(config, 'DETECTOR_INPUT_SIZE', 640),
+        threads=getattr(config, 'DETECTOR_THREADS', None)
+    )
+
+    if backend == "ultralytics":
+        from vision.detectors.UltralyticsDetector import UltralyticsDetector
+        detector = UltralyticsDetector(model_path, **kwargs)
+    elif backend == "opencv":
+        from vision.detectors.OpenCVDetector import OpenCVDetector
+        detector = OpenCVDetector(model_path, **kwargs)
+    else:
+        from vision.detectors.OnnxRuntimeDetector import OnnxRuntimeDetector
+        detector = OnnxRuntimeDetector(model_path, **kwargs)
+
+    logging.info(f"[Detector] Backend '{backend}' com o modelo {model_path}.")
+    return detector
@@ -0,0 +1,25 @@
+# vision/detectors/IDetector.py
+from abc import ABC, abstractmethod
+import numpy as np
+
+
+class IDetector(ABC):
+    """
+    Interface base dos backends de deteção de pessoas.
+    Cada backend devolve, por frame, um único array (N, 6) float32: x1, y1, x2, y2, conf, cls,
+    em coordenadas do frame original, já filtrado por confiança, classes e NMS.
+    """
+    def __init__(self, conf: float = 0.5, iou: float = 0.45, classes: list = None):
+        self.conf = conf
+        self.iou = iou
+        self.classes = classes
+
+    @abstractmethod
+    def detect_batch(self, frames: list) -> list:
+        """
+        Deteta pessoas num batch de frames BGR. Devolve uma lista de arrays (N, 6), um por frame.
+        """
+        pass
+
+    def detect(self, frame: np.ndarray) -> np.ndarray:
+        return self.detect_batch([frame])[0]
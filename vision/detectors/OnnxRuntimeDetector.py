@@ -0,0 +1,78 @@
+# vision/detectors/OnnxRuntimeDetector.py
+import logging
+import numpy as np
+
+from vision.detectors.IDetector import IDetector
+from vision.detectors.YoloOutput import make_blob, decode_output
+
+
+class OnnxRuntimeDetector(IDetector):
+    """
+    Backend ONNX Runtime em CPU, para exportações FP32 ou INT8 (quantizadas) do YOLO_MODEL_PATH.
+    O batch inteiro passa numa única chamada quando o modelo foi exportado com batch dinâmico.
+    """
+    def __init__(self, model_path: str, conf: float = 0.5, iou: float = 0.45, classes: list = None,
+                 input_size: int = 640, threads: int = None):
+        super().__init__(conf, iou, classes)
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        side = model_input.shape[-1]
+        self.input_size = side if isinstance(side, int) else input_size
+        # Exportações com batch fixo (1) correm frame a frame
+        self.fixed_batch = model_input.shape[0] if isinstance(model_input.shape[0], int) else None
+
+    def _run(self, blob: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: blob})[0]
+
+    def detect_batch(self, frames: list) -> list:
+        if not frames:
+            return []
+        blob, metas = make_blob(frames, self.input_size)
+        if self.fixed_batch == 1 and len(frames) > 1:
+            output = np.concatenate([self._run(blob[i:i + 1]) for i in range(len(frames))])
+        else:
+            output = self._run(blob)
+        return decode_output(output, metas, self.conf, self.iou, self.classes)
+
+
+class _FrameCalibrationReader:
+    """Alimenta a calibração estática do ONNX Runtime com frames reais das câmaras."""
+    def __init__(self, input_name: str, frames: list, input_size: int):
+        self._batches = iter([{input_name: make_blob([frame], input_size)[0]} for frame in frames])
+
+    def get_next(self):
+        return next(self._batches, None)
+
+
+def quantize_onnx_model(src_path: str, dst_path: str, calibration_frames: list = None, input_size: int = 640):
+    """
+    Gera a versão INT8 de uma exportação FP32.
+    Com frames de calibração usa quantização estática (QDQ, ativações e pesos em INT8), a mais rápida
+    para redes convolucionais em CPU; sem frames recorre à quantização dinâmica (só pesos).
+    """
+    import onnxruntime as ort
+    from onnxruntime import quantization
+
+    if calibration_frames:
+        input_name = ort.InferenceSession(src_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+        quantization.quantize_static(
+            src_path,
+            dst_path,
+            _FrameCalibrationReader(input_name, calibration_frames, input_size),
+            quant_format=quantization.QuantFormat.QDQ,
+            activation_type=quantization.QuantType.QUInt8,
+            weight_type=quantization.QuantType.QInt8,
+            per_channel=True
+        )
+        logging.info(f"[Detector] Modelo INT8 estático gerado em {dst_path} ({len(calibration_frames)} frames de calibração).")
+    else:
+        quantization.quantize_dynamic(src_path, dst_path, weight_type=quantization.QuantType.QUInt8)
+        logging.info(f"[Detector] Modelo INT8 dinâmico gerado em {dst_path}.")
@@ -0,0 +1,41 @@
+# vision/detectors/OpenCVDetector.py
+import logging
+import cv2
+import numpy as np
+
+from vision.detectors.IDetector import IDetector
+from vision.detectors.YoloOutput import make_blob, decode_output
+
+
+class OpenCVDetector(IDetector):
+    """Backend OpenCV DNN (CPU) sobre a mesma exportação ONNX; não precisa de PyTorch nem de onnxruntime."""
+    def __init__(self, model_path: str, conf: float = 0.5, iou: float = 0.45, classes: list = None,
+                 input_size: int = 640, threads: int = None):
+        super().__init__(conf, iou, classes)
+        if threads:
+            cv2.setNumThreads(threads)
+        self.net = cv2.dnn.readNet(model_path)
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.input_size = input_size
+        self.batched = True
+
+    def _forward(self, blob: np.ndarray) -> np.ndarray:
+        self.net.setInput(blob)
+        return self.net.forward()
+
+    def detect_batch(self, frames: list) -> list:
+        if not frames:
+            return []
+        blob, metas = make_blob(frames, self.input_size)
+        output = None
+        if self.batched and len(frames) > 1:
+            try:
+                output = self._forward(blob)
+            except cv2.error as e:
+                # Modelos exportados com batch fixo: passa a correr frame a frame
+                logging.warning(f"[OpenCVDetector] Batch não suportado pelo modelo, a correr frame a frame: {e}")
+                self.batched = False
+        if output is None:
+            output = np.concatenate([self._forward(blob[i:i + 1]) for i in range(len(frames))])
+        return decode_output(output, metas, self.conf, self.iou, self.classes)
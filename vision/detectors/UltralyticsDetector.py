@@ -0,0 +1,31 @@
+# vision/detectors/UltralyticsDetector.py
+import numpy as np
+
+from vision.detectors.IDetector import IDetector
+
+
+def result_to_detections(result) -> np.ndarray:
+    """Converte um resultado do ultralytics num array (N, 6): x1, y1, x2, y2, conf, cls."""
+    if result.boxes is None or len(result.boxes) == 0:
+        return np.zeros((0, 6), dtype=np.float32)
+    return result.boxes.data.cpu().numpy().astype(np.float32)
+
+
+class UltralyticsDetector(IDetector):
+    """Backend de referência: modelo .pt carregado pelo ultralytics (PyTorch)."""
+    def __init__(self, model_path: str, conf: float = 0.5, iou: float = 0.45, classes: list = None,
+                 input_size: int = None, threads: int = None):
+        super().__init__(conf, iou, classes)
+        from ultralytics import YOLO
+
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        self.model = YOLO(model_path, verbose=False)
+        self.predict_kwargs = dict(classes=classes, conf=conf, iou=iou, verbose=False)
+        if input_size:
+            self.predict_kwargs["imgsz"] = input_size
+
+    def detect_batch(self, frames: list) -> list:
+        results = self.model.predict(frames, **self.predict_kwargs)
+        return [result_to_detections(result) for result in results]
@@ -0,0 +1,79 @@
+# vision/detectors/YoloOutput.py
+import cv2
+import numpy as np
+
+# Deslocamento por classe no NMS (as caixas de classes diferentes nunca se sobrepõem)
+_CLASS_OFFSET = 7680.0
+_EMPTY = np.zeros((0, 6), dtype=np.float32)
+
+
+def make_blob(frames: list, size: int):
+    """
+    Letterbox (mantém a razão de aspeto, preenchimento 114) de cada frame para size x size e
+    conversão de todo o batch num único blob NCHW float32 RGB em [0, 1].
+    Devolve (blob, metas) com (razão, pad_x, pad_y, largura, altura) de cada frame.
+    """
+    images, metas = [], []
+    for frame in frames:
+        height, width = frame.shape[:2]
+        ratio = min(size / height, size / width)
+        new_w, new_h = int(round(width * ratio)), int(round(height * ratio))
+        pad_x, pad_y = (size - new_w) / 2, (size - new_h) / 2
+        resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR) if (new_w, new_h) != (width, height) else frame
+        top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+        images.append(cv2.copyMakeBorder(
+            resized, top, size - new_h - top, left, size - new_w - left,
+            cv2.BORDER_CONSTANT, value=(114, 114, 114)
+        ))
+        metas.append((ratio, left, top, width, height))
+    blob = cv2.dnn.blobFromImages(images, scalefactor=1.0 / 255.0, size=(size, size), swapRB=True, crop=False)
+    return blob, metas
+
+
+def _decode_one(pred: np.ndarray, meta: tuple, conf: float, iou: float, classes, end_to_end: bool) -> np.ndarray:
+    if end_to_end:
+        # Exportação ponta-a-ponta (YOLOv10/YOLO26): x1, y1, x2, y2, conf, cls já sem duplicados
+        scores = pred[:, 4]
+        class_ids = pred[:, 5]
+        boxes = pred[:, :4]
+        needs_nms = False
+    else:
+        # Exportação clássica (YOLOv8/11): cx, cy, w, h seguidos das pontuações por classe
+        class_scores = pred[:, 4:]
+        class_ids = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(pred.shape[0]), class_ids]
+        half = pred[:, 2:4] / 2
+        boxes = np.hstack([pred[:, :2] - half, pred[:, :2] + half])
+        needs_nms = True
+
+    keep = scores >= conf
+    if classes is not None:
+        keep &= np.isin(class_ids, classes)
+    if not keep.any():
+        return _EMPTY
+    boxes, scores, class_ids = boxes[keep], scores[keep], class_ids[keep].astype(np.float32)
+
+    if needs_nms:
+        # NMS por classe numa só chamada: as caixas de cada classe são deslocadas para longe das outras
+        shifted = boxes + (class_ids * _CLASS_OFFSET)[:, None]
+        ltwh = np.hstack([shifted[:, :2], shifted[:, 2:] - shifted[:, :2]])
+        indices = np.asarray(cv2.dnn.NMSBoxes(ltwh.tolist(), scores.tolist(), conf, iou), dtype=np.int64).reshape(-1)
+        boxes, scores, class_ids = boxes[indices], scores[indices], class_ids[indices]
+
+    ratio, pad_x, pad_y, width, height = meta
+    boxes = (boxes - np.array([pad_x, pad_y, pad_x, pad_y], dtype=boxes.dtype)) / ratio
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+    return np.column_stack([boxes, scores, class_ids]).astype(np.float32)
+
+
+def decode_output(output: np.ndarray, metas: list, conf: float, iou: float, classes=None) -> list:
+    """
+    Converte a saída bruta de um modelo YOLO exportado em ONNX em arrays (N, 6) por frame.
+    Aceita tanto (B, 4 + classes, âncoras) como a saída ponta-a-ponta (B, deteções, 6).
+    """
+    output = np.asarray(output, dtype=np.float32)
+    end_to_end = output.shape[2] == 6
+    if not end_to_end:
+        output = output.transpose(0, 2, 1)
+    return [_decode_one(pred, meta, conf, iou, classes, end_to_end) for pred, meta in zip(output, metas)]
@@ -0,0 +1,104 @@
+# vision/embeddingService.py
+import threading
+import logging
+import cv2
+import numpy as np
+
+from vision.batchingService import DynamicBatchingService
+
+# Normalização ImageNet usada pelo MobileNetV2 do deep_sort_realtime
+_IMAGENET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+_IMAGENET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+def crop_detections(frame: np.ndarray, bbs: list) -> list:
+    """Recortes (vistas, sem cópia) das deteções no formato do Deep SORT: ([l, t, w, h], conf, cls)."""
+    height, width = frame.shape[:2]
+    crops = []
+    for (left, top, w, h), _, _ in bbs:
+        x1 = min(max(int(left), 0), width - 1)
+        y1 = min(max(int(top), 0), height - 1)
+        x2 = min(max(int(left + w), x1 + 1), width)
+        y2 = min(max(int(top + h), y1 + 1), height)
+        crops.append(frame[y1:y2, x1:x2])
+    return crops
+
+
+class _OnnxEmbedder:
+    """Embedder de aparência em ONNX Runtime (CPU), com o mesmo pré-processamento do MobileNetV2."""
+    def __init__(self, model_path: str, bgr: bool = True, threads: int = None):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        side = model_input.shape[-1]
+        self.input_size = side if isinstance(side, int) else 224
+        self.bgr = bgr
+
+    def predict(self, crops: list) -> list:
+        batch = np.empty((len(crops), 3, self.input_size, self.input_size), dtype=np.float32)
+        for i, crop in enumerate(crops):
+            img = cv2.resize(crop, (self.input_size, self.input_size))
+            if self.bgr:
+                img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+            img = (img.astype(np.float32) / 255.0 - _IMAGENET_MEAN) / _IMAGENET_STD
+            batch[i] = img.transpose(2, 0, 1)
+        return list(self.session.run(None, {self.input_name: batch})[0].reshape(len(crops), -1))
+
+
+def create_embedding_backend(config):
+    """Backend de embeddings escolhido na configuração; devolve um objeto com predict(crops) -> lista."""
+    backend = getattr(config, 'EMBEDDER_BACKEND', "mobilenet")
+    threads = getattr(config, 'EMBEDDER_THREADS', None)
+    if backend == "onnx":
+        return _OnnxEmbedder(config.EMBEDDER_ONNX_PATH, bgr=True, threads=threads)
+
+    # MobileNetV2 do deep_sort_realtime em fp32: o half=True não tem efeito em CPU
+    from deep_sort_realtime.embedder.embedder_pytorch import MobileNetv2_Embedder
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    return MobileNetv2_Embedder(
+        half=False,
+        max_batch_size=getattr(config, 'EMBEDDER_MAX_BATCH_SIZE', 32),
+        bgr=True,
+        gpu=False
+    )
+
+
+class EmbeddingService(DynamicBatchingService):
+    """
+    Embedder de aparência partilhado por todos os CameraWorkers: os recortes das deteções de
+    várias câmaras são juntos num batch maior e passam por uma única cópia do modelo.
+    Os embeddings voltam ao worker e entram no Deep SORT via update_tracks(..., embeds=...).
+    Tem métricas próprias (latência, tamanho dos batches), separadas das da deteção.
+    """
+    def __init__(self, config, stop_event: threading.Event):
+        super().__init__(
+            stop_event,
+            max_batch_size=getattr(config, 'EMBEDDER_MAX_BATCH_SIZE', 32),
+            max_wait_ms=getattr(config, 'EMBEDDER_MAX_WAIT_MS', 5),
+            name="EmbeddingService"
+        )
+        self.backend = create_embedding_backend(config)
+        self.request_timeout = getattr(config, 'EMBEDDING_REQUEST_TIMEOUT', 5.0)
+        logging.info(f"[{self.name}] Backend de embeddings: {getattr(config, 'EMBEDDER_BACKEND', 'mobilenet')}.")
+
+    def embed(self, crops: list) -> list:
+        """Bloqueia o worker até os embeddings dos seus recortes estarem prontos."""
+        if not crops:
+            return []
+        return self.submit(crops, size=len(crops)).wait(self.request_timeout)
+
+    def _process_batch(self, payloads: list) -> list:
+        flat = [crop for crops in payloads for crop in crops]
+        embeddings = self.backend.predict(flat)
+        results, start = [], 0
+        for crops in payloads:
+            results.append(embeddings[start:start + len(crops)])
+            start += len(crops)
+        return results
@@ -31,4 +31,72 @@ def extract_color_histogram(frame: np.ndarray, box: list) -> np.ndarray:
     hist = cv2.calcHist([hsv_crop], [0, 1, 2], None, [16, 8, 8], [0, 180, 0, 256, 0, 256])
     cv2.normalize(hist, hist, alpha=0, beta=1, norm_type=cv2.NORM_MINMAX)
     
-    return hist.flatten()
\ No newline at end of file
+    return hist.flatten()
+
+# Assinatura compacta de cor (matiz x saturação) usada como pré-filtro no Re-ID
+COLOR_SIGNATURE_BINS = (16, 8, 1)
+
+
+def _inner_rects(boxes: np.ndarray, frame_shape) -> np.ndarray:
+    """Recorte interior (10% em altura, 25% em largura) de cada caixa, com o mesmo recurso da versão por caixa."""
+    height, width = frame_shape[:2]
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4).astype(int)
+    x1, y1, x2, y2 = boxes.T
+    h, w = y2 - y1, x2 - x1
+    inner = np.stack([
+        np.maximum(0, (x1 + w * 0.25).astype(int)),
+        np.maximum(0, (y1 + h * 0.10).astype(int)),
+        np.minimum(width, (x2 - w * 0.25).astype(int)),
+        np.minimum(height, (y2 - h * 0.10).astype(int)),
+    ], axis=1)
+    full = np.stack([np.maximum(0, x1), np.maximum(0, y1), np.minimum(width, x2), np.minimum(height, y2)], axis=1)
+    empty = (inner[:, 2] <= inner[:, 0]) | (inner[:, 3] <= inner[:, 1])
+    inner[empty] = full[empty]
+    return inner
+
+
+def extract_color_histograms(frame: np.ndarray, boxes: list, bins=(16, 8, 8), normalize: str = "minmax") -> np.ndarray:
+    """
+    Versão em lote do extract_color_histogram: um único blur + conversão HSV (na região que cobre
+    todas as caixas) e uma única contagem (np.bincount) para os histogramas de todos os recortes.
+    Devolve uma matriz (N, prod(bins)) float32, normalizada por linha como a versão por caixa
+    ("minmax") ou como distribuição ("l1", soma 1).
+    """
+    n_bins = int(np.prod(bins))
+    if len(boxes) == 0:
+        return np.zeros((0, n_bins), dtype=np.float32)
+    rects = _inner_rects(boxes, frame.shape)
+    valid = (rects[:, 2] > rects[:, 0]) & (rects[:, 3] > rects[:, 1])
+    hists = np.zeros((len(rects), n_bins), dtype=np.float32)
+    if not valid.any():
+        return hists
+
+    # Região mínima que contém todos os recortes: blur + HSV uma só vez
+    x0, y0 = rects[valid, 0].min(), rects[valid, 1].min()
+    x1, y1 = rects[valid, 2].max(), rects[valid, 3].max()
+    hsv = cv2.cvtColor(cv2.GaussianBlur(frame[y0:y1, x0:x1], (5, 5), 0), cv2.COLOR_BGR2HSV)
+
+    # Bin de cada pixel (mesma quantização uniforme do cv2.calcHist)
+    h_bins, s_bins, v_bins = bins
+    codes = (hsv[..., 0].astype(np.int32) * h_bins // 180) * (s_bins * v_bins)
+    codes += (hsv[..., 1].astype(np.int32) * s_bins // 256) * v_bins
+    codes += hsv[..., 2].astype(np.int32) * v_bins // 256
+
+    rows = np.flatnonzero(valid)
+    pixels = [codes[r[1] - y0:r[3] - y0, r[0] - x0:r[2] - x0].ravel() + i * n_bins
+              for i, r in enumerate(rects[rows])]
+    counts = np.bincount(np.concatenate(pixels), minlength=rows.size * n_bins).reshape(rows.size, n_bins)
+
+    counts = counts.astype(np.float32)
+    if normalize == "l1":
+        hists[rows] = counts / np.maximum(counts.sum(axis=1, keepdims=True), 1e-12)
+    else:
+        lo = counts.min(axis=1, keepdims=True)
+        hi = counts.max(axis=1, keepdims=True)
+        hists[rows] = (counts - lo) / np.maximum(hi - lo, 1e-12)
+    return hists
+
+
+def extract_color_signatures(frame: np.ndarray, boxes: list) -> np.ndarray:
+    """Assinaturas de cor compactas (histograma matiz x saturação, soma 1) de todas as caixas do frame."""
+    return extract_color_histograms(frame, boxes, COLOR_SIGNATURE_BINS, normalize="l1")
@@ -0,0 +1,64 @@
+# vision/motionGate.py
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """
+    Filtro de movimento barato que corre antes do detetor.
+    Compara uma versão reduzida e desfocada do frame (tons de cinzento) com a referência,
+    isto é, o último frame que foi processado. Assim, mudanças lentas acumulam-se até passarem o limiar.
+    Um frame sem mudança significativa pode saltar a deteção; de `force_interval` em `force_interval`
+    segundos o frame é processado na mesma, para não perder pessoas paradas.
+    """
+    def __init__(self, width: int = 160, pixel_threshold: int = 25, min_changed_fraction: float = 0.002,
+                 force_interval: float = 2.0):
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_fraction = min_changed_fraction
+        self.force_interval = force_interval
+
+        self._reference = None
+        self._last_processed = float('-inf')
+
+        self.frames = 0
+        self.skipped = 0
+
+    def _signature(self, frame: np.ndarray) -> np.ndarray:
+        height = max(1, int(round(frame.shape[0] * self.width / frame.shape[1])))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def has_motion(self, signature: np.ndarray) -> bool:
+        if self._reference is None or self._reference.shape != signature.shape:
+            return True
+        diff = cv2.absdiff(signature, self._reference)
+        changed = cv2.countNonZero(cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)[1])
+        return changed >= self.min_changed_fraction * diff.size
+
+    def should_process(self, frame: np.ndarray, current_time: float, can_skip: bool = True) -> bool:
+        """
+        True se o frame deve seguir para deteção/tracking.
+        `can_skip` = False (ex.: há faixas ativas em movimento) obriga ao processamento.
+        """
+        self.frames += 1
+        signature = self._signature(frame)
+        process = (
+            not can_skip
+            or current_time - self._last_processed >= self.force_interval
+            or self.has_motion(signature)
+        )
+        if process:
+            self._reference = signature
+            self._last_processed = current_time
+        else:
+            self.skipped += 1
+        return process
+
+    def get_stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "skipped_ratio": self.skipped / self.frames if self.frames else 0.0,
+        }